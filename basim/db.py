@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional
+
+DEFAULT_DB_PATH = Path("/tmp/basim/results.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    name TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    tests_dir TEXT,
+    config_path TEXT
+);
+
+CREATE TABLE IF NOT EXISTS results (
+    run TEXT NOT NULL REFERENCES runs (name) ON DELETE CASCADE,
+    suite TEXT NOT NULL,
+    emulator TEXT NOT NULL DEFAULT '',
+    core INTEGER,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    repetition INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS results_run ON results (run);
+CREATE INDEX IF NOT EXISTS results_suite ON results (suite, metric);
+CREATE INDEX IF NOT EXISTS results_emulator ON results (emulator);
+CREATE INDEX IF NOT EXISTS results_core ON results (core);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+"""
+
+
+class Result(NamedTuple):
+    emulator: str
+    core: Optional[int]
+    metric: str
+    value: float
+
+
+class ResultsDB:
+    """
+    A local SQLite database of basim results.
+
+    A row is a single metric value of a suite run repetition
+    on an emulator core. Re-running a run name replaces all of its rows.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute("PRAGMA foreign_keys = ON")
+        self.__connection.execute("PRAGMA journal_mode = WAL")
+        self.__connection.executescript(SCHEMA)
+
+        # Databases created before repetitions lack the column
+        columns = [
+            row[1] for row in self.__connection.execute("PRAGMA table_info(results)")
+        ]
+        if "repetition" not in columns:
+            with self.__connection:
+                self.__connection.execute(
+                    "ALTER TABLE results "
+                    "ADD COLUMN repetition INTEGER NOT NULL DEFAULT 0"
+                )
+
+    def __enter__(self) -> "ResultsDB":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__connection.close()
+
+    def begin_run(self, run: str, tests_dir: Path, config_path: Path) -> None:
+        with self.__connection:
+            self.__connection.execute("DELETE FROM runs WHERE name = ?", (run,))
+            self.__connection.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?)",
+                (run, time.time(), str(tests_dir), str(config_path)),
+            )
+
+    def drop_run(self, run: str) -> None:
+        with self.__connection:
+            self.__connection.execute("DELETE FROM runs WHERE name = ?", (run,))
+
+    def insert(
+        self, run: str, suite: str, repetition: int, results: Iterable[Result]
+    ) -> int:
+        with self.__connection:
+            cursor = self.__connection.executemany(
+                "INSERT INTO results "
+                "(run, suite, emulator, core, metric, value, repetition) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((run, suite, *result, repetition) for result in results),
+            )
+            return cursor.rowcount
+
+    def runs(self, limit: int) -> List[tuple]:
+        return self.__connection.execute(
+            "SELECT name, datetime(started, 'unixepoch'), tests_dir, config_path "
+            "FROM runs ORDER BY started DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def history(
+        self,
+        suite: str,
+        metric: str,
+        emulator: Optional[str],
+        limit: int,
+    ) -> List[tuple]:
+        return self.__connection.execute(
+            "SELECT runs.name, datetime(runs.started, 'unixepoch'), "
+            "results.emulator, results.core, results.repetition, results.value "
+            "FROM results JOIN runs ON runs.name = results.run "
+            "WHERE results.suite = ? AND results.metric = ? "
+            "AND (? IS NULL OR results.emulator = ?) "
+            "AND runs.name IN (SELECT name FROM runs ORDER BY started DESC LIMIT ?) "
+            "ORDER BY runs.started DESC, results.emulator, results.core, "
+            "results.repetition",
+            (suite, metric, emulator, emulator, limit),
+        ).fetchall()
+
+    def trend(self, metrics: List[str], limit: int) -> List[tuple]:
+        """
+        The means over the repetitions of the metrics in the latest runs,
+        the oldest run first.
+        """
+
+        placeholders = ", ".join("?" * len(metrics))
+        return self.__connection.execute(
+            "SELECT runs.name, results.suite, results.emulator, results.metric, "
+            "AVG(results.value) "
+            "FROM results JOIN runs ON runs.name = results.run "
+            f"WHERE results.metric IN ({placeholders}) "
+            "AND runs.name IN (SELECT name FROM runs ORDER BY started DESC LIMIT ?) "
+            "GROUP BY runs.name, results.suite, results.emulator, results.metric "
+            "ORDER BY runs.started, results.suite, results.emulator, results.metric",
+            (*metrics, limit),
+        ).fetchall()
+
+    def diff(self, old: str, new: str, metric: Optional[str]) -> List[tuple]:
+        """
+        Compares the means over the repetitions.
+        """
+
+        means = (
+            "SELECT suite, emulator, core, metric, AVG(value) AS value "
+            "FROM results WHERE run = ? AND (? IS NULL OR metric = ?) "
+            "GROUP BY suite, emulator, core, metric"
+        )
+        return self.__connection.execute(
+            "SELECT o.suite, o.emulator, o.core, o.metric, o.value, n.value "
+            f"FROM ({means}) o JOIN ({means}) n "
+            "ON n.suite = o.suite AND n.emulator = o.emulator "
+            "AND n.core IS o.core AND n.metric = o.metric "
+            "ORDER BY o.suite, o.emulator, o.core, o.metric",
+            (old, metric, metric, new, metric, metric),
+        ).fetchall()
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Query the basim results database.")
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=DEFAULT_DB_PATH,
+        help=f"Path to the results database (default: {DEFAULT_DB_PATH}).",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    runs = commands.add_parser("runs", help="List the latest runs.")
+    runs.add_argument("-n", "--limit", type=int, default=20)
+
+    history = commands.add_parser(
+        "history", help="Print a metric of a suite over the latest runs."
+    )
+    history.add_argument("suite")
+    history.add_argument("-m", "--metric", default="cycles")
+    history.add_argument("-e", "--emulator")
+    history.add_argument("-n", "--limit", type=int, default=200)
+
+    diff = commands.add_parser("diff", help="Compare the results of two runs.")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    diff.add_argument("-m", "--metric")
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+
+    if not args.db.exists():
+        print(f"[basim] [!] No results database at '{args.db}'", file=sys.stderr)
+        sys.exit(1)
+
+    writer = csv.writer(sys.stdout)
+    with ResultsDB(args.db) as db:
+        if args.command == "runs":
+            writer.writerow(["run_name", "started", "tests_dir", "config_path"])
+            writer.writerows(db.runs(args.limit))
+
+        elif args.command == "history":
+            writer.writerow(
+                ["run_name", "started", "emulator", "core", "repetition", args.metric]
+            )
+            writer.writerows(
+                db.history(args.suite, args.metric, args.emulator, args.limit)
+            )
+
+        elif args.command == "diff":
+            writer.writerow(
+                ["test_suite_name", "emulator", "core", "metric", "old", "new", "diff"]
+            )
+            for *key, old, new in db.diff(args.old, args.new, args.metric):
+                change = "" if old == 0 else f"{(new - old) / old * 100:+.2f}%"
+                writer.writerow([*key, old, new, change])
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,23 @@
 
 import argparse
 import csv
+import fnmatch
+import math
+import os
 import shutil
 import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, NamedTuple
+from typing import Callable, Iterator, List, NamedTuple
+
+from db import DEFAULT_DB_PATH, Result, ResultsDB
+
+# The readers of the simuben artifacts are shared with simuben
+sys.path.append(str(Path(__file__).resolve().parent.parent / "simuben"))
+from compression import compressed_read
+from config import SimuBenConfig
+from verilator.log import VerilatorPerfArchive
 
 
 class Config(NamedTuple):
@@ -14,6 +26,13 @@ class Config(NamedTuple):
     config_path: Path
     run_name: str
     tests_dir: Path
+    jobs: int = 1
+    db_path: Path | None = DEFAULT_DB_PATH
+    db_perf: tuple[str, ...] = ()
+    repeat: int = 1
+    benchmark: int = 0
+    # The core of the simuben brief
+    core: int = 0
 
 
 class TestSuite(NamedTuple):
@@ -21,14 +40,39 @@ class TestSuite(NamedTuple):
     source_absolute_paths: List[Path]
 
 
+class SuiteLog(NamedTuple):
+    test_suite: TestSuite
+    repetition: int
+    csv_log_path: Path
+
+
 TEMP_DIR = Path("/tmp")
 BASIM_OUTPUT_DIR = TEMP_DIR / "basim"
 
-SIMUBEN_TEMP_FILES = {
-    "nemu.log": TEMP_DIR / "nemu.log",
-    "verilator.log": TEMP_DIR / "verilator.log",
-    "verilator.brief.csv": TEMP_DIR / "verilator.brief.csv",
-}
+# Artifacts of an emulator matrix are tagged, e.g. `verilator.<name>.log`
+SIMUBEN_ARTIFACTS = [
+    "nemu*.log*",
+    "nemu*.csv",
+    "simpoint*.csv",
+    "verilator*.log*",
+    "verilator.brief.csv*",
+    "verilator*.perf.bin",
+]
+
+SIMUBEN_OUTPUT_FILE = "simuben.out"
+
+# Host-side columns of the brief tracked by the benchmark mode
+HOST_METRICS = ["sim_khz", "host_wall_time_ms", "peak_rss_kb", "parse_time_ms"]
+
+COMPRESSED_SUFFIXES = [".gz", ".zst"]
+
+
+def find_artifact(workspace: Path, artifact: str) -> Path | None:
+    for suffix in ["", *COMPRESSED_SUFFIXES]:
+        path = workspace / f"{artifact}{suffix}"
+        if path.exists():
+            return path
+    return None
 
 
 def parse_arguments() -> Config:
@@ -59,13 +103,75 @@ def parse_arguments() -> Config:
         type=Path,
         help="Path to the simuben.yml configuration file.",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of test suites to run concurrently (0 means all CPUs).",
+    )
+    parser.add_argument(
+        "-n",
+        "--repeat",
+        type=int,
+        default=1,
+        help="Number of repetitions of every test suite, run concurrently "
+        + "with the other suites and repetitions.",
+    )
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        default=0,
+        metavar="RUNS",
+        help="Track the host simulation metrics over this run and the latest "
+        + "RUNS - 1 runs in the database.",
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=DEFAULT_DB_PATH,
+        help=f"Path to the results database (default: {DEFAULT_DB_PATH}).",
+    )
+    parser.add_argument(
+        "--no-db",
+        action="store_true",
+        help="Do not store the results in the database.",
+    )
+    parser.add_argument(
+        "--db-perf",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Also store the final values of the perf counters matching this "
+        + "glob of 'path.name', requires the perf archive to be exported.",
+    )
     args = parser.parse_args()
 
+    if args.jobs < 0:
+        parser.error("--jobs must be non-negative")
+
+    if args.repeat < 1:
+        parser.error("--repeat must be positive")
+
+    if args.benchmark < 0:
+        parser.error("--benchmark must be non-negative")
+
+    if args.benchmark != 0 and args.no_db:
+        parser.error("--benchmark requires the database")
+
+    config_path = args.config.resolve()
+
     return Config(
         tests_dir=args.dir.resolve(),
-        config_path=args.config.resolve(),
+        config_path=config_path,
         run_name=args.run_name,
         simuben_executable=args.simuben.resolve(),
+        jobs=args.jobs or os.cpu_count() or 1,
+        db_path=None if args.no_db else args.db.resolve(),
+        db_perf=tuple(args.db_perf),
+        repeat=args.repeat,
+        benchmark=args.benchmark,
+        core=SimuBenConfig.from_yaml_file(config_path).export.csv.core_number,
     )
 
 
@@ -99,7 +205,16 @@ def discover_test_suites(tests_dir: Path) -> List[TestSuite]:
     return suites
 
 
-def run_simuben(test_suite: TestSuite, config: Config):
+def suite_output_dir(
+    test_suite: TestSuite, config: Config, repetition: int = 0
+) -> Path:
+    output_dir = BASIM_OUTPUT_DIR / config.run_name / test_suite.name
+    if config.repeat == 1:
+        return output_dir
+    return output_dir / str(repetition)
+
+
+def run_simuben(test_suite: TestSuite, config: Config, workspace: Path):
     print(f"[basim] Running simuben for test suite '{test_suite.name}'...")
 
     cmd = [
@@ -108,39 +223,177 @@ def run_simuben(test_suite: TestSuite, config: Config):
         *[str(p) for p in test_suite.source_absolute_paths],
         "--config",
         str(config.config_path),
+        "--output-dir",
+        str(workspace),
+        "--csv-core-number",
+        str(config.core),
     ]
 
-    subprocess.run(cmd, check=True, text=True, encoding="utf-8")
+    if config.jobs == 1:
+        subprocess.run(cmd, check=True, text=True, encoding="utf-8")
+    else:
+        # Concurrent runs would interleave on the terminal,
+        # so each one gets its own output file in its workspace.
+        output_path = workspace / SIMUBEN_OUTPUT_FILE
+        with open(output_path, "w", encoding="utf-8") as output:
+            result = subprocess.run(
+                cmd,
+                stdout=output,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding="utf-8",
+            )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"Simuben failed for test suite '{test_suite.name}' "
+                + f"with code {result.returncode}, see '{output_path}'"
+            )
+
     print(f"[basim]   - Simuben finished successfully.")
 
 
-def copy_artifacts(test_suite: TestSuite, config: Config) -> Path:
-    print(f"[basim] Copying artifacts for '{test_suite.name}'...")
+def collect_artifacts(test_suite: TestSuite, workspace: Path) -> Path:
+    print(f"[basim] Collecting artifacts for '{test_suite.name}'...")
 
-    dest_dir = BASIM_OUTPUT_DIR / config.run_name / test_suite.name
-    dest_dir.mkdir(parents=True, exist_ok=True)
+    for artifact in SIMUBEN_ARTIFACTS:
+        paths = sorted(workspace.glob(artifact))
 
-    copied_csv_log_path = None
+        if len(paths) == 0:
+            print(f"[basim]   - Artifact '{workspace / artifact}' not found, skipping.")
+            continue
 
-    for artifact in SIMUBEN_TEMP_FILES.keys():
-        src = SIMUBEN_TEMP_FILES[artifact]
-        dst = dest_dir / artifact
+        for path in paths:
+            print(f"[basim]   - Found '{path}'")
 
-        if not src.exists():
-            print(f"[basim]   - Artifact '{src}' not found, skipping.")
-            continue
+    csv_log_path = find_artifact(workspace, "verilator.brief.csv")
+    if csv_log_path is None:
+        raise FileNotFoundError(
+            f"Simuben produced no brief for test suite '{test_suite.name}'"
+        )
+
+    return csv_log_path
 
-        print(f"[basim]   - Copying '{src}' to '{dst}'")
-        shutil.copy(src, dst)
 
-        if artifact == "verilator.brief.csv":
-            copied_csv_log_path = dst
+def process_suite(test_suite: TestSuite, config: Config, repetition: int = 0) -> Path:
+    workspace = suite_output_dir(test_suite, config, repetition)
+    workspace.mkdir(parents=True, exist_ok=True)
 
-    assert copied_csv_log_path is not None
-    return copied_csv_log_path
+    run_simuben(test_suite, config, workspace)
+    return collect_artifacts(test_suite, workspace)
 
 
-def merge_csvs(individual_log_paths: List[Path], run_name: str, output_dir: Path):
+def process_suites(
+    test_suites: List[TestSuite],
+    config: Config,
+    on_done: Callable[[SuiteLog], None],
+) -> List[SuiteLog]:
+    runs = [
+        (suite, repetition)
+        for suite in test_suites
+        for repetition in range(config.repeat)
+    ]
+
+    if config.jobs == 1:
+        generated_csv_logs = []
+        for suite, repetition in runs:
+            print("-" * 50)
+            generated_csv_logs.append(
+                SuiteLog(suite, repetition, process_suite(suite, config, repetition))
+            )
+            on_done(generated_csv_logs[-1])
+        return generated_csv_logs
+
+    print("-" * 50)
+    print(f"[basim] Running {len(runs)} suite runs with {config.jobs} jobs...")
+
+    # The map keeps the order of the suites, so the merged CSV
+    # is the same as for the sequential run.
+    with ProcessPoolExecutor(max_workers=config.jobs) as executor:
+        try:
+            generated_csv_logs = []
+            for (suite, repetition), csv_log_path in zip(
+                runs,
+                executor.map(
+                    process_suite,
+                    [suite for suite, _ in runs],
+                    [config] * len(runs),
+                    [repetition for _, repetition in runs],
+                ),
+            ):
+                generated_csv_logs.append(SuiteLog(suite, repetition, csv_log_path))
+                on_done(generated_csv_logs[-1])
+            return generated_csv_logs
+        except BaseException:
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+
+def brief_results(csv_log_path: Path, core: int) -> Iterator[Result]:
+    with compressed_read(csv_log_path, newline="") as f:
+        for row in csv.DictReader(f):
+            emulator = row.pop("emulator", None) or ""
+            for metric, value in row.items():
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                yield Result(emulator, core, metric, value)
+
+
+def perf_results(
+    test_suite: TestSuite, config: Config, repetition: int = 0
+) -> Iterator[Result]:
+    workspace = suite_output_dir(test_suite, config, repetition)
+    archive_paths = sorted(workspace.glob("verilator*.perf.bin"))
+    if len(archive_paths) == 0:
+        print(f"[basim]   - No perf archive for '{test_suite.name}', skipping.")
+        return
+
+    for archive_path in archive_paths:
+        # `verilator.perf.bin` or `verilator.<name>.perf.bin`
+        emulator = (
+            archive_path.name.removeprefix("verilator")
+            .removesuffix(".perf.bin")
+            .removeprefix(".")
+        )
+
+        with VerilatorPerfArchive(archive_path) as archive:
+            if len(archive.times) == 0:
+                continue
+
+            snapshot = archive.snapshot(archive.times[-1])
+            for path, counters in snapshot.items():
+                for name, values in counters.items():
+                    metric = f"{path}.{name}"
+                    if any(fnmatch.fnmatchcase(metric, p) for p in config.db_perf):
+                        yield Result(emulator, None, metric, float(sum(values)))
+
+
+def store_results(db: ResultsDB, log: SuiteLog, config: Config) -> None:
+    test_suite, repetition, csv_log_path = log
+
+    count = db.insert(
+        config.run_name,
+        test_suite.name,
+        repetition,
+        brief_results(csv_log_path, config.core),
+    )
+    if len(config.db_perf) != 0:
+        count += db.insert(
+            config.run_name,
+            test_suite.name,
+            repetition,
+            perf_results(test_suite, config, repetition),
+        )
+    print(f"[basim]   - Stored {count} result(s) of '{test_suite.name}'.")
+
+
+def merge_csvs(
+    individual_logs: List[SuiteLog],
+    run_name: str,
+    output_dir: Path,
+    repeat: int = 1,
+):
     print("[basim] Merging all 'verilator.brief.log' files (as CSV)...")
     output_path = output_dir / "verilator.brief.merged.csv"
 
@@ -148,11 +401,13 @@ def merge_csvs(individual_log_paths: List[Path], run_name: str, output_dir: Path
         writer = csv.writer(outfile)
 
         header_written = False
-        for log_path in individual_log_paths:
-            test_suite_name = log_path.parent.name
+        for test_suite, repetition, log_path in individual_logs:
+            test_suite_name = test_suite.name
+            # Repetitions are told apart by the `repetition` column
+            tag = [test_suite_name] if repeat == 1 else [test_suite_name, repetition]
             print(f"[basim]   - Processing '{log_path}' for suite '{test_suite_name}'")
 
-            with open(log_path, "r", newline="", encoding="utf-8") as infile:
+            with compressed_read(log_path, newline="") as infile:
                 reader = csv.reader(infile)
 
                 try:
@@ -161,7 +416,10 @@ def merge_csvs(individual_log_paths: List[Path], run_name: str, output_dir: Path
                     raise ValueError(f"CSV-formatted log file is empty: {log_path}")
 
                 if not header_written:
-                    new_header = ["run_name", "test_suite_name"] + original_header
+                    new_header = ["run_name", "test_suite_name"]
+                    if repeat != 1:
+                        new_header.append("repetition")
+                    new_header += original_header
                     writer.writerow(new_header)
                     header_written = True
 
@@ -170,7 +428,7 @@ def merge_csvs(individual_log_paths: List[Path], run_name: str, output_dir: Path
                     if len(row) == 0:
                         continue
 
-                    writer.writerow([run_name, test_suite_name] + row)
+                    writer.writerow([run_name, *tag] + row)
                     rows_processed += 1
 
                 if rows_processed == 0:
@@ -181,10 +439,54 @@ def merge_csvs(individual_log_paths: List[Path], run_name: str, output_dir: Path
     print(f"[basim] Merge complete. Output written to '{output_path}'.")
 
 
+def geomean(values: List[float]) -> float | None:
+    positive = [value for value in values if value > 0]
+    if len(positive) == 0:
+        return None
+    return math.exp(math.fsum(map(math.log, positive)) / len(positive))
+
+
+def write_benchmark_trend(db: ResultsDB, config: Config, output_dir: Path):
+    print(
+        f"[basim] Tracking the host metrics over the latest {config.benchmark} runs..."
+    )
+    output_path = output_dir / "host.trend.csv"
+
+    trend = db.trend(HOST_METRICS, config.benchmark)
+
+    runs = list(dict.fromkeys(run for run, *_ in trend))
+    table: dict[tuple[str, str, str], dict[str, float]] = {}
+    for run, suite, emulator, metric, value in trend:
+        table.setdefault((suite, emulator, metric), {})[run] = value
+
+    with open(output_path, "w", newline="", encoding="utf-8") as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(["test_suite_name", "emulator", "metric", *runs])
+        for key in sorted(table):
+            writer.writerow([*key, *(table[key].get(run, "") for run in runs)])
+
+    # The geometric mean over the suites summarizes a run
+    for metric in HOST_METRICS:
+        summary = []
+        for run in runs:
+            mean = geomean(
+                [
+                    values[run]
+                    for key, values in table.items()
+                    if key[2] == metric and run in values
+                ]
+            )
+            summary.append("-" if mean is None else f"{mean:.2f}")
+        print(f"[basim]   - {metric}: " + " -> ".join(summary))
+
+    print(f"[basim] Trend written to '{output_path}'.")
+
+
 def main():
     config = parse_arguments()
     run_output_dir = BASIM_OUTPUT_DIR / config.run_name
 
+    db = None
     try:
         if run_output_dir.exists():
             print(
@@ -197,21 +499,29 @@ def main():
             f"[basim] Starting basim run '{config.run_name}'. Output will be in '{run_output_dir}'"
         )
 
+        if config.db_path is not None:
+            print(f"[basim] Storing results in '{config.db_path}'")
+            db = ResultsDB(config.db_path)
+            db.begin_run(config.run_name, config.tests_dir, config.config_path)
+
         test_suites = discover_test_suites(config.tests_dir)
         if not test_suites:
             raise FileNotFoundError(
                 f"No valid test suites with source files found in '{config.tests_dir}'"
             )
 
-        generated_csv_logs = []
-        for suite in test_suites:
-            print("-" * 50)
-            run_simuben(suite, config)
-            csv_log_path = copy_artifacts(suite, config)
-            generated_csv_logs.append(csv_log_path)
+        def on_done(log: SuiteLog) -> None:
+            if db is not None:
+                store_results(db, log, config)
+
+        generated_csv_logs = process_suites(test_suites, config, on_done)
 
         print("-" * 50)
-        merge_csvs(generated_csv_logs, config.run_name, run_output_dir)
+        merge_csvs(generated_csv_logs, config.run_name, run_output_dir, config.repeat)
+
+        if config.benchmark != 0 and db is not None:
+            print("-" * 50)
+            write_benchmark_trend(db, config, run_output_dir)
 
         print("\n[basim] [+] Basim run completed successfully.")
 
@@ -222,8 +532,14 @@ def main():
             file=sys.stderr,
         )
         shutil.rmtree(run_output_dir, ignore_errors=True)
+        if db is not None:
+            db.drop_run(config.run_name)
         sys.exit(1)
 
+    finally:
+        if db is not None:
+            db.close()
+
 
 if __name__ == "__main__":
     main()
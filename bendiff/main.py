@@ -5,13 +5,54 @@
 
 import argparse
 import csv
+import functools
+import heapq
+import itertools
+import math
+from pathlib import Path
+import statistics
 import sys
-from typing import NamedTuple
+import tempfile
+from typing import Iterator, NamedTuple, Sequence
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-class BenchmarkData(NamedTuple):
-    instructions: int
-    cycles: int
+# The reader of the simuben artifacts is shared with simuben
+sys.path.append(str(Path(__file__).resolve().parent.parent / "simuben"))
+from compression import compressed_read
+
+Number = int | float
+
+# Metric values of a row, in the order of the metric columns
+Values = tuple[Number, ...]
+
+# Rows of the same key told apart by this column are repetitions of a run
+REPETITION_COLUMN = "repetition"
+
+# Columns that are never diffed even when numeric
+NON_METRIC_COLUMNS = ["run_name", "test_suite_name", "emulator", REPETITION_COLUMN]
+
+# Measurements of the host rather than the design, diffed by default only
+# across repeated runs, which is where their noise is told apart from a change
+HOST_COLUMNS = [
+    "time_spent_ms",
+    "host_wall_time_ms",
+    "sim_khz",
+    "peak_rss_kb",
+    "parse_time_ms",
+]
+
+# Decimals of the Welch-Satterthwaite degrees of freedom kept by the t quantile
+DF_DECIMALS = 2
+
+# Ints below this are diffed exactly by numpy, even as float64
+NUMPY_INT_LIMIT = 1 << 52
+
+# Rows of a chunk sorted in memory by the external sort
+SORT_CHUNK_ROWS = 1 << 18
 
 
 def parse_args():
@@ -26,12 +67,92 @@ def parse_args():
         "--new-path",
         required=True,
     )
+    parser.add_argument(
+        "--old-emulator",
+        help="Take only the rows of this emulator from the old file.",
+    )
+    parser.add_argument(
+        "--new-emulator",
+        help="Take only the rows of this emulator from the new file.",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Merge-join the files in constant memory, writing rows as they go. "
+        + "Files not sorted by the key are sorted externally first.",
+    )
+    parser.add_argument(
+        "-m",
+        "--metric",
+        action="append",
+        dest="metrics",
+        help="Diff only this column, all the shared numeric columns by default.",
+    )
+    parser.add_argument(
+        "--geomean",
+        action="store_true",
+        help="Append a row with the geometric means of the metrics.",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="Significance level of the comparison of repeated runs.",
+    )
     return parser.parse_args()
 
 
-def load_and_validate_csv(file_path: str, key_columns: list) -> dict:
-    data = {}
-    with open(file_path, mode="r", newline="", encoding="utf-8") as f:
+def read_header(file_path: str) -> list:
+    with compressed_read(Path(file_path), newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def parse_number(value: str) -> Number:
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def metric_columns(
+    file_paths: list, key_columns: list, is_repeated: bool = False
+) -> list:
+    """
+    The columns shared by all the files, which are numeric
+    in the first data row of each file, except the host columns
+    unless the runs are repeated.
+    """
+
+    headers = []
+    first_rows = []
+    for file_path in file_paths:
+        with compressed_read(Path(file_path), newline="") as f:
+            reader = csv.reader(f)
+            headers.append(next(reader, []))
+            first_rows.append(next(reader, []))
+
+    metrics = []
+    for column in headers[0]:
+        if column in key_columns or column in NON_METRIC_COLUMNS:
+            continue
+        if column in HOST_COLUMNS and not is_repeated:
+            continue
+
+        try:
+            for header, row in zip(headers, first_rows):
+                parse_number(row[header.index(column)])
+        except (IndexError, ValueError):
+            continue
+
+        metrics.append(column)
+
+    return metrics
+
+
+def read_rows(
+    file_path: str, key_columns: list, metrics: list, emulator: str | None = None
+) -> Iterator[tuple[int, tuple, Values]]:
+    with compressed_read(Path(file_path), newline="") as f:
         reader = csv.reader(f)
 
         try:
@@ -39,7 +160,9 @@ def load_and_validate_csv(file_path: str, key_columns: list) -> dict:
         except StopIteration:
             raise ValueError(f"File '{file_path}' is empty or has no header.")
 
-        required_cols = key_columns + ["instructions", "cycles"]
+        required_cols = key_columns + metrics
+        if emulator is not None:
+            required_cols.append("emulator")
         if not all(col in header for col in required_cols):
             missing = set(required_cols) - set(header)
             raise ValueError(
@@ -49,86 +172,575 @@ def load_and_validate_csv(file_path: str, key_columns: list) -> dict:
 
         col_indices = {name: header.index(name) for name in required_cols}
         key_indices = [col_indices[name] for name in key_columns]
+        metric_indices = [col_indices[name] for name in metrics]
 
         for i, row in enumerate(reader, start=2):
+            if emulator is not None and row[col_indices["emulator"]] != emulator:
+                continue
+
             try:
                 key = tuple(row[idx] for idx in key_indices)
-                instructions = int(row[col_indices["instructions"]])
-                cycles = int(row[col_indices["cycles"]])
+                values = tuple(parse_number(row[idx]) for idx in metric_indices)
             except (IndexError, ValueError) as e:
                 raise ValueError(
                     f"Malformed data in '{file_path}' on line {i}: {row}. "
                     + f"Error: {e}"
                 )
 
-            if key in data:
-                raise ValueError(
-                    f"Duplicate key {key} found in '{file_path}' on line {i}."
-                )
+            yield i, key, values
+
+
+def load_and_validate_csv(
+    file_path: str, key_columns: list, metrics: list, emulator: str | None = None
+) -> dict:
+    data = {}
+    for i, key, row in read_rows(file_path, key_columns, metrics, emulator):
+        if key in data:
+            raise ValueError(f"Duplicate key {key} found in '{file_path}' on line {i}.")
 
-            data[key] = BenchmarkData(instructions, cycles)
+        data[key] = row
 
     return data
 
 
-def generate_diff(old_data: dict, new_data: dict) -> list:
+def is_sorted_csv(
+    file_path: str, key_columns: list, metrics: list, emulator: str | None = None
+) -> bool:
+    previous = None
+    for _, key, _ in read_rows(file_path, key_columns, metrics, emulator):
+        if previous is not None and key < previous:
+            return False
+        previous = key
+    return True
+
+
+def external_sort_rows(
+    file_path: str, key_columns: list, metrics: list, emulator: str | None = None
+) -> Iterator[tuple[int, tuple, Values]]:
+    """
+    Sorts the rows by the key and then by the line in chunks
+    of `SORT_CHUNK_ROWS` spilled to disk and merged back.
+    """
+
+    def sort_key(row: tuple[int, tuple, Values]) -> tuple:
+        i, key, _ = row
+        return key, i
+
+    def spill(chunk: list, f) -> None:
+        chunk.sort(key=sort_key)
+        writer = csv.writer(f)
+        for i, key, row in chunk:
+            writer.writerow([i, *key, *row])
+        f.seek(0)
+
+    def unspill(f) -> Iterator[tuple[int, tuple, Values]]:
+        for i, *fields in csv.reader(f):
+            key = tuple(fields[: len(key_columns)])
+            values = tuple(map(parse_number, fields[len(key_columns) :]))
+            yield int(i), key, values
+
+    with tempfile.TemporaryDirectory(prefix="bendiff-") as tmp_dir:
+        chunks = []
+        try:
+            chunk = []
+            for row in read_rows(file_path, key_columns, metrics, emulator):
+                chunk.append(row)
+                if len(chunk) == SORT_CHUNK_ROWS:
+                    chunks.append(
+                        open(f"{tmp_dir}/{len(chunks)}.csv", "w+", newline="")
+                    )
+                    spill(chunk, chunks[-1])
+                    chunk = []
+
+            chunk.sort(key=sort_key)
+            yield from heapq.merge(
+                *(unspill(f) for f in chunks), iter(chunk), key=sort_key
+            )
+        finally:
+            for f in chunks:
+                f.close()
+
+
+def sorted_rows(
+    file_path: str, key_columns: list, metrics: list, emulator: str | None = None
+) -> Iterator[tuple[tuple, Values]]:
+    if is_sorted_csv(file_path, key_columns, metrics, emulator):
+        rows = read_rows(file_path, key_columns, metrics, emulator)
+    else:
+        print(
+            f"Warning: '{file_path}' is not sorted by {key_columns}, sorting it.",
+            file=sys.stderr,
+        )
+        rows = external_sort_rows(file_path, key_columns, metrics, emulator)
+
+    previous = None
+    for i, key, row in rows:
+        if key == previous:
+            raise ValueError(f"Duplicate key {key} found in '{file_path}' on line {i}.")
+
+        previous = key
+        yield key, row
+
+
+def diff_header(key_columns: list, metrics: list) -> list:
+    header = [*key_columns]
+    for metric in metrics:
+        header += [
+            f"{metric}_old",
+            f"{metric}_new",
+            f"{metric}_diff_absolute",
+            f"{metric}_diff_relative",
+        ]
+    return header
+
+
+def relative_diff(old: Number, new: Number) -> float:
+    """
+    In percent. A zero baseline gives an infinite change of the sign
+    of the new value, or no change when the new value is also zero.
+    """
+
+    if old == 0:
+        return 0.0 if new == 0 else math.copysign(math.inf, new)
+    return (new - old) / old * 100
+
+
+def format_relative(relative: float) -> str:
+    return f"{relative:+.2f}%"
+
+
+def numpy_dtype(old: Sequence[Number], new: Sequence[Number]):
+    """
+    The dtype numpy diffs both columns in with the same results as Python,
+    or None. Columns mixing ints and floats are left to Python, so that
+    their ints are not printed as floats, and so are ints that could wrap
+    or lose precision in their relative diffs.
+    """
+
+    if np is None:
+        return None
+
+    types = set(map(type, old)) | set(map(type, new))
+    if types == {float}:
+        return np.float64
+    if types == {int}:
+        largest = max(map(abs, itertools.chain(old, new)))
+        if largest < NUMPY_INT_LIMIT:
+            return np.int64
+    return None
+
+
+def diff_columns(old: Sequence[Number], new: Sequence[Number]) -> tuple[list, list]:
+    """
+    The absolute and relative diffs of a metric for all the keys at once.
+    """
+
+    dtype = numpy_dtype(old, new)
+    if dtype is None:
+        return (
+            [n - o for o, n in zip(old, new)],
+            [relative_diff(o, n) for o, n in zip(old, new)],
+        )
+
+    old_array = np.asarray(old, dtype=dtype)
+    new_array = np.asarray(new, dtype=dtype)
+
+    absolute = new_array - old_array
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = absolute / old_array * 100
+    relative[(old_array == 0) & (new_array == 0)] = 0.0
+
+    return absolute.tolist(), relative.tolist()
+
+
+def geomean_row(
+    old_columns: list, new_columns: list, key_columns: list, metrics: list
+) -> list:
+    """
+    The geometric means of the metrics over the keys with positive values
+    in both files, and the geometric mean of the new to old ratios.
+    """
+
+    row = ["geomean", *([""] * (len(key_columns) - 1))]
+    for old, new in zip(old_columns, new_columns):
+        if np is None:
+            pairs = [(o, n) for o, n in zip(old, new) if o > 0 and n > 0]
+            if len(pairs) == 0:
+                row += ["", "", "", ""]
+                continue
+
+            old_log = math.fsum(math.log(o) for o, _ in pairs) / len(pairs)
+            new_log = math.fsum(math.log(n) for _, n in pairs) / len(pairs)
+        else:
+            old_array = np.asarray(old, dtype=np.float64)
+            new_array = np.asarray(new, dtype=np.float64)
+            is_positive = (old_array > 0) & (new_array > 0)
+            if not is_positive.any():
+                row += ["", "", "", ""]
+                continue
+
+            old_log = float(np.log(old_array[is_positive]).mean())
+            new_log = float(np.log(new_array[is_positive]).mean())
+
+        row += [
+            f"{math.exp(old_log):.2f}",
+            f"{math.exp(new_log):.2f}",
+            "",
+            format_relative(math.expm1(new_log - old_log) * 100),
+        ]
+
+    return row
+
+
+def key_mismatch_error(missing_in_new: list, missing_in_old: list) -> ValueError:
+    error_messages = []
+    if missing_in_new:
+        error_messages.append(f"Keys in old file but not in new: {missing_in_new}")
+    if missing_in_old:
+        error_messages.append(f"Keys in new file but not in old: {missing_in_old}")
+    return ValueError("Key mismatch between files.\n" + "\n".join(error_messages))
+
+
+def generate_diff(
+    old_data: dict,
+    new_data: dict,
+    key_columns: list,
+    metrics: list,
+    geomean: bool = False,
+) -> list:
     old_keys = set(old_data.keys())
     new_keys = set(new_data.keys())
 
     if old_keys != new_keys:
-        missing_in_new = sorted(list(old_keys - new_keys))
-        missing_in_old = sorted(list(new_keys - old_keys))
-        error_messages = []
-        if missing_in_new:
-            error_messages.append(f"Keys in old file but not in new: {missing_in_new}")
-        if missing_in_old:
-            error_messages.append(f"Keys in new file but not in old: {missing_in_old}")
-        raise ValueError("Key mismatch between files.\n" + "\n".join(error_messages))
-
-    output_rows = []
-    header = [
-        "test_suite_name",
-        "instructions_old",
-        "instructions_new",
-        "instructions_diff_absolute",
-        "instructions_diff_relative",
-        "cycles_old",
-        "cycles_new",
-        "cycles_diff_absolute",
-        "cycles_diff_relative",
-    ]
-    output_rows.append(header)
+        raise key_mismatch_error(
+            sorted(list(old_keys - new_keys)), sorted(list(new_keys - old_keys))
+        )
 
     sorted_keys = sorted(list(old_keys))
 
-    for key in sorted_keys:
-        old_row = old_data[key]
-        new_row = new_data[key]
-
-        inst_abs_diff = new_row.instructions - old_row.instructions
-        inst_rel_diff = (inst_abs_diff / old_row.instructions) * 100
-
-        cycles_abs_diff = new_row.cycles - old_row.cycles
-        cycles_rel_diff = (cycles_abs_diff / old_row.cycles) * 100
-
-        output_rows.append(
-            [
-                *key,
-                old_row.instructions,
-                new_row.instructions,
-                inst_abs_diff,
-                f"{inst_rel_diff:+.2f}%",
-                old_row.cycles,
-                new_row.cycles,
-                cycles_abs_diff,
-                f"{cycles_rel_diff:+.2f}%",
+    # Metric-major columns aligned by the sorted keys
+    old_columns = [
+        [old_data[key][i] for key in sorted_keys] for i in range(len(metrics))
+    ]
+    new_columns = [
+        [new_data[key][i] for key in sorted_keys] for i in range(len(metrics))
+    ]
+
+    output_columns = []
+    for old, new in zip(old_columns, new_columns):
+        absolute, relative = diff_columns(old, new)
+        output_columns += [old, new, absolute, list(map(format_relative, relative))]
+
+    output_rows = [diff_header(key_columns, metrics)]
+    for i, key in enumerate(sorted_keys):
+        output_rows.append([*key, *(column[i] for column in output_columns)])
+
+    if geomean:
+        output_rows.append(geomean_row(old_columns, new_columns, key_columns, metrics))
+
+    return output_rows
+
+
+def merge_join(
+    old_rows: Iterator[tuple[tuple, object]],
+    new_rows: Iterator[tuple[tuple, object]],
+) -> Iterator[tuple[tuple, object, object]]:
+    """
+    Merge-joins two streams sorted by the key.
+
+    The rows are yielded as they are joined, so a key mismatch
+    is only raised after all the matching rows.
+    """
+
+    missing_in_new = []
+    missing_in_old = []
+
+    old = next(old_rows, None)
+    new = next(new_rows, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            missing_in_new.append(old[0])
+            old = next(old_rows, None)
+        elif old is None or new[0] < old[0]:
+            missing_in_old.append(new[0])
+            new = next(new_rows, None)
+        else:
+            yield old[0], old[1], new[1]
+            old = next(old_rows, None)
+            new = next(new_rows, None)
+
+    if missing_in_new or missing_in_old:
+        raise key_mismatch_error(missing_in_new, missing_in_old)
+
+
+def generate_diff_streaming(
+    old_rows: Iterator[tuple[tuple, Values]],
+    new_rows: Iterator[tuple[tuple, Values]],
+    key_columns: list,
+    metrics: list,
+    geomean: bool = False,
+) -> Iterator[list]:
+    yield diff_header(key_columns, metrics)
+
+    # Running sums of logarithms for the geometric means
+    old_logs = [0.0] * len(metrics)
+    new_logs = [0.0] * len(metrics)
+    counts = [0] * len(metrics)
+
+    for key, old_values, new_values in merge_join(old_rows, new_rows):
+        row = [*key]
+        for i, (o, n) in enumerate(zip(old_values, new_values)):
+            row += [o, n, n - o, format_relative(relative_diff(o, n))]
+            if o > 0 and n > 0:
+                old_logs[i] += math.log(o)
+                new_logs[i] += math.log(n)
+                counts[i] += 1
+        yield row
+
+    if geomean:
+        row = ["geomean", *([""] * (len(key_columns) - 1))]
+        for old_log, new_log, count in zip(old_logs, new_logs, counts):
+            if count == 0:
+                row += ["", "", "", ""]
+                continue
+
+            old_log /= count
+            new_log /= count
+            row += [
+                f"{math.exp(old_log):.2f}",
+                f"{math.exp(new_log):.2f}",
+                "",
+                format_relative(math.expm1(new_log - old_log) * 100),
             ]
+        yield row
+
+
+def incomplete_beta(a: float, b: float, x: float) -> float:
+    """
+    The regularized incomplete beta function I_x(a, b)
+    by the continued fraction of Numerical Recipes.
+    """
+
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+
+    def continued_fraction(a: float, b: float, x: float) -> float:
+        tiny = 1e-300
+        c = 1.0
+        d = 1.0 - (a + b) * x / (a + 1)
+        d = 1.0 / (d if abs(d) > tiny else tiny)
+        h = d
+        for m in range(1, 300):
+            for numerator in [
+                m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+            ]:
+                d = 1.0 + numerator * d
+                d = 1.0 / (d if abs(d) > tiny else tiny)
+                c = 1.0 + numerator / c
+                c = c if abs(c) > tiny else tiny
+                h *= d * c
+            if abs(d * c - 1.0) < 1e-15:
+                break
+        return h
+
+    front = math.exp(
+        math.lgamma(a + b)
+        - math.lgamma(a)
+        - math.lgamma(b)
+        + a * math.log(x)
+        + b * math.log1p(-x)
+    )
+    if x < (a + 1) / (a + b + 2):
+        return front * continued_fraction(a, b, x) / a
+    return 1.0 - front * continued_fraction(b, a, 1.0 - x) / b
+
+
+def student_t_two_sided_p(t: float, df: float) -> float:
+    return incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+@functools.lru_cache(maxsize=4096)
+def student_t_quantile(q: float, df: float) -> float:
+    """
+    The t such that P(T <= t) = q for q in [0.5, 1), by bisection.
+    Cached, as every key and metric asks for the same few quantiles.
+    """
+
+    def cdf(t: float) -> float:
+        return 1.0 - student_t_two_sided_p(t, df) / 2
+
+    low, high = 0.0, 1.0
+    while cdf(high) < q:
+        low, high = high, high * 2
+    for _ in range(100):
+        middle = (low + high) / 2
+        if cdf(middle) < q:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+class Comparison(NamedTuple):
+    old_mean: float
+    old_stddev: float | None
+    new_mean: float
+    new_stddev: float | None
+    # Welch's t-test, `None` with less than two samples on a side
+    p_value: float | None
+    ci_half_width: float | None
+
+
+def welch_compare(old: list, new: list, alpha: float) -> Comparison:
+    old_mean = statistics.fmean(old)
+    new_mean = statistics.fmean(new)
+    old_stddev = statistics.stdev(old) if len(old) > 1 else None
+    new_stddev = statistics.stdev(new) if len(new) > 1 else None
+
+    if old_stddev is None or new_stddev is None:
+        return Comparison(old_mean, old_stddev, new_mean, new_stddev, None, None)
+
+    old_variance = old_stddev**2 / len(old)
+    new_variance = new_stddev**2 / len(new)
+    standard_error = math.sqrt(old_variance + new_variance)
+
+    if standard_error == 0:
+        p_value = 1.0 if old_mean == new_mean else 0.0
+        return Comparison(old_mean, old_stddev, new_mean, new_stddev, p_value, 0.0)
+
+    # Welch–Satterthwaite degrees of freedom
+    df = (old_variance + new_variance) ** 2 / (
+        old_variance**2 / (len(old) - 1) + new_variance**2 / (len(new) - 1)
+    )
+    t = (new_mean - old_mean) / standard_error
+
+    return Comparison(
+        old_mean,
+        old_stddev,
+        new_mean,
+        new_stddev,
+        student_t_two_sided_p(t, df),
+        # Rounded, so the quantile is reused for the same sample sizes
+        student_t_quantile(1 - alpha / 2, round(df, DF_DECIMALS)) * standard_error,
+    )
+
+
+def stats_header(key_columns: list, metrics: list) -> list:
+    header = [*key_columns, "repetitions_old", "repetitions_new"]
+    for metric in metrics:
+        header += [
+            f"{metric}_old_mean",
+            f"{metric}_old_stddev",
+            f"{metric}_new_mean",
+            f"{metric}_new_stddev",
+            f"{metric}_diff_relative",
+            f"{metric}_diff_ci",
+            f"{metric}_p_value",
+            f"{metric}_significant",
+        ]
+    return header
+
+
+def stats_row(key: tuple, old: list, new: list, alpha: float) -> list:
+    """
+    The relative diff of the means with the half-width of its confidence
+    interval relative to the old mean, and whether the diff is significant.
+    """
+
+    row = [*key, len(old), len(new)]
+    for old_values, new_values in zip(zip(*old), zip(*new)):
+        c = welch_compare(list(old_values), list(new_values), alpha)
+
+        ci = ""
+        if c.ci_half_width is not None and c.old_mean != 0:
+            ci = f"±{c.ci_half_width / abs(c.old_mean) * 100:.2f}%"
+
+        significant = ""
+        if c.p_value is not None:
+            significant = "yes" if c.p_value < alpha else "no"
+
+        row += [
+            c.old_mean,
+            "" if c.old_stddev is None else c.old_stddev,
+            c.new_mean,
+            "" if c.new_stddev is None else c.new_stddev,
+            format_relative(relative_diff(c.old_mean, c.new_mean)),
+            ci,
+            "" if c.p_value is None else f"{c.p_value:.4f}",
+            significant,
+        ]
+    return row
+
+
+def load_repetitions(
+    file_path: str, key_columns: list, metrics: list, emulator: str | None = None
+) -> dict:
+    if REPETITION_COLUMN not in read_header(file_path):
+        data = load_and_validate_csv(file_path, key_columns, metrics, emulator)
+        return {key: [values] for key, values in data.items()}
+
+    data = load_and_validate_csv(
+        file_path, key_columns + [REPETITION_COLUMN], metrics, emulator
+    )
+    repetitions = {}
+    for key, values in data.items():
+        repetitions.setdefault(key[:-1], []).append(values)
+    return repetitions
+
+
+def sorted_repetitions(
+    file_path: str, key_columns: list, metrics: list, emulator: str | None = None
+) -> Iterator[tuple[tuple, list]]:
+    if REPETITION_COLUMN not in read_header(file_path):
+        for key, values in sorted_rows(file_path, key_columns, metrics, emulator):
+            yield key, [values]
+        return
+
+    # The repetitions of a key are adjacent when sorted by the key first
+    rows = sorted_rows(file_path, key_columns + [REPETITION_COLUMN], metrics, emulator)
+    for key, group in itertools.groupby(rows, key=lambda row: row[0][:-1]):
+        yield key, [values for _, values in group]
+
+
+def generate_stats(
+    old_data: dict,
+    new_data: dict,
+    key_columns: list,
+    metrics: list,
+    alpha: float,
+) -> list:
+    old_keys = set(old_data.keys())
+    new_keys = set(new_data.keys())
+
+    if old_keys != new_keys:
+        raise key_mismatch_error(
+            sorted(list(old_keys - new_keys)), sorted(list(new_keys - old_keys))
         )
 
+    output_rows = [stats_header(key_columns, metrics)]
+    for key in sorted(list(old_keys)):
+        output_rows.append(stats_row(key, old_data[key], new_data[key], alpha))
+
     return output_rows
 
 
-def write_csv_to_stdout(data: list):
+def generate_stats_streaming(
+    old_rows: Iterator[tuple[tuple, list]],
+    new_rows: Iterator[tuple[tuple, list]],
+    key_columns: list,
+    metrics: list,
+    alpha: float,
+) -> Iterator[list]:
+    yield stats_header(key_columns, metrics)
+
+    for key, old, new in merge_join(old_rows, new_rows):
+        yield stats_row(key, old, new, alpha)
+
+
+def write_csv_to_stdout(data: Iterator[list]):
     writer = csv.writer(sys.stdout)
     writer.writerows(data)
 
@@ -138,10 +750,69 @@ if __name__ == "__main__":
         args = parse_args()
 
         key_columns = ["test_suite_name"]
-        old_data = load_and_validate_csv(args.old_path, key_columns)
-        new_data = load_and_validate_csv(args.new_path, key_columns)
 
-        result_data = generate_diff(old_data, new_data)
+        # Results of an emulator matrix are compared per emulator,
+        # unless the emulators to compare are chosen explicitly
+        is_emulator_chosen = args.old_emulator or args.new_emulator
+        if not is_emulator_chosen and all(
+            "emulator" in read_header(path) for path in [args.old_path, args.new_path]
+        ):
+            key_columns.append("emulator")
+
+        # Repeated runs are compared statistically
+        is_repeated = any(
+            REPETITION_COLUMN in read_header(path)
+            for path in [args.old_path, args.new_path]
+        )
+
+        metrics = args.metrics or metric_columns(
+            [args.old_path, args.new_path], key_columns, is_repeated
+        )
+        if is_repeated and args.geomean:
+            raise ValueError("--geomean is not supported for repeated runs.")
+
+        if is_repeated and args.streaming:
+            result_data = generate_stats_streaming(
+                sorted_repetitions(
+                    args.old_path, key_columns, metrics, args.old_emulator
+                ),
+                sorted_repetitions(
+                    args.new_path, key_columns, metrics, args.new_emulator
+                ),
+                key_columns,
+                metrics,
+                args.alpha,
+            )
+        elif is_repeated:
+            old_data = load_repetitions(
+                args.old_path, key_columns, metrics, args.old_emulator
+            )
+            new_data = load_repetitions(
+                args.new_path, key_columns, metrics, args.new_emulator
+            )
+
+            result_data = generate_stats(
+                old_data, new_data, key_columns, metrics, args.alpha
+            )
+        elif args.streaming:
+            result_data = generate_diff_streaming(
+                sorted_rows(args.old_path, key_columns, metrics, args.old_emulator),
+                sorted_rows(args.new_path, key_columns, metrics, args.new_emulator),
+                key_columns,
+                metrics,
+                args.geomean,
+            )
+        else:
+            old_data = load_and_validate_csv(
+                args.old_path, key_columns, metrics, args.old_emulator
+            )
+            new_data = load_and_validate_csv(
+                args.new_path, key_columns, metrics, args.new_emulator
+            )
+
+            result_data = generate_diff(
+                old_data, new_data, key_columns, metrics, args.geomean
+            )
 
         write_csv_to_stdout(result_data)
 
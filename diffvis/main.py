@@ -7,6 +7,9 @@ import argparse
 import sys
 import csv
 import html
+import json
+import math
+import re
 from datetime import datetime
 
 COLUMN_MAP = {
@@ -28,6 +31,22 @@ COLOR_CODED_COLUMNS = {
     "cycles_diff_relative",
 }
 
+COLOR_CODED_SUFFIXES = ("_diff_absolute", "_diff_relative")
+
+# Cells short enough for a double to keep all of their digits
+MAX_NUMBER_LENGTH = 15
+
+# Rows buffered before they are written out
+CHUNK_ROWS = 4096
+
+# Where the rows go in a template
+BODY_MARKER = "<!-- rows -->"
+
+
+def is_color_coded(column):
+    return column in COLOR_CODED_COLUMNS or column.endswith(COLOR_CODED_SUFFIXES)
+
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html lang="en">
@@ -163,8 +182,359 @@ HTML_TEMPLATE = """
 </html>
 """
 
+VIRTUAL_HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>SimuBen Report {time}</title>
+    <style>
+        body {{
+            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif;
+            margin: 0;
+            background-color: #f8f9fa;
+            color: #212529;
+        }}
+        .container {{
+            max-width: 1200px;
+            margin: 20px auto;
+            padding: 20px;
+            background-color: #ffffff;
+            border-radius: 8px;
+            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
+        }}
+        h1 {{
+            color: #343a40;
+            border-bottom: 2px solid #dee2e6;
+            padding-bottom: 10px;
+        }}
+        .toolbar {{
+            display: flex;
+            gap: 12px;
+            align-items: center;
+            margin-top: 20px;
+        }}
+        .toolbar input {{
+            flex: 1;
+            padding: 8px 10px;
+            font-size: inherit;
+            border: 1px solid #ced4da;
+            border-radius: 4px;
+        }}
+        .toolbar span {{
+            color: #6c757d;
+            white-space: nowrap;
+        }}
+        .viewport {{
+            height: 70vh;
+            overflow: auto;
+            margin-top: 12px;
+            border: 1px solid #dee2e6;
+        }}
+        table {{
+            width: 100%;
+            border-collapse: collapse;
+        }}
+        th, td {{
+            padding: 0 15px;
+            height: 40px;
+            box-sizing: border-box;
+            border: 1px solid #dee2e6;
+            text-align: left;
+            vertical-align: middle;
+            white-space: nowrap;
+        }}
+        thead th {{
+            position: sticky;
+            top: 0;
+            background-color: #e9ecef;
+            z-index: 1;
+        }}
+        th button {{
+            background: none;
+            border: none;
+            font-weight: bold;
+            font-size: inherit;
+            font-family: inherit;
+            cursor: pointer;
+            padding: 0;
+            margin: 0;
+            text-align: left;
+            width: 100%;
+            display: flex;
+            justify-content: space-between;
+            align-items: center;
+        }}
+        th button .sort-indicator {{
+            color: #adb5bd;
+            min-width: 1em;
+        }}
+        tbody tr td:first-child {{
+            font-weight: bold;
+        }}
+        tbody tr.spacer td {{
+            height: auto;
+            padding: 0;
+            border: none;
+        }}
+        .positive {{
+            color: #d9534f;
+        }}
+        .negative {{
+            color: #5cb85c;
+        }}
+        .neutral {{
+            color: #6c757d;
+        }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>SimuBen Report {time}</h1>
+        <div class="toolbar">
+            <input id="filter" type="search" placeholder="Filter by text, or by a column like cycles_diff_relative &gt; 5">
+            <span id="count"></span>
+        </div>
+        <div class="viewport" id="viewport">
+            <table id="benchmarkTable">
+                <thead><tr></tr></thead>
+                <tbody></tbody>
+            </table>
+        </div>
+        <p><var>{old}</var> (old) vs <var>{new}</var> (new)</p>
+    </div>
+    {data}
+    <script>
+        // Only the rows in view are in the DOM; sorting and filtering
+        // permute an index array over the typed columns.
+        const report = JSON.parse(document.getElementById('reportMeta').textContent);
+        const chunks = Array.from(
+            document.querySelectorAll('script.reportChunk'),
+            script => JSON.parse(script.textContent)
+        );
+        const OVERSCAN = 20;
+
+        // The rows come in chunks of `chunkRows`, each column of a chunk
+        // with its own kind and format, so they are merged per column.
+        const rowCount = chunks.reduce((count, chunk) => count + chunk.rows, 0);
+        const columns = report.header.map((name, i) => {{
+            const parts = chunks.map(chunk => chunk.columns[i]);
+            if (parts.every(part => part.kind === 'number')) {{
+                const values = new Float64Array(rowCount);
+                let offset = 0;
+                parts.forEach((part, j) => {{
+                    part.values.forEach((value, k) => {{
+                        values[offset + k] = value === null ? NaN : value;
+                    }});
+                    offset += chunks[j].rows;
+                }});
+                return {{kind: 'number', colored: report.colored[i], values: values, parts: parts}};
+            }}
+
+            const values = [];
+            for (const part of parts) {{
+                for (let k = 0; k < part.values.length; k++) {{
+                    values.push(part.kind === 'string' ? part.values[k] : partText(part, k));
+                }}
+            }}
+            return {{kind: 'string', values: values}};
+        }});
+
+        const viewport = document.getElementById('viewport');
+        const table = document.getElementById('benchmarkTable');
+        const tbody = table.tBodies[0];
+        const filterInput = document.getElementById('filter');
+        const count = document.getElementById('count');
+
+        let rowHeight = 40;
+        let order = new Uint32Array(rowCount).map((_, i) => i);
+        let view = order;
+        let sortState = null;
+
+        function escapeHtml(text) {{
+            return text.replace(/[&<>"']/g, c => (
+                {{'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}}[c]
+            ));
+        }}
+
+        function partText(part, k) {{
+            if (part.text) {{
+                return part.text[k];
+            }}
+            const value = part.values[k];
+            if (value === null) {{
+                return '';
+            }}
+            const text = Number.isFinite(value)
+                ? value.toFixed(part.format.decimals)
+                : value < 0 ? '-inf' : 'inf';
+            // A negative zero keeps its sign, as it was printed
+            const sign = Object.is(value, -0) ? '-' : part.format.plus && value >= 0 ? '+' : '';
+            return sign + text + part.format.suffix;
+        }}
+
+        function cellText(column, row) {{
+            if (column.kind === 'string') {{
+                return column.values[row];
+            }}
+            const chunk = Math.floor(row / report.chunkRows);
+            return partText(column.parts[chunk], row - chunk * report.chunkRows);
+        }}
+
+        function cellClass(column, row) {{
+            if (!column.colored || column.kind !== 'number') {{
+                return '';
+            }}
+            const value = column.values[row];
+            if (Number.isNaN(value)) {{
+                return '';
+            }}
+            if (value > 0) {{
+                return ' class="positive"';
+            }}
+            return value < 0 ? ' class="negative"' : ' class="neutral"';
+        }}
+
+        function render() {{
+            const top = viewport.scrollTop;
+            const visible = Math.ceil(viewport.clientHeight / rowHeight);
+            const first = Math.max(0, Math.floor(top / rowHeight) - OVERSCAN);
+            const last = Math.min(view.length, first + visible + 2 * OVERSCAN);
+
+            const parts = [];
+            parts.push(`<tr class="spacer"><td colspan="${{columns.length}}" style="height:${{first * rowHeight}}px"></td></tr>`);
+            for (let i = first; i < last; i++) {{
+                const row = view[i];
+                parts.push('<tr>');
+                for (const column of columns) {{
+                    parts.push(`<td${{cellClass(column, row)}}>${{escapeHtml(cellText(column, row))}}</td>`);
+                }}
+                parts.push('</tr>');
+            }}
+            parts.push(`<tr class="spacer"><td colspan="${{columns.length}}" style="height:${{(view.length - last) * rowHeight}}px"></td></tr>`);
+            tbody.innerHTML = parts.join('');
+
+            const sample = tbody.rows[1];
+            if (sample && sample.offsetHeight && sample.offsetHeight !== rowHeight && last > first) {{
+                rowHeight = sample.offsetHeight;
+                render();
+            }}
+        }}
+
+        function sortKeys(column) {{
+            if (column.kind === 'number') {{
+                return column.values;
+            }}
+            // Strings are ranked once, so sorting compares integers
+            if (!column.ranks) {{
+                const collator = new Intl.Collator(undefined, {{numeric: true}});
+                const unique = Array.from(new Set(column.values)).sort(collator.compare);
+                const rank = new Map(unique.map((value, i) => [value, i]));
+                column.ranks = Uint32Array.from(column.values, value => rank.get(value));
+            }}
+            return column.ranks;
+        }}
+
+        function sortTable(columnIndex) {{
+            const direction = sortState && sortState.column === columnIndex && sortState.direction === -1 ? 1 : -1;
+            sortState = {{column: columnIndex, direction: direction}};
+
+            // Missing values go last in both directions
+            const keys = Float64Array.from(
+                sortKeys(columns[columnIndex]),
+                key => Number.isNaN(key) ? direction * Infinity : key
+            );
+            order.sort((a, b) => (keys[a] - keys[b]) * direction || a - b);
+
+            table.tHead.querySelectorAll('.sort-indicator').forEach(span => {{
+                span.textContent = '';
+            }});
+            const indicator = table.tHead.rows[0].cells[columnIndex].querySelector('.sort-indicator');
+            indicator.textContent = direction === -1 ? '▲' : '▼';
+
+            applyFilter();
+        }}
+
+        const COMPARISONS = {{
+            '<': (x, y) => x < y,
+            '<=': (x, y) => x <= y,
+            '>': (x, y) => x > y,
+            '>=': (x, y) => x >= y,
+            '=': (x, y) => x === y,
+            '!=': (x, y) => x !== y,
+        }};
+
+        function filterPredicate(query) {{
+            query = query.trim();
+            if (query === '') {{
+                return null;
+            }}
+
+            const match = query.match(/^(\\S+)\\s*(<=|>=|!=|<|>|=)\\s*(\\S+)$/);
+            if (match) {{
+                const index = report.header.indexOf(match[1]);
+                const value = parseFloat(match[3]);
+                if (index !== -1 && columns[index].kind === 'number' && !Number.isNaN(value)) {{
+                    const values = columns[index].values;
+                    const compare = COMPARISONS[match[2]];
+                    return row => compare(values[row], value);
+                }}
+            }}
+
+            const needle = query.toLowerCase();
+            const strings = columns.filter(column => column.kind === 'string').map(column => {{
+                if (!column.lower) {{
+                    column.lower = column.values.map(value => value.toLowerCase());
+                }}
+                return column.lower;
+            }});
+            return row => strings.some(values => values[row].includes(needle));
+        }}
+
+        function applyFilter() {{
+            const predicate = filterPredicate(filterInput.value);
+            view = predicate === null ? order : order.filter(predicate);
+            count.textContent = `${{view.length}} of ${{rowCount}} rows`;
+            render();
+        }}
+
+        const headRow = table.tHead.rows[0];
+        report.header.forEach((name, i) => {{
+            const th = document.createElement('th');
+            th.innerHTML = `<button><span>${{escapeHtml(report.labels[i])}}</span><span class="sort-indicator"></span></button>`;
+            th.firstChild.addEventListener('click', () => sortTable(i));
+            headRow.appendChild(th);
+        }});
+
+        let frame = null;
+        viewport.addEventListener('scroll', () => {{
+            if (frame === null) {{
+                frame = requestAnimationFrame(() => {{
+                    frame = null;
+                    render();
+                }});
+            }}
+        }});
+        window.addEventListener('resize', render);
+
+        let debounce = null;
+        filterInput.addEventListener('input', () => {{
+            clearTimeout(debounce);
+            debounce = setTimeout(() => {{
+                viewport.scrollTop = 0;
+                applyFilter();
+            }}, 150);
+        }});
+
+        applyFilter();
+    </script>
+</body>
+</html>
+"""
+
 
-def generate_table_parts(header, data):
+def generate_table_head(header):
     theads = ["<thead><tr>"]
     for i, col_name in enumerate(header):
         display_name = COLUMN_MAP.get(col_name) or col_name
@@ -174,13 +544,14 @@ def generate_table_parts(header, data):
             f'<span class="sort-indicator"></span></button></th>'
         )
     theads.append("</tr></thead>")
-    table_head = "".join(theads)
+    return "".join(theads)
 
-    tbodys = ["<tbody>"]
-    color_coded_indices = {i for i, h in enumerate(header) if h in COLOR_CODED_COLUMNS}
 
-    for row in data:
-        tbodys.append("<tr>")
+def generate_table_rows(header, rows):
+    color_coded_indices = {i for i, h in enumerate(header) if is_color_coded(h)}
+
+    for row in rows:
+        tbodys = ["<tr>"]
         for i, cell_value in enumerate(row):
             class_attr = ""
             if i in color_coded_indices:
@@ -196,10 +567,151 @@ def generate_table_parts(header, data):
                     pass
             tbodys.append(f"<td{class_attr}>{html.escape(cell_value)}</td>")
         tbodys.append("</tr>")
-    tbodys.append("</tbody>")
-    table_body = "".join(tbodys)
+        yield "".join(tbodys)
+
+
+def parse_number(cell):
+    try:
+        return float(cell.removesuffix("%"))
+    except ValueError:
+        return None
+
+
+def number_format(cells):
+    """
+    The format the page prints the numeric cells back with:
+    the decimals, a plus sign and a percent suffix. None if the cells
+    do not share one, so their text is embedded as is.
 
-    return table_head, table_body
+    The column is checked as a whole with a single regex.
+    """
+
+    first = next((cell for cell in cells if cell != ""), None)
+    if first is None or max(map(len, cells)) > MAX_NUMBER_LENGTH:
+        return None
+
+    suffix = "%" if first.endswith("%") else ""
+    first = next((c for c in cells if c != "" and "inf" not in c), first)
+    _, dot, fraction = first.removesuffix(suffix).partition(".")
+    decimals = len(fraction) if dot else 0
+
+    non_negative = next((c for c in cells if c != "" and c[0] != "-"), "")
+    plus = non_negative.startswith("+")
+
+    fraction = rf"\.\d{{{decimals}}}" if decimals else ""
+    sign = r"[+-]" if plus else "-?"
+    # Infinities of zero baselines are kept
+    cell = rf"(?:{sign}(?:(?:0|[1-9]\d*){fraction}|inf){re.escape(suffix)}|)"
+
+    text = "\n".join(cells)
+    if text.count("\n") != len(cells) - 1:
+        return None
+    if re.fullmatch(rf"{cell}(?:\n{cell})*", text) is None:
+        return None
+
+    return {"decimals": decimals, "plus": plus, "suffix": suffix}
+
+
+def numbers_json(cells, format):
+    """
+    The cells matching `format` as JSON numbers, translated textually.
+    """
+
+    text = "\n".join(cells)
+    if format["suffix"]:
+        text = text.replace(format["suffix"], "")
+    # Parsed as Infinity by JSON.parse
+    text = text.replace("+", "").replace("inf", "1e999")
+    text = re.sub(r"(?m)^$", "null", text)
+    return text.replace("\n", ",")
+
+
+def number_json(value):
+    if value is None or math.isnan(value):
+        return "null"
+    if math.isinf(value):
+        return "1e999" if value > 0 else "-1e999"
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def generate_column(cells):
+    format = number_format(cells)
+    if format is not None:
+        return '{"kind":"number","values":[%s],"format":%s}' % (
+            numbers_json(cells, format),
+            json.dumps(format, separators=(",", ":")),
+        )
+
+    values = [parse_number(cell) for cell in cells]
+    if any(value is None and cell != "" for value, cell in zip(values, cells)):
+        return json.dumps(
+            {"kind": "string", "values": cells},
+            separators=(",", ":"),
+        )
+
+    return '{"kind":"number","values":[%s],"text":%s}' % (
+        ",".join(number_json(value) for value in values),
+        json.dumps(cells, separators=(",", ":")),
+    )
+
+
+def script_json(id_or_class, text):
+    # Keep the script element from being closed by the data
+    return '<script type="application/json" %s>%s</script>' % (
+        id_or_class,
+        text.replace("</", "<\\/"),
+    )
+
+
+def generate_report_meta(header):
+    meta = {
+        "header": header,
+        "labels": [COLUMN_MAP.get(name) or name for name in header],
+        "colored": [is_color_coded(name) for name in header],
+        "chunkRows": CHUNK_ROWS,
+    }
+    return script_json('id="reportMeta"', json.dumps(meta, separators=(",", ":")))
+
+
+def generate_report_chunk(header, rows):
+    """
+    A chunk of the table as JSON columns: numbers where every cell parses
+    as one, so the page sorts and filters them as typed arrays.
+    """
+
+    columns = [[] for _ in header]
+    for row in rows:
+        for i, column in enumerate(columns):
+            column.append(row[i] if i < len(row) else "")
+
+    chunk = '{"rows":%d,"columns":[%s]}' % (
+        len(rows),
+        ",".join(generate_column(cells) for cells in columns),
+    )
+    return script_json('class="reportChunk"', chunk)
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if len(chunk) != 0:
+        yield chunk
+
+
+def read_rows(file):
+    """
+    Rows of the CSV read incrementally, without the blank lines.
+    """
+
+    for row in csv.reader(file):
+        if len(row) != 0:
+            yield row
 
 
 def parse_args():
@@ -214,6 +726,12 @@ def parse_args():
         "--new-tag",
         required=True,
     )
+    parser.add_argument(
+        "--virtual",
+        action="store_true",
+        help="Embed the table as data and render only the visible rows, "
+        "for large diffs.",
+    )
     return parser.parse_args()
 
 
@@ -221,31 +739,44 @@ if __name__ == "__main__":
     try:
         args = parse_args()
 
-        csv_content = sys.stdin.read()
+        # Both the input and the report are streamed, chunk by chunk,
+        # so memory does not grow with the size of the diff.
+        rows = read_rows(sys.stdin)
 
-        if not csv_content.strip():
+        header = next(rows, None)
+        if header is None:
             print("Error: Received empty input from stdin.", file=sys.stderr)
             sys.exit(1)
 
-        reader = csv.reader(csv_content.strip().splitlines())
+        time = datetime.now().strftime("%Y-%m-%d %H:%M")
 
-        header = next(reader)
-        data = list(reader)
+        if args.virtual:
+            page = VIRTUAL_HTML_TEMPLATE.format(
+                data=BODY_MARKER,
+                time=time,
+                old=html.escape(args.old_tag),
+                new=html.escape(args.new_tag),
+            )
+        else:
+            page = HTML_TEMPLATE.format(
+                table_head=generate_table_head(header),
+                table_body=f"<tbody>{BODY_MARKER}</tbody>",
+                time=time,
+                old=args.old_tag,
+                new=args.new_tag,
+            )
+        head, _, tail = page.partition(BODY_MARKER)
 
-        table_head, table_body = generate_table_parts(header, data)
+        sys.stdout.write(head)
+        if args.virtual:
+            sys.stdout.write(generate_report_meta(header))
+            for chunk in chunked(rows, CHUNK_ROWS):
+                sys.stdout.write(generate_report_chunk(header, chunk))
+        else:
+            for chunk in chunked(generate_table_rows(header, rows), CHUNK_ROWS):
+                sys.stdout.write("".join(chunk))
+        sys.stdout.write(tail + "\n")
 
-        final_html = HTML_TEMPLATE.format(
-            table_head=table_head,
-            table_body=table_body,
-            time=datetime.now().strftime("%Y-%m-%d %H:%M"),
-            old=args.old_tag,
-            new=args.new_tag,
-        )
-        print(final_html)
-
-    except StopIteration:
-        print("Error: CSV input is empty or contains only a header.", file=sys.stderr)
-        sys.exit(1)
     except Exception as e:
         print(f"An unexpected error occurred: {e}", file=sys.stderr)
         sys.exit(1)
@@ -1,7 +1,10 @@
 from argparse import ArgumentParser
 from pathlib import Path
 
+from compression import SUFFIXES
 from config import ExportConfig, SimuBenConfig, SimuBenInput
+from simpoint.config import SimPointConfig
+from verilator.log import VerilatorPerfFilter
 from verilator.log_export import CSVConfig
 
 
@@ -37,6 +40,59 @@ def get_input() -> SimuBenInput:
         action="store_true",
         help="Do not show a header for csv output.",
     )
+    parser.add_argument(
+        "--perf-include",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Perf counters to keep, globs or regexes prefixed with 're:'.",
+    )
+    parser.add_argument(
+        "--perf-exclude",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Perf counters to drop, globs or regexes prefixed with 're:'.",
+    )
+    parser.add_argument(
+        "--perf-archive",
+        action="store_true",
+        help="Also write the perf log as a binary archive.",
+    )
+    parser.add_argument(
+        "--compress",
+        type=str,
+        choices=list(SUFFIXES),
+        help="Compress the logs with the given algorithm.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="A wall-clock budget in seconds for each emulator run.",
+    )
+    parser.add_argument(
+        "--simpoint",
+        action="store_true",
+        help="Run only the SimPoint intervals on Verilator and estimate the cycles.",
+    )
+    parser.add_argument(
+        "--simpoint-interval",
+        type=int,
+        help="Instructions per SimPoint interval.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Parallel Verilator runs of the SimPoint intervals.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        type=str,
+        default="/tmp",
+        help="A directory to write the logs to.",
+    )
 
     args = parser.parse_args()
 
@@ -47,11 +103,51 @@ def get_input() -> SimuBenInput:
             CSVConfig(
                 core_number=args.csv_core_number,
                 is_header_hidden=args.csv_no_header,
+            ),
+            perf_archive=args.perf_archive or config.export.perf_archive,
+            compression=args.compress or config.export.compression,
+        )
+    )
+
+    config = config._replace(
+        verilator=tuple(
+            verilator._replace(
+                perf_filter=VerilatorPerfFilter(
+                    include=verilator.perf_filter.include + tuple(args.perf_include),
+                    exclude=verilator.perf_filter.exclude + tuple(args.perf_exclude),
+                )
             )
+            for verilator in config.verilator
         )
     )
 
+    if args.timeout is not None:
+        config = config._replace(
+            verilator=tuple(
+                verilator._replace(
+                    budget=verilator.budget._replace(wall_time_s=args.timeout)
+                )
+                for verilator in config.verilator
+            ),
+            nemu=tuple(
+                nemu._replace(budget=nemu.budget._replace(wall_time_s=args.timeout))
+                for nemu in config.nemu
+            ),
+        )
+
+    if args.simpoint and config.simpoint is None:
+        config = config._replace(simpoint=SimPointConfig())
+
+    if config.simpoint is not None:
+        if args.simpoint_interval is not None:
+            config = config._replace(
+                simpoint=config.simpoint._replace(interval=args.simpoint_interval)
+            )
+        if args.jobs is not None:
+            config = config._replace(simpoint=config.simpoint._replace(jobs=args.jobs))
+
     return SimuBenInput(
         config=config,
         sources=[Path(_) for _ in args.sources],
+        output_dir=Path(args.output_dir),
     )
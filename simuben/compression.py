@@ -0,0 +1,131 @@
+import gzip
+import io
+from pathlib import Path
+from queue import Queue
+import threading
+from typing import Any, Literal, TextIO
+import zlib
+
+Compression = Literal["gzip", "zstd"]
+
+SUFFIXES: dict[Compression, str] = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+
+def compressed_path(path: Path, compression: Compression | None) -> Path:
+    if compression is None:
+        return path
+    return path.with_name(path.name + SUFFIXES[compression])
+
+
+class CompressedWriter(io.TextIOBase):
+    """
+    A text file that is compressed on a background thread.
+
+    Text is gathered into chunks that are handed over through a bounded
+    queue, so the writer is slowed down only when the encoder falls behind.
+    Both zlib and zstd release the GIL while compressing.
+    """
+
+    CHUNK_SIZE = 1 << 20
+    QUEUE_SIZE = 16
+
+    def __init__(self, path: Path, compression: Compression) -> None:
+        self.__compressor = _compressor(compression)
+        self.__file = open(path, "wb")
+        self.__chunk: list[str] = []
+        self.__chunk_size = 0
+        self.__queue: Queue[bytes | None] = Queue(self.QUEUE_SIZE)
+        self.__error: BaseException | None = None
+        self.__thread = threading.Thread(target=self.__encode, daemon=True)
+        self.__thread.start()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self.__chunk.append(text)
+        self.__chunk_size += len(text)
+        if self.__chunk_size >= self.CHUNK_SIZE:
+            self.__submit()
+        return len(text)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+
+        # The encoder is stopped and the file closed even after an error
+        try:
+            self.__submit()
+        finally:
+            try:
+                self.__queue.put(None)
+                self.__thread.join()
+                self.__file.close()
+            finally:
+                super().close()
+
+        if self.__error is not None:
+            raise self.__error
+
+    def __submit(self) -> None:
+        if self.__error is not None:
+            raise self.__error
+
+        if len(self.__chunk) != 0:
+            self.__queue.put("".join(self.__chunk).encode())
+            self.__chunk = []
+            self.__chunk_size = 0
+
+    def __encode(self) -> None:
+        try:
+            while (chunk := self.__queue.get()) is not None:
+                self.__file.write(self.__compressor.compress(chunk))
+            self.__file.write(self.__compressor.flush())
+        except BaseException as e:
+            self.__error = e
+            # Keep draining, so the writer is never blocked on a full queue
+            while self.__queue.get() is not None:
+                pass
+
+
+def compressed_open(path: Path, compression: Compression | None) -> io.TextIOBase:
+    if compression is None:
+        return open(path, "w")
+    return CompressedWriter(path, compression)
+
+
+def compressed_read(path: Path, newline: str | None = None) -> TextIO:
+    """
+    Opens a text file, `.gz` and `.zst` ones are decompressed on the fly.
+    """
+
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", newline=newline, encoding="utf-8")
+
+    if path.suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd decompression requires the 'zstandard' package")
+
+        reader = zstandard.ZstdDecompressor().stream_reader(
+            open(path, "rb"), closefd=True
+        )
+        return io.TextIOWrapper(reader, newline=newline, encoding="utf-8")
+
+    return open(path, "r", newline=newline, encoding="utf-8")
+
+
+def _compressor(compression: Compression) -> Any:
+    if compression == "gzip":
+        return zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd compression requires the 'zstandard' package")
+
+    return zstandard.ZstdCompressor().compressobj()
@@ -1,44 +1,172 @@
 from pathlib import Path
-from typing import NamedTuple
+import re
+from typing import Any, Callable, NamedTuple, TypeVar
 import yaml
 
-from nexus_am.config import NexusAMConfig
-from nemu.config import NEMUConfig
+from compression import SUFFIXES, Compression
+from monitor import RunBudget
+from nexus_am.config import NexusAMCacheConfig, NexusAMConfig
+from nemu.config import NEMUCheckpointConfig, NEMUConfig
+from simpoint.config import SimPointConfig
 from verilator.log_export import CSVConfig
 from verilator.config import VerilatorConfig
+from verilator.log import VerilatorPerfFilter
 
 
 class ExportConfig(NamedTuple):
     csv: CSVConfig
+    perf_archive: bool = False
+    compression: Compression | None = None
+
+
+Emulator = TypeVar("Emulator", VerilatorConfig, NEMUConfig)
+
+
+def _compression_from_yaml(value: Any) -> Compression | None:
+    if value is not None and value not in SUFFIXES:
+        raise ValueError(
+            f"Unknown compression '{value}', expected one of {', '.join(SUFFIXES)}"
+        )
+    return value
+
+
+def _verilator_from_yaml(yml: dict[str, Any]) -> VerilatorConfig:
+    return VerilatorConfig(
+        executable_path=Path(yml["path"]),
+        name=yml.get("name"),
+        perf_filter=VerilatorPerfFilter(
+            **{
+                key: tuple(patterns)
+                for key, patterns in yml.get("perf_filter", {}).items()
+            }
+        ),
+        budget=RunBudget(**yml.get("budget", {})),
+    )
+
+
+def _nemu_from_yaml(yml: dict[str, Any]) -> NEMUConfig:
+    return NEMUConfig(
+        executable_path=Path(yml["path"]),
+        name=yml.get("name"),
+        budget=RunBudget(**yml.get("budget", {})),
+    )
+
+
+def _checkpoint_from_yaml(
+    yml: dict[str, Any], nexus_am: NexusAMConfig
+) -> NEMUCheckpointConfig:
+    """
+    Checkpoints are cached next to the app builds, or in the scratch space.
+    """
+
+    if ("instructions" in yml) == ("marker" in yml):
+        raise ValueError("A checkpoint is taken at either 'instructions' or 'marker'")
+
+    if "path" in yml:
+        path = Path(yml["path"])
+    elif nexus_am.cache is not None:
+        path = nexus_am.cache.path / "checkpoint"
+    else:
+        path = nexus_am.scratch_path / "checkpoint"
+
+    marker = yml.get("marker")
+    return NEMUCheckpointConfig(
+        path=path,
+        instructions=yml.get("instructions"),
+        # A PC, usually written in hex
+        marker=int(str(marker), 0) if marker is not None else None,
+        nemu=yml.get("nemu"),
+        max_size=yml.get("max_size", NEMUCheckpointConfig._field_defaults["max_size"]),
+    )
+
+
+def _emulators_from_yaml(
+    yml: dict[str, Any] | list[dict[str, Any]] | None,
+    parse: Callable[[dict[str, Any]], Emulator],
+) -> tuple[Emulator, ...]:
+    """
+    A single emulator is a mapping, and a matrix of them is a list
+    of mappings, each with a unique `name`. The names tag the artifact
+    file names, so they are restricted to letters, digits, `_` and `-`.
+    """
+
+    if yml is None:
+        return ()
+
+    if isinstance(yml, dict):
+        return (parse(yml)._replace(name=None),)
+
+    emulators = tuple(parse(_) for _ in yml)
+
+    names = [_.name for _ in emulators]
+    if None in names or len(set(names)) != len(names):
+        raise ValueError(f"Emulators of a matrix must have unique names: {names}")
+
+    for name in names:
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", str(name)):
+            raise ValueError(
+                f"Emulator name '{name}' may only contain letters, digits, '_' and '-'"
+            )
+
+    return emulators
 
 
 class SimuBenConfig(NamedTuple):
     nexus_am: NexusAMConfig
-    verilator: VerilatorConfig | None = None
-    nemu: NEMUConfig | None = None
+    verilator: tuple[VerilatorConfig, ...] = ()
+    nemu: tuple[NEMUConfig, ...] = ()
     export: ExportConfig = ExportConfig(csv=CSVConfig())
+    # Sampled simulation, Verilator runs the whole app without it
+    simpoint: SimPointConfig | None = None
+    # The start of the region of interest of whole-app Verilator runs
+    checkpoint: NEMUCheckpointConfig | None = None
 
     @classmethod
     def from_yaml_file(cls, path: Path):
         with open(path, "r") as f:
             yml = yaml.safe_load(f)
-            return SimuBenConfig(
-                nexus_am=NexusAMConfig(
-                    path=Path(yml["nexus_am"]["path"]),
-                    toolchain_path=Path(yml["nexus_am"]["toolchain_path"]),
-                ),
-                verilator=(
-                    VerilatorConfig(
-                        executable_path=Path(yml["verilator"]["path"]),
+            nexus_am = NexusAMConfig(
+                path=Path(yml["nexus_am"]["path"]),
+                toolchain_path=Path(yml["nexus_am"]["toolchain_path"]),
+                cache=(
+                    NexusAMCacheConfig(
+                        path=Path(yml["nexus_am"]["cache"]["path"]),
+                        max_size=yml["nexus_am"]["cache"].get(
+                            "max_size",
+                            NexusAMCacheConfig._field_defaults["max_size"],
+                        ),
                     )
-                    if "verilator" in yml
+                    if "cache" in yml["nexus_am"]
                     else None
                 ),
-                nemu=(
-                    NEMUConfig(
-                        executable_path=Path(yml["nemu"]["path"]),
+                scratch_path=Path(
+                    yml["nexus_am"].get(
+                        "scratch_path",
+                        NexusAMConfig._field_defaults["scratch_path"],
                     )
-                    if "nemu" in yml
+                ),
+            )
+            return SimuBenConfig(
+                nexus_am=nexus_am,
+                verilator=_emulators_from_yaml(
+                    yml.get("verilator"), _verilator_from_yaml
+                ),
+                nemu=_emulators_from_yaml(yml.get("nemu"), _nemu_from_yaml),
+                export=ExportConfig(
+                    csv=CSVConfig(),
+                    perf_archive=yml.get("export", {}).get("perf_archive", False),
+                    compression=_compression_from_yaml(
+                        yml.get("export", {}).get("compression")
+                    ),
+                ),
+                simpoint=(
+                    SimPointConfig(**yml["simpoint"])
+                    if yml.get("simpoint") is not None
+                    else None
+                ),
+                checkpoint=(
+                    _checkpoint_from_yaml(yml["checkpoint"], nexus_am)
+                    if yml.get("checkpoint") is not None
                     else None
                 ),
             )
@@ -47,3 +175,4 @@ class SimuBenConfig(NamedTuple):
 class SimuBenInput(NamedTuple):
     config: SimuBenConfig
     sources: list[Path]
+    output_dir: Path = Path("/tmp")
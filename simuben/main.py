@@ -1,52 +1,443 @@
 #!/usr/bin/env python3
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import replace
+import math
+import os
+from pathlib import Path
+import shutil
+import sys
+
 import cli
+from compression import compressed_open, compressed_path, compressed_read
+from config import SimuBenInput
+from monitor import RunAborted
 from nexus_am.app import NexusAMApp
+from nemu.config import NEMUConfig
+from nemu.checkpoint import NEMUCheckpoint
 from nemu.core import NEMU
-from verilator.log_export import verialtor_brief_to_csv, verilator_brief_to_yml
-from verilator.log import verilator_perf_log_print
+from nemu.log import nemu_log_records
+from nemu.log_export import nemu_blocks_to_csv, nemu_pcs_to_csv, nemu_stats_to_yml
+from simpoint.bbv import simpoint_bbvs, simpoint_bbvs_write
+from simpoint.cluster import SimPoint, simpoint_pick
+from simpoint.config import SimPointConfig
+from simpoint.estimate import (
+    SimPointSample,
+    simpoint_estimate,
+    simpoint_estimate_brief,
+)
+from simpoint.log_export import (
+    simpoint_estimates_to_csv,
+    simpoint_points_to_csv,
+    simpoint_points_write,
+    simpoint_samples_to_csv,
+)
+from verilator.config import VerilatorConfig
+from verilator.log_export import (
+    verialtor_brief_to_csv,
+    verilator_brief_to_yml,
+    verilator_sim_khz,
+)
+from verilator.log import (
+    VerilatorLog,
+    verilator_perf_archive_write,
+    verilator_perf_log_print,
+)
 from verilator.core import Verilator
 
+
+def artifact_path(input: SimuBenInput, emulator: str | None, artifact: str) -> Path:
+    """
+    Artifacts of a named emulator of a matrix are tagged with its name,
+    e.g. `verilator.<name>.log`.
+    """
+
+    if emulator is not None:
+        kind, suffix = artifact.split(".", 1)
+        artifact = f"{kind}.{emulator}.{suffix}"
+    return input.output_dir / artifact
+
+
+def run_nemu(
+    input: SimuBenInput, nemu: NEMUConfig, executable: Path
+) -> RunAborted | None:
+    compression = input.config.export.compression
+
+    emu = NEMU(nemu)
+
+    path = compressed_path(artifact_path(input, nemu.name, "nemu.log"), compression)
+    print(f"[simuben] Running on the {emu.name}, printing the log to {path}...")
+    aborted = None
+    with compressed_open(path, compression) as f:
+        try:
+            stats = emu.run(executable, f)
+        except RunAborted as e:
+            aborted = e
+            stats = e.log
+    print()
+
+    print(f"[simuben] Here is a brief log of the {emu.name}:")
+    print(nemu_stats_to_yml(stats))
+
+    for artifact, export in [
+        ("nemu.pc.csv", nemu_pcs_to_csv),
+        ("nemu.bb.csv", nemu_blocks_to_csv),
+    ]:
+        path = artifact_path(input, nemu.name, artifact)
+        print(f"[simuben] Printing the trace statistics to {path}...")
+        with open(path, "w") as f:
+            f.write(export(stats))
+
+    return aborted
+
+
+def run_verilator(
+    input: SimuBenInput, verilator: VerilatorConfig, executable: Path
+) -> tuple[VerilatorLog.Brief, VerilatorLog.Host, RunAborted | None]:
+    compression = input.config.export.compression
+
+    emu = Verilator(verilator)
+
+    print(f"[simuben] Running on the {emu.name}...")
+    aborted = None
+    try:
+        log = emu.run(executable)
+    except RunAborted as e:
+        aborted = e
+        log = e.log
+    print()
+
+    print(f"[simuben] Here is a brief log of the {emu.name}:")
+    print(verilator_brief_to_yml(log.brief))
+
+    host = log.host
+    cycles = max((core.cycles_count for core in log.brief.cores), default=0)
+    print(
+        f"[simuben] The {emu.name} simulated {verilator_sim_khz(cycles, host)} KHz "
+        f"in {host.wall_time_ms}ms with {host.peak_rss_kb}KiB peak RSS, "
+        f"parsing took {host.parse_time_ms}ms"
+    )
+
+    path = artifact_path(input, verilator.name, "verilator.log")
+    path = compressed_path(path, compression)
+    print(f"[simuben] Printing the log to {path}...")
+    with compressed_open(path, compression) as f:
+        verilator_perf_log_print(log.perf, f)
+
+    if input.config.export.perf_archive:
+        path = artifact_path(input, verilator.name, "verilator.perf.bin")
+        print(f"[simuben] Printing the perf archive to {path}...")
+        with open(path, "wb") as f:
+            verilator_perf_archive_write(log.perf, f)
+
+    return log.brief, log.host, aborted
+
+
+def run_simpoint_sample(
+    input: SimuBenInput,
+    verilator: VerilatorConfig,
+    point: SimPoint,
+    checkpoint: Path,
+    warmup: int,
+    interval: int,
+) -> tuple[SimPointSample, RunAborted | None]:
+    """
+    Runs the interval of `point` from a checkpoint taken `warmup`
+    instructions ahead of it.
+    """
+
+    compression = input.config.export.compression
+
+    emu = Verilator(verilator)
+
+    print(f"[simuben] Running the interval {point.interval} on the {emu.name}...")
+    aborted = None
+    try:
+        log = emu.run(
+            checkpoint,
+            warmup=warmup if warmup != 0 else None,
+            instructions=warmup + interval,
+        )
+    except RunAborted as e:
+        aborted = e
+        log = e.log
+
+    path = artifact_path(input, verilator.name, f"verilator.sp{point.interval}.log")
+    path = compressed_path(path, compression)
+    with compressed_open(path, compression) as f:
+        verilator_perf_log_print(log.perf, f)
+
+    return SimPointSample(simpoint=point, brief=log.brief, host=log.host), aborted
+
+
+def run_simpoint(
+    input: SimuBenInput,
+    simpoint: SimPointConfig,
+    nemu: NEMUConfig,
+    executable: Path,
+    failures: list[tuple[str, BaseException]],
+) -> list[tuple[str | None, VerilatorLog.Brief, VerilatorLog.Host | None]]:
+    """
+    Profiles the basic block vectors of the NEMU trace, picks the simpoints,
+    checkpoints them on NEMU and runs only their intervals on every Verilator.
+
+    Returns the estimated briefs in place of the whole-program ones,
+    which have no host measurements.
+    """
+
+    compression = input.config.export.compression
+    core_number = input.config.export.csv.core_number
+
+    path = compressed_path(artifact_path(input, nemu.name, "nemu.log"), compression)
+    print(f"[simuben] Profiling the basic block vectors of {path}...")
+    with compressed_read(path) as f:
+        bbvs = list(simpoint_bbvs(nemu_log_records(f), simpoint.interval))
+    instructions = sum(sum(bbv.values()) for bbv in bbvs)
+
+    path = compressed_path(input.output_dir / "simpoint.bb", compression)
+    print(f"[simuben] Printing the basic block vectors to {path}...")
+    with compressed_open(path, compression) as f:
+        simpoint_bbvs_write(bbvs, f)
+
+    points = simpoint_pick(bbvs, simpoint.max_k, simpoint.seed)
+    print(
+        f"[simuben] Picked {len(points)} simpoints of {len(bbvs)} intervals "
+        f"of {simpoint.interval} instructions"
+    )
+
+    path = input.output_dir / "simpoint.points.csv"
+    print(f"[simuben] Printing the simpoints to {path}...")
+    with open(path, "w") as f:
+        f.write(simpoint_points_to_csv(points, simpoint.interval))
+
+    # Checkpoints are taken `warmup` instructions ahead of their intervals,
+    # which NEMU takes at multiples of its checkpoint interval
+    step = math.gcd(simpoint.interval, simpoint.warmup)
+    starts = {
+        point.interval: max(point.interval * simpoint.interval - simpoint.warmup, 0)
+        for point in points
+    }
+
+    emu = NEMU(nemu)
+    workload = executable.stem
+    checkpoints_dir = input.output_dir / "simpoint.checkpoints"
+    # NEMU adds to the checkpoints of earlier runs, which must not be restored
+    shutil.rmtree(checkpoints_dir, ignore_errors=True)
+    simpoint_points_write(
+        checkpoints_dir / "points" / workload,
+        [
+            SimPoint(interval=start // step, cluster=i, weight=1.0)
+            for i, start in enumerate(sorted(set(starts.values())))
+        ],
+    )
+
+    print(f"[simuben] Taking the checkpoints on the {emu.name}...")
+    checkpoints = emu.checkpoint(
+        executable,
+        checkpoints_dir / "points",
+        workload,
+        step,
+        checkpoints_dir,
+    )
+
+    missing = [
+        point.interval
+        for point in points
+        if starts[point.interval] // step not in checkpoints
+    ]
+    if len(missing) != 0:
+        raise RuntimeError(f"The {emu.name} took no checkpoints of intervals {missing}")
+
+    jobs = simpoint.jobs or os.cpu_count() or 1
+    runs: list[tuple[VerilatorConfig, SimPoint, Future]] = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for verilator in input.config.verilator:
+            for point in points:
+                start = starts[point.interval]
+                run = executor.submit(
+                    run_simpoint_sample,
+                    input,
+                    verilator,
+                    point,
+                    checkpoints[start // step],
+                    point.interval * simpoint.interval - start,
+                    simpoint.interval,
+                )
+                runs.append((verilator, point, run))
+
+    samples: dict[str | None, list[SimPointSample]] = {
+        verilator.name: [] for verilator in input.config.verilator
+    }
+    for verilator, point, run in runs:
+        name = f"{Verilator(verilator).name} interval {point.interval}"
+        if (e := run.exception()) is not None:
+            failures.append((name, e))
+            continue
+
+        sample, aborted = run.result()
+        if aborted is not None:
+            failures.append((name, aborted))
+            continue
+        samples[verilator.name].append(sample)
+
+    path = input.output_dir / "simpoint.samples.csv"
+    print(f"[simuben] Printing the samples to {path}...")
+    with open(path, "w") as f:
+        f.write(
+            simpoint_samples_to_csv(
+                [(name, _) for name, emulator in samples.items() for _ in emulator],
+                core_number,
+            )
+        )
+
+    briefs = []
+    estimates = []
+    for verilator in input.config.verilator:
+        emulator = samples[verilator.name]
+        estimate = simpoint_estimate(instructions, emulator, core_number)
+        if estimate is None:
+            failures.append(
+                (
+                    Verilator(verilator).name,
+                    RuntimeError("no interval was measured"),
+                )
+            )
+            continue
+
+        print(
+            f"[simuben] The {Verilator(verilator).name} is estimated to take "
+            f"{estimate.cycles} cycles for {estimate.instructions} instructions "
+            f"from {estimate.sampled_cycles} cycles of {estimate.simpoints} "
+            f"simpoints covering {estimate.coverage:.1%}"
+        )
+
+        estimates.append((verilator.name, estimate))
+        briefs.append(
+            (verilator.name, simpoint_estimate_brief(estimate, core_number), None)
+        )
+
+    path = input.output_dir / "simpoint.brief.csv"
+    print(f"[simuben] Printing the estimates to {path}...")
+    with open(path, "w") as f:
+        f.write(simpoint_estimates_to_csv(estimates))
+
+    return briefs
+
+
+def find_nemu(input: SimuBenInput, name: str | None, purpose: str) -> NEMUConfig:
+    """
+    The NEMU of the matrix named `name`, or the first one.
+    """
+
+    for nemu in input.config.nemu:
+        if name is None or nemu.name == name:
+            return nemu
+
+    if name is None:
+        raise RuntimeError(f"{purpose} requires a NEMU")
+    raise RuntimeError(f"No NEMU '{name}' for {purpose.lower()}")
+
+
+def write_briefs(
+    input: SimuBenInput,
+    briefs: list[tuple[str | None, VerilatorLog.Brief, VerilatorLog.Host | None]],
+) -> None:
+    path = input.output_dir / "verilator.brief.csv"
+    print(f"[simuben] Printing the brief to {path}...")
+    with open(path, "w") as f:
+        for i, (emulator, brief, host) in enumerate(briefs):
+            cfg = input.config.export.csv
+            if i != 0:
+                cfg = replace(cfg, is_header_hidden=True)
+
+            print(verialtor_brief_to_csv(brief, cfg, emulator, host), file=f, end="")
+        print(file=f)
+
+
 if __name__ == "__main__":
     input = cli.get_input()
 
     nexus_am = input.config.nexus_am
     sources = input.sources
+    input.output_dir.mkdir(parents=True, exist_ok=True)
+
+    failures: list[tuple[str, BaseException]] = []
+    briefs: list[tuple[str | None, VerilatorLog.Brief, VerilatorLog.Host | None]] = []
+
+    # The sampled simulation replaces the whole-program Verilator runs
+    simpoint = input.config.simpoint
+    if simpoint is not None:
+        profiled = find_nemu(input, simpoint.nemu, "SimPoint profiling")
+
+    # Otherwise Verilator may start at the region of interest
+    checkpoint = input.config.checkpoint if simpoint is None else None
+    if checkpoint is not None:
+        checkpointer = NEMUCheckpoint(
+            checkpoint, find_nemu(input, checkpoint.nemu, "Checkpointing")
+        )
+
     with NexusAMApp(nexus_am, sources) as app:
         print(f"[simuben] Building the app {app.name}...")
         app.build()
 
-        if nemu := input.config.nemu:
-            emu = NEMU(nemu)
+        image = app.executable
+        if checkpoint is not None:
+            print(f"[simuben] Preparing the checkpoint of {app.name}...")
+            region = checkpointer.prepare(app.executable)
+            if region.image is not None:
+                image = region.image
+                print(
+                    f"[simuben] Verilator runs skip {region.instructions} "
+                    f"instructions of the prologue, restoring {image}"
+                )
+
+        # The emulators only read the app, so they all run side by side
+        nemu_runs: list[tuple[NEMUConfig, Future]] = []
+        verilator_runs: list[tuple[VerilatorConfig, Future]] = []
+        workers = len(input.config.nemu) + len(input.config.verilator)
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for nemu in input.config.nemu:
+                run = executor.submit(run_nemu, input, nemu, app.executable)
+                nemu_runs.append((nemu, run))
 
-            print("[simuben] Running on the NEMU...")
-            log = emu.run(app.executable)
-            print()
+            for verilator in input.config.verilator if simpoint is None else ():
+                run = executor.submit(run_verilator, input, verilator, image)
+                verilator_runs.append((verilator, run))
 
-            print("[simuben] Printing the log to /tmp/nemu.log...")
-            with open("/tmp/nemu.log", "w") as f:
-                f.writelines(line + "\n" for line in log)
+        for nemu, run in nemu_runs:
+            if (e := run.exception() or run.result()) is not None:
+                failures.append((NEMU(nemu).name, e))
+                if simpoint is not None and nemu == profiled:
+                    simpoint = None
 
-        if verilator := input.config.verilator:
-            emu = Verilator(verilator)
+        if simpoint is not None:
+            try:
+                briefs += run_simpoint(
+                    input, simpoint, profiled, app.executable, failures
+                )
+            except RuntimeError as e:
+                failures.append(("SimPoint", e))
 
-            print("[simuben] Running on the Verilator...")
-            log = emu.run(app.executable)
-            print()
+        for verilator, run in verilator_runs:
+            if (e := run.exception()) is not None:
+                failures.append((Verilator(verilator).name, e))
+                continue
 
-            print("[simuben] Here is a brief log:")
-            print(verilator_brief_to_yml(log.brief))
+            brief, host, aborted = run.result()
+            briefs.append((verilator.name, brief, host))
+            if aborted is not None:
+                failures.append((Verilator(verilator).name, aborted))
 
-            print("[simuben] Printing the brief to /tmp/verilator.brief.csv...")
-            with open("/tmp/verilator.brief.csv", "w") as f:
-                print(
-                    verialtor_brief_to_csv(log.brief, input.config.export.csv),
-                    file=f,
-                    end="\n",
-                )
+    # Nothing was measured when every Verilator run failed
+    if len(briefs) != 0:
+        write_briefs(input, briefs)
 
-            print("[simuben] Printing the log to /tmp/verilator.log...")
-            with open("/tmp/verilator.log", "w") as f:
-                verilator_perf_log_print(log.perf, f)
+    if len(failures) != 0:
+        for emulator, e in failures:
+            if isinstance(e, RunAborted):
+                print(f"[simuben] {e}, the partial logs are kept", file=sys.stderr)
+            else:
+                print(f"[simuben] The {emulator} run failed: {e}", file=sys.stderr)
+        sys.exit(1)
 
     print("[simuben] OK")
@@ -0,0 +1,146 @@
+import os
+import resource
+import subprocess
+import threading
+import time
+from typing import Any, Iterable, Iterator, NamedTuple
+
+
+class RunBudget(NamedTuple):
+    wall_time_s: float | None = None
+    cycles: int | None = None
+    instructions: int | None = None
+
+
+class RunAborted(RuntimeError):
+    def __init__(self, emulator: str, reason: str, log: Any) -> None:
+        super().__init__(f"{emulator} was aborted: {reason}")
+        self.emulator = emulator
+        self.reason = reason
+        self.log = log
+
+
+class RunMonitor:
+    """
+    Watches an emulator process: reports its progress periodically and kills it
+    as soon as it exceeds the wall-clock, cycles or instructions budget.
+
+    The progress is fed by the output parsers through `update`. Leaving the
+    monitor waits for the process to exit, or kills it on an exception.
+    """
+
+    REPORT_INTERVAL_S = 10.0
+    POLL_INTERVAL_S = 0.5
+
+    def __init__(
+        self,
+        emulator: str,
+        process: subprocess.Popen,
+        budget: RunBudget,
+    ) -> None:
+        self.__emulator = emulator
+        self.__process = process
+        self.__budget = budget
+        self.__start = time.monotonic()
+        self.__cycles: int | None = None
+        self.__instructions: int | None = None
+        self.__reason: str | None = None
+        self.__done = threading.Event()
+        self.__thread = threading.Thread(target=self.__watch, daemon=True)
+
+    def __enter__(self) -> "RunMonitor":
+        self.__thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None:
+                # The budget holds until the process exits,
+                # which may be well after its output has ended
+                self.__process.wait()
+            else:
+                self.__process.kill()
+        finally:
+            self.__done.set()
+            self.__thread.join()
+
+    @property
+    def reason(self) -> str | None:
+        return self.__reason
+
+    def update(
+        self,
+        cycles: int | None = None,
+        instructions: int | None = None,
+    ) -> None:
+        budget = self.__budget
+
+        if cycles is not None:
+            self.__cycles = cycles
+            if budget.cycles is not None and cycles > budget.cycles:
+                self.abort(f"exceeded the budget of {budget.cycles} cycles")
+
+        if instructions is not None:
+            self.__instructions = instructions
+            if budget.instructions is not None and instructions > budget.instructions:
+                self.abort(f"exceeded the budget of {budget.instructions} instructions")
+
+    def abort(self, reason: str) -> None:
+        if self.__reason is not None:
+            return
+
+        self.__reason = reason
+        print(f"[simuben] Aborting the {self.__emulator}: {reason}", flush=True)
+        self.__process.kill()
+
+    def lines(self, stream: Iterable[str]) -> Iterator[str]:
+        """
+        Yields lines of `stream`, except the last one cut by the kill.
+        """
+
+        for line in stream:
+            if self.__reason is not None and not line.endswith("\n"):
+                break
+            yield line
+
+    def __watch(self) -> None:
+        budget = self.__budget
+        next_report_s = self.REPORT_INTERVAL_S
+
+        while not self.__done.wait(self.POLL_INTERVAL_S):
+            elapsed_s = time.monotonic() - self.__start
+
+            if budget.wall_time_s is not None and elapsed_s > budget.wall_time_s:
+                self.abort(f"exceeded the budget of {budget.wall_time_s}s")
+
+            if elapsed_s >= next_report_s:
+                next_report_s += self.REPORT_INTERVAL_S
+                print(f"[simuben] {self.__progress(elapsed_s)}", flush=True)
+
+    def __progress(self, elapsed_s: float) -> str:
+        progress = [f"{self.__emulator} is running for {elapsed_s:.0f}s"]
+        if self.__cycles is not None:
+            progress.append(f"cycle {self.__cycles}")
+        if self.__instructions is not None:
+            progress.append(f"instruction {self.__instructions}")
+        return ", ".join(progress)
+
+
+def process_wait_rusage(process: subprocess.Popen) -> resource.struct_rusage | None:
+    """
+    Waits for the process like `Popen.wait`, also returning its resource usage.
+
+    The usage is `None` if the process has already been reaped by `Popen`.
+    """
+
+    if process.returncode is None:
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            process.wait()
+            return None
+
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return rusage
+
+    return None
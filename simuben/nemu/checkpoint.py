@@ -0,0 +1,173 @@
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import time
+from typing import NamedTuple
+
+from nemu.config import NEMUCheckpointConfig, NEMUConfig
+from nemu.core import NEMU
+from simpoint.cluster import SimPoint
+from simpoint.log_export import simpoint_points_write
+
+
+class NEMURegion(NamedTuple):
+    # The checkpoint to restore, `None` when the region starts with the app
+    image: Path | None
+    # The prologue skipped by restoring the checkpoint
+    instructions: int
+
+
+def _file_digest(path: Path) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.digest()
+
+
+@functools.cache
+def nemu_digest(path: Path) -> bytes:
+    return _file_digest(path)
+
+
+class NEMUCheckpoint:
+    """
+    The checkpoint at the start of the region of interest, taken on NEMU once
+    per app binary, NEMU binary and start, and then shared by all runs.
+
+    Checkpoints are evicted in the least recently used order
+    as soon as they grow over the size limit.
+    """
+
+    METADATA = "checkpoint.json"
+    IMAGE = "checkpoint.gz"
+
+    def __init__(self, config: NEMUCheckpointConfig, nemu: NEMUConfig) -> None:
+        self.__config = config
+        self.__nemu = nemu
+
+    def prepare(self, executable: Path) -> NEMURegion:
+        key = self.__key(executable)
+        dir = self.__config.path / key
+
+        is_missing = not (dir / self.METADATA).exists()
+        if is_missing:
+            self.__take(executable, dir)
+        else:
+            os.utime(dir / self.METADATA)
+
+        with open(dir / self.METADATA, "r") as f:
+            metadata = json.load(f)
+
+        if is_missing:
+            self.evict(keep=key)
+
+        region = NEMURegion(
+            image=dir / self.IMAGE if metadata["instructions"] != 0 else None,
+            instructions=metadata["instructions"],
+        )
+
+        if is_missing:
+            print(
+                f"[simuben] Took the checkpoint {key[:16]} at instruction "
+                f"{region.instructions} in {metadata['take_time']:.2f}s"
+            )
+        else:
+            print(
+                f"[simuben] Reused the checkpoint {key[:16]} at instruction "
+                f"{region.instructions}"
+            )
+
+        return region
+
+    def evict(self, keep: str | None = None) -> None:
+        entries = []
+        for dir in self.__config.path.iterdir():
+            if dir.name.startswith(".") or dir.name == keep:
+                continue
+
+            try:
+                used = (dir / self.METADATA).stat().st_mtime
+                size = sum(_.stat().st_size for _ in dir.iterdir())
+            except FileNotFoundError:
+                continue
+            entries.append((used, size, dir))
+
+        entries.sort()
+        size = sum(size for _, size, _ in entries)
+        if keep is not None:
+            size += sum(_.stat().st_size for _ in (self.__config.path / keep).iterdir())
+
+        for _, entry_size, dir in entries:
+            if size <= self.__config.max_size:
+                break
+
+            shutil.rmtree(dir, ignore_errors=True)
+            size -= entry_size
+
+    def __take(self, executable: Path, dir: Path) -> None:
+        self.__config.path.mkdir(parents=True, exist_ok=True)
+
+        # Taken aside and renamed into place, so that concurrent
+        # simuben processes never see a partial checkpoint.
+        tmp = Path(tempfile.mkdtemp(dir=self.__config.path, prefix=".tmp-"))
+        try:
+            emu = NEMU(self.__nemu)
+
+            start = time.monotonic()
+            instructions = self.__config.instructions
+            if instructions is None:
+                instructions = emu.instructions_before(executable, self.__config.marker)
+                if instructions is None:
+                    raise RuntimeError(
+                        f"The app never reached the marker 0x{self.__config.marker:x}"
+                    )
+
+            if instructions != 0:
+                # The checkpoint of the 2nd interval of `instructions`
+                workload = executable.stem
+                simpoint_points_write(
+                    tmp / "points" / workload,
+                    [SimPoint(interval=1, cluster=0, weight=1.0)],
+                )
+                checkpoints = emu.checkpoint(
+                    executable, tmp / "points", workload, instructions, tmp / "nemu"
+                )
+                if 1 not in checkpoints:
+                    raise RuntimeError(
+                        f"The {emu.name} took no checkpoint at instruction {instructions}"
+                    )
+
+                shutil.move(checkpoints[1], tmp / self.IMAGE)
+                shutil.rmtree(tmp / "points")
+                shutil.rmtree(tmp / "nemu")
+            take_time = time.monotonic() - start
+
+            with open(tmp / self.METADATA, "w") as f:
+                json.dump({"instructions": instructions, "take_time": take_time}, f)
+
+            try:
+                os.rename(tmp, dir)
+            except OSError:
+                if not (dir / self.METADATA).exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def __key(self, executable: Path) -> str:
+        config = self.__config
+        start = (
+            f"instructions={config.instructions}"
+            if config.instructions is not None
+            else f"marker={config.marker}"
+        )
+
+        h = hashlib.sha256()
+        h.update(_file_digest(executable))
+        h.update(start.encode())
+        h.update(nemu_digest(self.__nemu.executable_path))
+        return h.hexdigest()
@@ -1,6 +1,25 @@
 from pathlib import Path
 from typing import NamedTuple
 
+from monitor import RunBudget
+
 
 class NEMUConfig(NamedTuple):
     executable_path: Path
+    name: str | None = None
+    budget: RunBudget = RunBudget()
+
+
+class NEMUCheckpointConfig(NamedTuple):
+    """
+    The start of the region of interest, either an instruction count
+    or the PC of a marker, where Verilator runs are restored at.
+    """
+
+    path: Path
+    instructions: int | None = None
+    marker: int | None = None
+    # The NEMU of a matrix to take the checkpoint on, the first one by default
+    nemu: str | None = None
+    # Checkpoints are evicted in the least recently used order over this size
+    max_size: int = 4 << 30
@@ -1,14 +1,37 @@
 from pathlib import Path
 import subprocess
+from typing import Iterator, TextIO
 
+from monitor import RunAborted, RunMonitor
 from nemu.config import NEMUConfig
+from nemu.log import (
+    NEMUInstruction,
+    NEMUStats,
+    nemu_log_progress,
+    nemu_log_records,
+    nemu_log_stats,
+)
 
 
 class NEMU:
+    PROGRESS_INTERVAL = 4096
+    CHECKPOINT_CONFIG = "simpoint"
+
     def __init__(self, config: NEMUConfig) -> None:
         self.__config = config
 
-    def run(self, executable: Path) -> list[str]:
+    @property
+    def name(self) -> str:
+        if self.__config.name is None:
+            return "NEMU"
+        return f"NEMU {self.__config.name}"
+
+    def run(self, executable: Path, log: TextIO) -> NEMUStats:
+        """
+        Copies the raw output to `log` while aggregating the trace,
+        so the output is never held in memory.
+        """
+
         command = [
             str(self.__config.executable_path),
             executable,
@@ -21,11 +44,138 @@ class NEMU:
             text=True,
         )
 
-        stdout, _ = process.communicate()
+        def tee(lines: Iterator[str]) -> Iterator[str]:
+            for line in lines:
+                log.write(line if line.endswith("\n") else line + "\n")
+                yield line
+
+        with process, RunMonitor(self.name, process, self.__config.budget) as monitor:
+            stats = nemu_log_stats(
+                nemu_log_progress(
+                    nemu_log_records(tee(monitor.lines(process.stdout))),
+                    on_instructions=lambda count: monitor.update(instructions=count),
+                    interval=self.PROGRESS_INTERVAL,
+                )
+            )
+
+        if monitor.reason is not None:
+            raise RunAborted(self.name, monitor.reason, stats)
 
         if process.returncode != 0:
             raise RuntimeError(
-                f"{' '.join(command)} returned {process.returncode}: {process.stderr}",
+                f"{' '.join(map(str, command))} returned {process.returncode}",
             )
 
-        return stdout.splitlines()
+        return stats
+
+    def instructions_before(self, executable: Path, pc: int) -> int | None:
+        """
+        Traces the app until it first reaches `pc` and returns
+        the number of instructions executed before, if it ever does.
+        """
+
+        command = [
+            str(self.__config.executable_path),
+            executable,
+            "--batch",
+        ]
+
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+
+        count = None
+        with process, RunMonitor(self.name, process, self.__config.budget) as monitor:
+            traced = 0
+            for record in nemu_log_records(monitor.lines(process.stdout)):
+                if not isinstance(record, NEMUInstruction):
+                    continue
+
+                if record.pc == pc:
+                    count = traced
+                    process.kill()
+                    break
+
+                traced += 1
+                if traced % self.PROGRESS_INTERVAL == 0:
+                    monitor.update(instructions=traced)
+
+            for _ in process.stdout:
+                pass
+
+        if monitor.reason is not None:
+            raise RunAborted(self.name, monitor.reason, None)
+
+        if count is None and process.returncode != 0:
+            raise RuntimeError(
+                f"{' '.join(map(str, command))} returned {process.returncode}",
+            )
+
+        return count
+
+    def checkpoint(
+        self,
+        executable: Path,
+        simpoints: Path,
+        workload: str,
+        interval: int,
+        output: Path,
+    ) -> dict[int, Path]:
+        """
+        Takes the checkpoints of the intervals listed by `simpoints`
+        (`<simpoints>/<workload>/simpoints0` and `weights0` in the format
+        of the SimPoint tool) and returns them by the interval index.
+
+        NEMU lays them out as `<output>/<config>/<workload>/<interval>/*.gz`.
+        """
+
+        command = [
+            str(self.__config.executable_path),
+            executable,
+            "--batch",
+            "-D",
+            output,
+            "-C",
+            self.CHECKPOINT_CONFIG,
+            "-w",
+            workload,
+            "-S",
+            simpoints,
+            "--cpt-interval",
+            str(interval),
+            "--checkpoint-format",
+            "gz",
+        ]
+
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+
+        with process, RunMonitor(self.name, process, self.__config.budget) as monitor:
+            _, stderr = process.communicate()
+
+        if monitor.reason is not None:
+            raise RunAborted(self.name, monitor.reason, None)
+
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"{' '.join(map(str, command))} returned {process.returncode}: {stderr}",
+            )
+
+        checkpoints = {}
+        for path in (output / self.CHECKPOINT_CONFIG / workload).glob("*/*.gz"):
+            if not path.parent.name.isdigit():
+                continue
+
+            index = int(path.parent.name)
+            if index in checkpoints:
+                raise RuntimeError(
+                    f"The {self.name} left several checkpoints in {path.parent}"
+                )
+            checkpoints[index] = path
+        return checkpoints
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+from collections import Counter
+from dataclasses import dataclass, field
+import argparse
+import re
+import sys
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    TextIO,
+)
+from pathlib import Path
+
+# Run as a script, the module does not see the simuben root
+if not __package__:
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+from compression import compressed_read
+
+PC = int
+
+
+class NEMUInstruction(NamedTuple):
+    """
+    A line of the instruction trace, e.g.
+    `0x0000000080000000: 97 02 00 00 auipc t0, 0`
+    or `0x80000000: 00000297 auipc t0, 0`.
+    """
+
+    pc: PC
+    # 0 when the encoding is missing, so the size is unknown
+    size: int
+    encoding: str
+    disassembly: str
+
+
+class NEMUInstructionsTotal(NamedTuple):
+    """
+    The summary line, e.g. `total guest instructions = 1,234`.
+    """
+
+    count: int
+
+
+class NEMUText(NamedTuple):
+    """
+    Any other line, such as the memory and SimPoint profiling output,
+    which is kept in the raw log only.
+    """
+
+    line: str
+
+
+NEMURecord = NEMUInstruction | NEMUInstructionsTotal | NEMUText
+
+
+@dataclass
+class NEMUStats:
+    """
+    Aggregates of the instruction trace.
+
+    Basic blocks are delimited by `nemu_is_block_start`,
+    so their counters are keyed by the PC of their first instruction.
+    """
+
+    instructions: int = 0
+    reported_instructions: int | None = None
+    pcs: Counter[PC] = field(default_factory=Counter)
+    blocks: Counter[PC] = field(default_factory=Counter)
+    block_instructions: Counter[PC] = field(default_factory=Counter)
+
+
+INSTRUCTION_PREFIX = "0x"
+
+INSTRUCTIONS_TOTAL_ROW: re.Pattern = re.compile(r"total guest instructions = ([\d,]+)")
+
+HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+# Mnemonics of branches, jumps and traps, including the pseudo-instructions
+# disassemblers print them as. Compressed ones may be prefixed with `c.`.
+CONTROL_FLOW_MNEMONICS = frozenset(
+    [
+        *["beq", "bne", "blt", "bge", "bltu", "bgeu"],
+        *["beqz", "bnez", "blez", "bgez", "bltz", "bgtz"],
+        *["bgt", "ble", "bgtu", "bleu"],
+        *["jal", "jalr", "j", "jr", "ret", "call", "tail"],
+        *["ecall", "ebreak", "mret", "sret", "uret", "dret"],
+    ]
+)
+
+
+def nemu_instruction_parse(line: str) -> NEMUInstruction | None:
+    pc, colon, rest = line.partition(": ")
+    if not colon:
+        return None
+
+    try:
+        pc = int(pc, 16)
+    except ValueError:
+        return None
+
+    # The encoding bytes come before the disassembly
+    tokens = rest.rstrip("\n").split(" ")
+    size = 0
+    while (
+        size < len(tokens)
+        and len(tokens[size]) == 2
+        and HEX_DIGITS.issuperset(tokens[size])
+    ):
+        size += 1
+    encoding = size
+
+    # Or the encoding as a single word
+    if size == 0 and len(tokens[0]) in (4, 8) and HEX_DIGITS.issuperset(tokens[0]):
+        size = len(tokens[0]) // 2
+        encoding = 1
+
+    return NEMUInstruction(
+        pc=pc,
+        size=size,
+        encoding=" ".join(tokens[:encoding]),
+        disassembly=" ".join(tokens[encoding:]).strip(),
+    )
+
+
+def nemu_is_control_flow(instruction: NEMUInstruction) -> bool:
+    mnemonic = instruction.disassembly.split(" ", 1)[0].removeprefix("c.")
+    return mnemonic in CONTROL_FLOW_MNEMONICS
+
+
+def nemu_is_block_start(
+    instruction: NEMUInstruction, previous: NEMUInstruction | None
+) -> bool:
+    """
+    A basic block starts at the first traced instruction, after a branch,
+    a jump or a trap, and at any instruction not following the previous one
+    in memory, such as the handler of an interrupt. An instruction of unknown
+    size is assumed to be followed by the next one.
+    """
+
+    if previous is None or nemu_is_control_flow(previous):
+        return True
+    if previous.size == 0:
+        return False
+    return instruction.pc != previous.pc + previous.size
+
+
+def nemu_log_records(lines: Iterable[str]) -> Iterator[NEMURecord]:
+    for line in lines:
+        if line.startswith(INSTRUCTION_PREFIX):
+            if (instruction := nemu_instruction_parse(line)) is not None:
+                yield instruction
+                continue
+
+        if match := INSTRUCTIONS_TOTAL_ROW.search(line):
+            yield NEMUInstructionsTotal(int(match.group(1).replace(",", "")))
+            continue
+
+        yield NEMUText(line.rstrip("\n"))
+
+
+def nemu_log_stats(records: Iterable[NEMURecord]) -> NEMUStats:
+    stats = NEMUStats()
+
+    pcs = stats.pcs
+    blocks = stats.blocks
+    block_instructions = stats.block_instructions
+
+    block = None
+    previous = None
+    for record in records:
+        if isinstance(record, NEMUInstruction):
+            pc = record.pc
+            if nemu_is_block_start(record, previous):
+                block = pc
+                blocks[block] += 1
+
+            stats.instructions += 1
+            pcs[pc] += 1
+            block_instructions[block] += 1
+            previous = record
+
+        elif isinstance(record, NEMUInstructionsTotal):
+            stats.reported_instructions = record.count
+
+    return stats
+
+
+def nemu_log_progress(
+    records: Iterable[NEMURecord],
+    on_instructions: Callable[[int], None],
+    interval: int = 4096,
+) -> Iterator[NEMURecord]:
+    """
+    Passes the records through, reporting the instructions count
+    every `interval` traced instructions and at the summary.
+    """
+
+    traced = 0
+    for record in records:
+        if isinstance(record, NEMUInstruction):
+            traced += 1
+            if traced % interval == 0:
+                on_instructions(traced)
+        elif isinstance(record, NEMUInstructionsTotal):
+            on_instructions(record.count)
+        yield record
+
+
+def nemu_stats_print(stats: NEMUStats, top: int, f: TextIO = sys.stdout) -> None:
+    print(f"instructions: {stats.instructions}", file=f)
+    if stats.reported_instructions is not None:
+        print(f"reported instructions: {stats.reported_instructions}", file=f)
+    print(f"distinct pcs: {len(stats.pcs)}", file=f)
+    print(f"basic blocks: {len(stats.blocks)}", file=f)
+
+    print("hottest pcs:", file=f)
+    for pc, count in stats.pcs.most_common(top):
+        print(f"  0x{pc:016x}: {count}", file=f)
+
+    print("hottest basic blocks:", file=f)
+    for pc, count in stats.block_instructions.most_common(top):
+        print(f"  0x{pc:016x}: {count} ({stats.blocks[pc]} executions)", file=f)
+
+
+def argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+
+    parser.add_argument(
+        "file",
+        type=str,
+        help="A NEMU log with the instruction trace, possibly compressed",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="A number of the hottest PCs and basic blocks to print",
+    )
+
+    return parser
+
+
+if __name__ == "__main__":
+    parser: argparse.ArgumentParser = argparser()
+    args: argparse.Namespace = parser.parse_args()
+
+    with compressed_read(Path(args.file)) as f:
+        stats: NEMUStats = nemu_log_stats(nemu_log_records(f))
+
+    nemu_stats_print(stats, args.top)
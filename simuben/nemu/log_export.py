@@ -0,0 +1,41 @@
+from io import StringIO
+import yaml
+import csv
+
+
+from nemu.log import NEMUStats
+
+
+def nemu_stats_to_yml(stats: NEMUStats) -> str:
+    return yaml.dump(
+        {
+            "instructions": stats.instructions,
+            "reported_instructions": stats.reported_instructions,
+            "distinct_pcs": len(stats.pcs),
+            "basic_blocks": len(stats.blocks),
+        }
+    )
+
+
+def nemu_pcs_to_csv(stats: NEMUStats) -> str:
+    output = StringIO()
+    writer = csv.writer(output)
+
+    writer.writerow(["pc", "executions"])
+    for pc in sorted(stats.pcs):
+        writer.writerow([f"0x{pc:016x}", stats.pcs[pc]])
+
+    return output.getvalue()
+
+
+def nemu_blocks_to_csv(stats: NEMUStats) -> str:
+    output = StringIO()
+    writer = csv.writer(output)
+
+    writer.writerow(["pc", "executions", "instructions"])
+    for pc in sorted(stats.blocks):
+        writer.writerow(
+            [f"0x{pc:016x}", stats.blocks[pc], stats.block_instructions[pc]]
+        )
+
+    return output.getvalue()
@@ -1,40 +1,113 @@
+from collections import Counter
+import hashlib
 import os
 from pathlib import Path
 import shutil
 import subprocess
+import sys
+import tempfile
+import time
 
 from config import NexusAMConfig
+from nexus_am.cache import (
+    NexusAMBuildCache,
+    nexus_am_revision,
+    nexus_am_toolchain_digest,
+)
+from nexus_am.runtime import NexusAMRuntime
+
+OBJCACHE = Path(__file__).parent / "objcache.py"
 
 
 class NexusAMApp:
     def __init__(self, config: NexusAMConfig, sources: list[Path]) -> None:
         self.__config = config
         self.__sources = sources
+        self.__dir: Path | None = None
 
     def __enter__(self) -> "NexusAMApp":
-        dir = self.__dir
-        dir.mkdir(exist_ok=True)
+        # Every build gets its own directory out of the AM tree,
+        # so that concurrent builds never collide.
+        self.__config.scratch_path.mkdir(parents=True, exist_ok=True)
+        self.__dir = dir = Path(
+            tempfile.mkdtemp(prefix=f"{self.name}-", dir=self.__config.scratch_path)
+        )
 
         for src in self.__sources:
             dst = dir / src.name
             shutil.copyfile(src, dst)
 
-        makefile = dir / "Makefile"
-        with open(makefile, "w") as f:
-            f.write(self.__makefile)
-
         return self
 
     def __exit__(self, exc_type, exc_value, traceback) -> None:
         shutil.rmtree(self.__dir)
+        self.__dir = None
 
     def build(self) -> None:
         command = self.__command_clang()
-        os.environ["AM_HOME"] = str(self.__config.path)
 
+        cache, key = None, None
+        if self.__config.cache is not None:
+            cache = NexusAMBuildCache(self.__config.cache)
+            key = self.__cache_key(command)
+
+        if cache is not None and key is not None:
+            is_hit = cache.lookup(key, self.executable)
+            print(
+                f"[simuben] Build cache {'hit' if is_hit else 'miss'} {key[:16]} "
+                + ", ".join(f"{k}={v}" for k, v in sorted(cache.stats.items()))
+            )
+            if is_hit:
+                return
+
+        runtime = NexusAMRuntime(
+            self.__config,
+            (
+                self.__config.cache.path
+                if self.__config.cache is not None
+                else self.__config.scratch_path
+            )
+            / "runtime",
+            command,
+        )
+
+        # Linking the prebuilt archives keeps make out of the AM tree
+        prebuilt = runtime.prepare(self.__dir)
+        with open(self.__dir / "Makefile", "w") as f:
+            f.write(
+                self.__makefile
+                + "\n"
+                + self.__makefile_prebuilt(prebuilt, runtime.archives)
+            )
+
+        env = {**os.environ, "AM_HOME": str(self.__config.path)}
+
+        objcache = None
+        if self.__config.cache is not None:
+            # Keys are computed from the real command, not the wrapped one
+            objcache = NexusAMBuildCache(self.__config.cache, "obj")
+            env |= {
+                "SIMUBEN_OBJCACHE_DIR": str(objcache.path),
+                "SIMUBEN_OBJCACHE_SALT": nexus_am_toolchain_digest(
+                    self.__config.toolchain_path
+                ).hex(),
+                "SIMUBEN_OBJCACHE_STATS": str(self.__dir / "objcache.stats"),
+                "SIMUBEN_OBJCACHE_BASEDIR": str(self.__dir),
+            }
+            command = [
+                (
+                    f"CC={sys.executable} {OBJCACHE} {arg.removeprefix('CC=')}"
+                    if arg.startswith("CC=")
+                    else arg
+                )
+                for arg in command
+            ]
+
+        start = time.monotonic()
         result = subprocess.run(
             command,
             cwd=self.__dir,
+            env=env,
             capture_output=True,
             text=True,
             check=False,
@@ -45,6 +118,20 @@ class NexusAMApp:
                 f"{' '.join(command)} returned {result.returncode}: {result.stderr}",
             )
 
+        print(f"[simuben] Built {self.name} in {time.monotonic() - start:.2f}s")
+
+        if objcache is not None:
+            objcache.evict()
+            print(
+                f"[simuben] Object cache "
+                + ", ".join(
+                    f"{k}={v}" for k, v in sorted(self.__objcache_stats.items())
+                )
+            )
+
+        if cache is not None and key is not None:
+            cache.store(key, self.executable)
+
     @property
     def name(self) -> str:
         return self.__sources[0].stem
@@ -53,6 +140,16 @@ class NexusAMApp:
     def executable(self) -> Path:
         return self.__dir / "build" / f"{self.name}-riscv64-xs.bin"
 
+    @property
+    def __objcache_stats(self) -> dict[str, int]:
+        stats = Counter({"hits": 0, "misses": 0})
+        try:
+            with open(self.__dir / "objcache.stats", "r") as f:
+                stats.update(line.strip() for line in f)
+        except FileNotFoundError:
+            pass
+        return stats
+
     def __command_clang(self) -> list[str]:
         flags = " ".join(
             [
@@ -79,9 +176,28 @@ class NexusAMApp:
             f"AR={r}/llvm-ar",
         ]
 
-    @property
-    def __dir(self) -> Path:
-        return self.__config.path / "apps" / self.name
+    def __cache_key(self, command: list[str]) -> str | None:
+        revision = nexus_am_revision(self.__config.path)
+        if revision is None:
+            print("[simuben] The Nexus AM tree has no git revision, cache is disabled")
+            return None
+
+        h = hashlib.sha256()
+
+        def update(data: bytes) -> None:
+            h.update(len(data).to_bytes(8, "little"))
+            h.update(data)
+
+        for src in self.__sources:
+            update(src.name.encode())
+            update(src.read_bytes())
+
+        update(self.__makefile.encode())
+        update("\0".join(command).encode())
+        update(revision.encode())
+        update(nexus_am_toolchain_digest(self.__config.toolchain_path))
+
+        return h.hexdigest()
 
     @property
     def __makefile(self) -> str:
@@ -95,3 +211,14 @@ class NexusAMApp:
                 f"\t@$(CC) $(CPPFLAGS) -std=gnu11 $(CFLAGS) -c -o $@ $(realpath $<)",
             ],
         )
+
+    @staticmethod
+    def __makefile_prebuilt(prebuilt: Path, archives: list[str]) -> str:
+        am, klib = (prebuilt / archive for archive in archives)
+        return "\n".join(
+            [
+                f"LINK_FILES = {am} $(OBJS) {klib}",
+                f"am $(LIBS):",
+                f"\t@true",
+            ],
+        )
@@ -0,0 +1,170 @@
+import fcntl
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import tempfile
+
+from nexus_am.config import NexusAMCacheConfig
+
+NEXUS_AM_TOOLS = ["clang", "ld.lld", "llvm-objdump", "llvm-objcopy", "llvm-ar"]
+
+
+def nexus_am_revision(path: Path) -> str | None:
+    """
+    The revision of the Nexus AM tree including its uncommitted changes
+    and the files not yet added, or `None` when the tree is not a git checkout
+    or can not be read.
+    """
+
+    def git(*args: str) -> bytes:
+        return subprocess.run(
+            ["git", "-C", str(path), *args],
+            capture_output=True,
+            check=True,
+        ).stdout
+
+    h = hashlib.sha256()
+    try:
+        head = git("rev-parse", "HEAD").decode().strip()
+        h.update(git("diff", "--binary", "HEAD"))
+
+        untracked = git("ls-files", "--others", "--exclude-standard", "-z")
+        for name in sorted(untracked.split(b"\0")):
+            if len(name) == 0:
+                continue
+
+            digest = hashlib.sha256()
+            with open(path / os.fsdecode(name), "rb") as f:
+                while chunk := f.read(1 << 20):
+                    digest.update(chunk)
+            h.update(len(name).to_bytes(8, "little") + name + digest.digest())
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return f"{head}-{h.hexdigest()}"
+
+
+@functools.cache
+def nexus_am_toolchain_digest(toolchain_path: Path) -> bytes:
+    h = hashlib.sha256()
+
+    r = toolchain_path / "bin"
+    for tool in NEXUS_AM_TOOLS:
+        digest = hashlib.sha256()
+        with open(r / tool, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        h.update(digest.digest())
+
+    version = subprocess.run(
+        [str(r / "clang"), "--version"],
+        capture_output=True,
+        check=True,
+    )
+    h.update(version.stdout)
+
+    return h.digest()
+
+
+class NexusAMBuildCache:
+    """
+    A content-addressed on-disk cache of built application binaries
+    or, with `kind="obj"`, of the objects stored by `objcache.py`.
+
+    Entries are evicted in the least recently used order
+    as soon as the entries of a kind grow over the size limit.
+    """
+
+    SUFFIXES = {"bin": ".bin", "obj": ".o"}
+
+    def __init__(self, config: NexusAMCacheConfig, kind: str = "bin") -> None:
+        self.__config = config
+        self.__kind = kind
+        self.__dir.mkdir(parents=True, exist_ok=True)
+
+    def lookup(self, key: str, destination: Path) -> bool:
+        entry = self.__entry(key)
+
+        try:
+            os.utime(entry)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(entry, destination)
+        except FileNotFoundError:
+            self.__count(misses=1)
+            return False
+
+        self.__count(hits=1)
+        return True
+
+    def store(self, key: str, source: Path) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.__dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, self.__entry(key))
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        self.evict()
+
+    @property
+    def path(self) -> Path:
+        return self.__dir
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return self.__count()
+
+    def evict(self) -> None:
+        entries = []
+        for entry in self.__dir.glob(f"*{self.SUFFIXES[self.__kind]}"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        entries.sort()
+        size = sum(size for _, size, _ in entries)
+
+        evictions = 0
+        for _, entry_size, entry in entries:
+            if size <= self.__config.max_size:
+                break
+
+            entry.unlink(missing_ok=True)
+            size -= entry_size
+            evictions += 1
+
+        if evictions != 0:
+            self.__count(evictions=evictions)
+
+    def __count(self, **deltas: int) -> dict[str, int]:
+        # The cache is shared by concurrent simuben processes.
+        with open(self.__dir / "stats.json", "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+
+            f.seek(0)
+            content = f.read()
+            stats = json.loads(content) if content else {}
+
+            for name, delta in deltas.items():
+                stats[name] = stats.get(name, 0) + delta
+
+            f.seek(0)
+            f.truncate()
+            json.dump(stats, f)
+
+        return stats
+
+    def __entry(self, key: str) -> Path:
+        return self.__dir / f"{key}{self.SUFFIXES[self.__kind]}"
+
+    @property
+    def __dir(self) -> Path:
+        return self.__config.path / self.__kind
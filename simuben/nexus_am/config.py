@@ -1,7 +1,15 @@
 from pathlib import Path
+import tempfile
 from typing import NamedTuple
 
 
+class NexusAMCacheConfig(NamedTuple):
+    path: Path
+    max_size: int = 1 << 30
+
+
 class NexusAMConfig(NamedTuple):
     path: Path
     toolchain_path: Path
+    cache: NexusAMCacheConfig | None = None
+    scratch_path: Path = Path(tempfile.gettempdir()) / "simuben"
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+"""
+A compiler wrapper caching `.c` and `.ll` objects across builds.
+
+    objcache.py <compiler> <args>...
+
+An object is keyed by the hash of its preprocessed source (or the IR
+itself) and the compiler flags, so only changed translation units are
+recompiled. The wrapper is configured through the environment:
+
+- `SIMUBEN_OBJCACHE_DIR` is the shared cache directory,
+- `SIMUBEN_OBJCACHE_SALT` identifies the toolchain,
+- `SIMUBEN_OBJCACHE_STATS` is a per-build file `hits` or `misses` is appended to,
+- `SIMUBEN_OBJCACHE_BASEDIR` is the per-build directory, which is left out
+  of the key, so that the same sources hit across build directories.
+
+The dependency file of a hit is written by the preprocessing run.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SOURCE_SUFFIXES = {".c", ".ll"}
+
+DEPENDENCY_FLAGS = {"-MD", "-MMD", "-MP"}
+DEPENDENCY_OPTIONS = {"-MF", "-MT", "-MQ"}
+# Print the dependencies instead of compiling
+DEPENDENCY_ONLY_FLAGS = {"-M", "-MM"}
+
+BASEDIR_PLACEHOLDER = "<objcache-basedir>"
+
+
+def objcache_output(args: list[str]) -> Path | None:
+    if "-c" not in args or "-o" not in args:
+        return None
+    if not DEPENDENCY_ONLY_FLAGS.isdisjoint(args):
+        return None
+
+    i = args.index("-o")
+    return Path(args[i + 1]) if i + 1 < len(args) else None
+
+
+def objcache_source(args: list[str]) -> Path | None:
+    sources = [
+        Path(arg)
+        for arg in args
+        if not arg.startswith("-") and Path(arg).suffix in SOURCE_SUFFIXES
+    ]
+    return sources[0] if len(sources) == 1 else None
+
+
+def objcache_flags(args: list[str]) -> list[str]:
+    """
+    The flags affecting the object: no output, no dependency files.
+    """
+
+    flags = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg == "-o" or arg in DEPENDENCY_OPTIONS:
+            skip = True
+        elif arg not in DEPENDENCY_FLAGS:
+            flags.append(arg)
+    return flags
+
+
+def objcache_dependency_flags(args: list[str], output: Path) -> list[str]:
+    """
+    The dependency file options, targeting `output` like the compilation does.
+    """
+
+    flags = []
+    for i, arg in enumerate(args):
+        if arg in DEPENDENCY_FLAGS:
+            flags.append(arg)
+        elif arg in DEPENDENCY_OPTIONS and i + 1 < len(args):
+            flags += [arg, args[i + 1]]
+
+    if len(flags) != 0 and "-MT" not in flags and "-MQ" not in flags:
+        flags += ["-MT", str(output)]
+    return flags
+
+
+def objcache_normalize(data: bytes) -> bytes:
+    basedir = os.environ.get("SIMUBEN_OBJCACHE_BASEDIR")
+    if not basedir:
+        return data
+    return data.replace(basedir.encode(), BASEDIR_PLACEHOLDER.encode())
+
+
+def objcache_key(
+    compiler: str, args: list[str], source: Path, output: Path
+) -> str | None:
+    flags = objcache_flags(args)
+
+    if source.suffix == ".ll":
+        content = source.read_bytes()
+    else:
+        # No line markers, as they carry the paths of the sources
+        result = subprocess.run(
+            [
+                compiler,
+                *(flag if flag != "-c" else "-E" for flag in flags),
+                "-P",
+                *objcache_dependency_flags(args, output),
+            ],
+            capture_output=True,
+            check=False,
+        )
+        if result.returncode != 0:
+            return None
+        content = result.stdout
+
+    h = hashlib.sha256()
+    for data in [
+        os.environ.get("SIMUBEN_OBJCACHE_SALT", "").encode(),
+        objcache_normalize("\0".join(flags).encode()),
+        objcache_normalize(content),
+    ]:
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
+
+def objcache_count(outcome: str) -> None:
+    stats = os.environ.get("SIMUBEN_OBJCACHE_STATS")
+    if stats is not None:
+        # A single short append is atomic for parallel make jobs.
+        with open(stats, "a") as f:
+            f.write(f"{outcome}\n")
+
+
+def objcache_compile(compiler: str, args: list[str]) -> int:
+    cache = os.environ.get("SIMUBEN_OBJCACHE_DIR")
+    output = objcache_output(args)
+    source = objcache_source(args)
+
+    if cache is None or output is None or source is None:
+        return subprocess.run([compiler, *args], check=False).returncode
+
+    key = objcache_key(compiler, args, source, output)
+    if key is None:
+        return subprocess.run([compiler, *args], check=False).returncode
+
+    entry = Path(cache) / f"{key}.o"
+    try:
+        os.utime(entry)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(entry, output)
+        objcache_count("hits")
+        return 0
+    except FileNotFoundError:
+        pass
+
+    returncode = subprocess.run([compiler, *args], check=False).returncode
+    if returncode != 0:
+        return returncode
+
+    objcache_count("misses")
+
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(output, tmp)
+        os.replace(tmp, entry)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} <compiler> <args>...", file=sys.stderr)
+        sys.exit(2)
+
+    sys.exit(objcache_compile(sys.argv[1], sys.argv[2:]))
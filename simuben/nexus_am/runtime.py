@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import tempfile
+import time
+
+from nexus_am.cache import nexus_am_revision, nexus_am_toolchain_digest
+from nexus_am.config import NexusAMConfig
+
+
+class NexusAMRuntime:
+    """
+    The AM and klib archives prebuilt once per toolchain, flags and AM revision.
+
+    Every application build links against the same prebuilt archives,
+    so only the application sources are compiled per suite. A tree without
+    a revision can not be keyed, so its runtime is built for a single app.
+    Either way the AM tree itself is never built in.
+    """
+
+    METADATA = "runtime.json"
+
+    def __init__(self, config: NexusAMConfig, path: Path, command: list[str]) -> None:
+        self.__config = config
+        self.__path = path
+        self.__command = command
+
+    def prepare(self, scratch: Path) -> Path:
+        """
+        The directory of the archives, or one in `scratch`
+        when the AM tree has no revision to key them by.
+        """
+
+        revision = nexus_am_revision(self.__config.path)
+        if revision is None:
+            print("[simuben] The Nexus AM tree has no git revision, runtime is rebuilt")
+            dir = scratch / "runtime"
+            self.__build(dir)
+            return dir
+
+        key = self.__key(revision)
+        dir = self.__path / key
+
+        is_missing = not (dir / self.METADATA).exists()
+        if is_missing:
+            self.__build(dir)
+
+        with open(dir / self.METADATA, "r") as f:
+            build_time = json.load(f)["build_time"]
+
+        if is_missing:
+            print(f"[simuben] Built the AM runtime {key[:16]} in {build_time:.2f}s")
+        else:
+            print(
+                f"[simuben] Reused the AM runtime {key[:16]}, "
+                f"saved {build_time:.2f}s of the app build"
+            )
+
+        return dir
+
+    @property
+    def archives(self) -> list[str]:
+        arch = self.__arch
+        return [f"am-{arch}.a", f"klib-{arch}.a"]
+
+    def __build(self, dir: Path) -> None:
+        dir.parent.mkdir(parents=True, exist_ok=True)
+
+        # Built aside and renamed into place, so that concurrent
+        # simuben processes never see a half-built runtime.
+        tmp = Path(tempfile.mkdtemp(dir=dir.parent, prefix=".tmp-"))
+        try:
+            am_home = tmp / "am_home"
+            shutil.copytree(
+                self.__config.path,
+                am_home,
+                symlinks=True,
+                ignore=lambda src, names: (
+                    [".git", "apps", "tests"] if Path(src) == self.__config.path else []
+                ),
+            )
+
+            start = time.monotonic()
+            for subdir, archive in zip(["am", "libs/klib"], self.archives):
+                command = [
+                    *self.__command,
+                    f"AM_HOME={am_home}",
+                    "-s",
+                    "-C",
+                    str(am_home / subdir),
+                    "archive",
+                ]
+
+                result = subprocess.run(
+                    command,
+                    capture_output=True,
+                    text=True,
+                    check=False,
+                )
+
+                if result.returncode != 0:
+                    raise RuntimeError(
+                        f"{' '.join(command)} returned {result.returncode}: {result.stderr}",
+                    )
+
+                shutil.move(am_home / subdir / "build" / archive, tmp / archive)
+            build_time = time.monotonic() - start
+
+            shutil.rmtree(am_home)
+            with open(tmp / self.METADATA, "w") as f:
+                json.dump({"build_time": build_time}, f)
+
+            try:
+                os.rename(tmp, dir)
+            except OSError:
+                if not (dir / self.METADATA).exists():
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def __key(self, revision: str) -> str:
+        h = hashlib.sha256()
+        h.update("\0".join(self.__command).encode())
+        h.update(revision.encode())
+        h.update(nexus_am_toolchain_digest(self.__config.toolchain_path))
+        return h.hexdigest()
+
+    @property
+    def __arch(self) -> str:
+        for arg in self.__command:
+            if arg.startswith("ARCH="):
+                return arg.removeprefix("ARCH=")
+        raise RuntimeError(f"No ARCH in {' '.join(self.__command)}")
@@ -0,0 +1,54 @@
+from collections import Counter
+from typing import Iterable, Iterator, TextIO
+
+from nemu.log import PC, NEMUInstruction, NEMURecord, nemu_is_block_start
+
+# Instructions executed per basic block, keyed by the PC of its first instruction
+BBV = Counter[PC]
+
+
+def simpoint_bbvs(records: Iterable[NEMURecord], interval: int) -> Iterator[BBV]:
+    """
+    Splits the instruction trace into intervals of `interval` instructions,
+    yielding a basic block vector of each one. The last interval is partial.
+
+    Basic blocks are delimited by `nemu_is_block_start`.
+    """
+
+    bbv: BBV = Counter()
+    count = 0
+
+    block = None
+    previous = None
+    for record in records:
+        if not isinstance(record, NEMUInstruction):
+            continue
+
+        if nemu_is_block_start(record, previous):
+            block = record.pc
+
+        bbv[block] += 1
+        previous = record
+
+        count += 1
+        if count == interval:
+            yield bbv
+            bbv = Counter()
+            count = 0
+
+    if count != 0:
+        yield bbv
+
+
+def simpoint_bbvs_write(bbvs: Iterable[BBV], f: TextIO) -> None:
+    """
+    Writes the vectors in the `.bb` format of the SimPoint tool,
+    e.g. `T:1:4000 :2:1000`, numbering the basic blocks from 1.
+    """
+
+    ids: dict[PC, int] = {}
+    for bbv in bbvs:
+        entries = (
+            f":{ids.setdefault(pc, len(ids) + 1)}:{count}" for pc, count in bbv.items()
+        )
+        print("T" + " ".join(entries), file=f)
@@ -0,0 +1,210 @@
+import math
+import random
+from typing import NamedTuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from simpoint.bbv import BBV
+
+Point = list[float]
+
+
+class SimPoint(NamedTuple):
+    # An index of the representative interval
+    interval: int
+    cluster: int
+    # A share of the intervals the cluster covers
+    weight: float
+
+
+def simpoint_project(bbvs: list[BBV], dimensions: int, seed: int) -> list[Point]:
+    """
+    Normalizes the vectors to frequencies and projects them
+    onto `dimensions` random axes, as the SimPoint tool does.
+    """
+
+    axes: dict[int, Point] = {}
+
+    points = []
+    for bbv in bbvs:
+        total = sum(bbv.values())
+        point = [0.0] * dimensions
+        for pc, count in bbv.items():
+            if pc not in axes:
+                rng = random.Random(f"{seed}:{pc}")
+                axes[pc] = [rng.uniform(-1.0, 1.0) for _ in range(dimensions)]
+
+            frequency = count / total
+            for i, axis in enumerate(axes[pc]):
+                point[i] += frequency * axis
+        points.append(point)
+
+    return points
+
+
+def _distance2(a: Point, b: Point) -> float:
+    return sum((x - y) * (x - y) for x, y in zip(a, b))
+
+
+def _assign(points: list[Point], centers: list[Point]) -> tuple[list[int], list[float]]:
+    """
+    The nearest center of every point and the squared distance to it.
+    """
+
+    if np is not None:
+        distances = (
+            (np.asarray(points)[:, None, :] - np.asarray(centers)[None, :, :]) ** 2
+        ).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        return (
+            labels.tolist(),
+            distances[np.arange(len(points)), labels].tolist(),
+        )
+
+    labels = []
+    nearest = []
+    for point in points:
+        label, distance = min(
+            ((i, _distance2(point, center)) for i, center in enumerate(centers)),
+            key=lambda _: _[1],
+        )
+        labels.append(label)
+        nearest.append(distance)
+    return labels, nearest
+
+
+def simpoint_kmeans(
+    points: list[Point],
+    k: int,
+    rng: random.Random,
+    iterations: int = 20,
+) -> tuple[list[int], list[Point]]:
+    """
+    Lloyd's k-means with the k-means++ seeding, stopped after `iterations`
+    rounds at the latest. Returns the cluster of every point and the centers.
+    """
+
+    centers = [list(rng.choice(points))]
+    _, weights = _assign(points, centers)
+    while len(centers) < k:
+        if sum(weights) == 0:
+            break
+        centers.append(list(rng.choices(points, weights)[0]))
+        _, distances = _assign(points, centers[-1:])
+        weights = [min(_) for _ in zip(weights, distances)]
+
+    labels: list[int] = []
+    for _ in range(iterations):
+        assigned, _ = _assign(points, centers)
+        if assigned == labels:
+            break
+        labels = assigned
+
+        sums = [[0.0] * len(center) for center in centers]
+        sizes = [0] * len(centers)
+        for point, label in zip(points, labels):
+            sizes[label] += 1
+            total = sums[label]
+            for i, x in enumerate(point):
+                total[i] += x
+
+        for j, size in enumerate(sizes):
+            if size != 0:
+                centers[j] = [x / size for x in sums[j]]
+
+    return labels, centers
+
+
+def simpoint_bic(points: list[Point], labels: list[int], centers: list[Point]) -> float:
+    """
+    The Bayesian Information Criterion of a clustering under the spherical
+    Gaussian model of Pelleg and Moore, the higher the better.
+    """
+
+    r = len(points)
+    k = len(centers)
+    d = len(points[0])
+
+    distortion = sum(
+        _distance2(point, centers[label]) for point, label in zip(points, labels)
+    )
+    variance = distortion / (d * max(r - k, 1))
+    if variance <= 0:
+        variance = 1e-12
+
+    likelihood = 0.0
+    for j in range(k):
+        size = labels.count(j)
+        if size == 0:
+            continue
+        likelihood += (
+            size * math.log(size / r)
+            - size * d / 2 * math.log(2 * math.pi * variance)
+            - (size - 1) * d / 2
+        )
+
+    parameters = (k - 1) + k * d + 1
+    return likelihood - parameters / 2 * math.log(r)
+
+
+def simpoint_pick(
+    bbvs: list[BBV],
+    max_k: int,
+    seed: int,
+    dimensions: int = 15,
+    bic_threshold: float = 0.9,
+    sample_size: int = 1000,
+) -> list[SimPoint]:
+    """
+    Takes the smallest k up to `max_k` scoring at least `bic_threshold` of the
+    BIC range, binary searching k like the SimPoint tool. The clusterings are
+    fitted to at most `sample_size` of the intervals, and every cluster is
+    represented by the interval nearest to its center.
+    """
+
+    if len(bbvs) == 0:
+        return []
+
+    points = simpoint_project(bbvs, dimensions, seed)
+    sample = points
+    if len(points) > sample_size:
+        sample = random.Random(seed).sample(points, sample_size)
+
+    clusterings: dict[int, tuple[float, list[Point]]] = {}
+
+    def score(k: int) -> float:
+        if k not in clusterings:
+            labels, centers = simpoint_kmeans(sample, k, random.Random(seed + k))
+            clusterings[k] = (simpoint_bic(sample, labels, centers), centers)
+        return clusterings[k][0]
+
+    # The BIC is assumed to grow with k, as the SimPoint tool does
+    low, high = 1, min(max_k, len(sample))
+    scores = [score(low), score(high)]
+    threshold = min(scores) + bic_threshold * (max(scores) - min(scores))
+    while low < high:
+        k = (low + high) // 2
+        if score(k) >= threshold:
+            high = k
+        else:
+            low = k + 1
+
+    _, centers = clusterings[low]
+    labels, distances = _assign(points, centers)
+
+    simpoints = []
+    for j in range(len(centers)):
+        members = [i for i, label in enumerate(labels) if label == j]
+        if len(members) == 0:
+            continue
+
+        interval = min(members, key=lambda i: distances[i])
+        simpoints.append((interval, len(members) / len(points)))
+
+    return [
+        SimPoint(interval=interval, cluster=cluster, weight=weight)
+        for cluster, (interval, weight) in enumerate(sorted(simpoints))
+    ]
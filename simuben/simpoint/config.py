@@ -0,0 +1,14 @@
+from typing import NamedTuple
+
+
+class SimPointConfig(NamedTuple):
+    # Instructions per profiled interval, the unit of a checkpoint
+    interval: int = 10_000_000
+    # Instructions simulated before the counters of an interval are measured
+    warmup: int = 0
+    max_k: int = 30
+    seed: int = 42
+    # Parallel Verilator runs, all cores by default
+    jobs: int | None = None
+    # The NEMU of a matrix to profile on, the first one by default
+    nemu: str | None = None
@@ -0,0 +1,84 @@
+from typing import NamedTuple
+
+from simpoint.cluster import SimPoint
+from verilator.log import VerilatorLog
+
+
+class SimPointSample(NamedTuple):
+    """
+    A Verilator run of the interval of a simpoint.
+    """
+
+    simpoint: SimPoint
+    brief: VerilatorLog.Brief
+    host: VerilatorLog.Host
+
+
+class SimPointEstimate(NamedTuple):
+    # Exact, counted on the profiled NEMU run
+    instructions: int
+    # Estimated from the weighted CPI of the samples
+    cycles: int
+    simpoints: int
+    # The weight of the measured simpoints, 1.0 unless some runs failed
+    coverage: float
+    # Exact, measured on Verilator
+    sampled_instructions: int
+    sampled_cycles: int
+
+
+def simpoint_estimate(
+    instructions: int,
+    samples: list[SimPointSample],
+    core_number: int,
+) -> SimPointEstimate | None:
+    """
+    Extrapolates the whole-program cycles of a core from the CPI of the sampled
+    intervals weighted by their clusters, renormalized over the measured ones.
+    """
+
+    measured = []
+    for sample in samples:
+        for core in sample.brief.cores:
+            if core.core_number == core_number and core.instrunctions_count != 0:
+                measured.append((sample.simpoint.weight, core))
+
+    coverage = sum(weight for weight, _ in measured)
+    if coverage == 0:
+        return None
+
+    cpi = (
+        sum(
+            weight * core.cycles_count / core.instrunctions_count
+            for weight, core in measured
+        )
+        / coverage
+    )
+
+    return SimPointEstimate(
+        instructions=instructions,
+        cycles=round(instructions * cpi),
+        simpoints=len(measured),
+        coverage=coverage,
+        sampled_instructions=sum(core.instrunctions_count for _, core in measured),
+        sampled_cycles=sum(core.cycles_count for _, core in measured),
+    )
+
+
+def simpoint_estimate_brief(
+    estimate: SimPointEstimate, core_number: int
+) -> VerilatorLog.Brief:
+    """
+    The estimate in place of the brief of a whole-program run. It took
+    no simulation time of its own, the samples did, see `SimPointSample`.
+    """
+
+    return VerilatorLog.Brief(
+        cores=[
+            VerilatorLog.Core(
+                core_number=core_number,
+                instrunctions_count=estimate.instructions,
+                cycles_count=estimate.cycles,
+            )
+        ],
+    )
@@ -0,0 +1,116 @@
+from io import StringIO
+from pathlib import Path
+import csv
+
+
+from simpoint.cluster import SimPoint
+from simpoint.estimate import SimPointEstimate, SimPointSample
+
+
+def simpoint_points_write(path: Path, simpoints: list[SimPoint]) -> None:
+    """
+    Writes `simpoints0` and `weights0` in the format of the SimPoint tool,
+    which is what NEMU takes checkpoints by.
+    """
+
+    path.mkdir(parents=True, exist_ok=True)
+    with open(path / "simpoints0", "w") as f:
+        for simpoint in simpoints:
+            print(f"{simpoint.interval} {simpoint.cluster}", file=f)
+    with open(path / "weights0", "w") as f:
+        for simpoint in simpoints:
+            print(f"{simpoint.weight} {simpoint.cluster}", file=f)
+
+
+def simpoint_points_to_csv(simpoints: list[SimPoint], interval: int) -> str:
+    output = StringIO()
+    writer = csv.writer(output)
+
+    writer.writerow(["interval", "start_instruction", "cluster", "weight"])
+    for simpoint in simpoints:
+        writer.writerow(
+            [
+                simpoint.interval,
+                simpoint.interval * interval,
+                simpoint.cluster,
+                round(simpoint.weight, 6),
+            ]
+        )
+
+    return output.getvalue()
+
+
+def simpoint_samples_to_csv(
+    samples: list[tuple[str | None, SimPointSample]],
+    core_number: int,
+) -> str:
+    output = StringIO()
+    writer = csv.writer(output)
+
+    writer.writerow(
+        [
+            "emulator",
+            "interval",
+            "weight",
+            "instructions",
+            "cycles",
+            "time_spent_ms",
+            "host_wall_time_ms",
+        ]
+    )
+    for emulator, sample in samples:
+        for core in sample.brief.cores:
+            if core.core_number != core_number:
+                continue
+            writer.writerow(
+                [
+                    emulator or "",
+                    sample.simpoint.interval,
+                    round(sample.simpoint.weight, 6),
+                    core.instrunctions_count,
+                    core.cycles_count,
+                    sample.brief.time_spent_ms,
+                    sample.host.wall_time_ms,
+                ]
+            )
+
+    return output.getvalue()
+
+
+def simpoint_estimates_to_csv(
+    estimates: list[tuple[str | None, SimPointEstimate]],
+) -> str:
+    output = StringIO()
+    writer = csv.writer(output)
+
+    writer.writerow(
+        [
+            "emulator",
+            "instructions",
+            "estimated_cycles",
+            "estimated_ipc",
+            "simpoints",
+            "coverage",
+            "sampled_instructions",
+            "sampled_cycles",
+        ]
+    )
+    for emulator, estimate in estimates:
+        writer.writerow(
+            [
+                emulator or "",
+                estimate.instructions,
+                estimate.cycles,
+                (
+                    round(estimate.instructions / estimate.cycles, 6)
+                    if estimate.cycles != 0
+                    else 0.0
+                ),
+                estimate.simpoints,
+                round(estimate.coverage, 6),
+                estimate.sampled_instructions,
+                estimate.sampled_cycles,
+            ]
+        )
+
+    return output.getvalue()
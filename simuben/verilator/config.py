@@ -1,6 +1,12 @@
 from pathlib import Path
 from typing import NamedTuple
 
+from monitor import RunBudget
+from verilator.log import VerilatorPerfFilter
+
 
 class VerilatorConfig(NamedTuple):
     executable_path: Path
+    name: str | None = None
+    perf_filter: VerilatorPerfFilter = VerilatorPerfFilter()
+    budget: RunBudget = RunBudget()
@@ -1,8 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import subprocess
+import time
 
+from monitor import RunAborted, RunMonitor, process_wait_rusage
 from verilator.log import (
     VerilatorLog,
+    VerilatorPerfParseError,
     verilator_brief_log_parse,
     verilator_perf_log_parse,
 )
@@ -13,14 +17,35 @@ class Verilator:
     def __init__(self, config: VerilatorConfig) -> None:
         self.__config = config
 
-    def run(self, executable: Path) -> VerilatorLog:
+    @property
+    def name(self) -> str:
+        if self.__config.name is None:
+            return "Verilator"
+        return f"Verilator {self.__config.name}"
+
+    def run(
+        self,
+        executable: Path,
+        warmup: int | None = None,
+        instructions: int | None = None,
+    ) -> VerilatorLog:
+        """
+        Runs an app or restores a checkpoint, optionally stopping after
+        `instructions` and resetting the counters after `warmup` of them.
+        """
+
         command = [
             str(self.__config.executable_path),
             "--no-diff",
             "-i",
             executable,
         ]
+        if warmup is not None:
+            command += ["-W", str(warmup)]
+        if instructions is not None:
+            command += ["-I", str(instructions)]
 
+        start = time.monotonic()
         process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
@@ -28,14 +53,76 @@ class Verilator:
             text=True,
         )
 
-        stdout, stderr = process.communicate()
-
-        if process.returncode != 0:
-            raise RuntimeError(
-                f"{' '.join(command)} returned {process.returncode}: {process.stderr}",
+        # The perf dump can be huge, so both streams are parsed
+        # line by line while the emulator is still running.
+        with (
+            process,
+            RunMonitor(self.name, process, self.__config.budget) as monitor,
+            ThreadPoolExecutor(max_workers=1) as executor,
+        ):
+            brief = executor.submit(
+                self.__timed,
+                verilator_brief_log_parse,
+                monitor.lines(process.stdout),
             )
 
-        return VerilatorLog(
-            brief=verilator_brief_log_parse(stdout.splitlines()),
-            perf=verilator_perf_log_parse(stderr.splitlines()),
+            try:
+                perf, parse_time = self.__timed(
+                    verilator_perf_log_parse,
+                    monitor.lines(process.stderr),
+                    self.__config.perf_filter,
+                    on_dump=lambda time: monitor.update(cycles=time),
+                )
+            except VerilatorPerfParseError as e:
+                for _ in process.stderr:
+                    pass
+
+                # A crashed emulator is worth reporting rather than its output
+                if monitor.reason is None:
+                    if process.wait() != 0:
+                        raise self.__failure(command, process.returncode) from e
+                    raise
+
+                # Or the output was cut by the kill, which is what is reported
+                # along with the dumps before the cut
+                perf, parse_time = e.perf, 0.0
+            except BaseException:
+                process.kill()
+                raise
+
+            brief, brief_parse_time = brief.result()
+            parse_time += brief_parse_time
+            rusage = process_wait_rusage(process)
+            wall_time = time.monotonic() - start
+
+        host = VerilatorLog.Host(
+            wall_time_ms=round(wall_time * 1000),
+            peak_rss_kb=0 if rusage is None else rusage.ru_maxrss,
+            # The CPU time of the parsers of both streams,
+            # which run alongside the emulator
+            parse_time_ms=round(parse_time * 1000),
         )
+
+        log = VerilatorLog(brief=brief, perf=perf, host=host)
+
+        if monitor.reason is not None:
+            raise RunAborted(self.name, monitor.reason, log)
+
+        if process.returncode != 0:
+            raise self.__failure(command, process.returncode)
+
+        return log
+
+    @staticmethod
+    def __timed(parse, *args, **kwargs) -> tuple:
+        """
+        The result of `parse` and the CPU time of the calling thread it took.
+        """
+
+        start = time.thread_time()
+        result = parse(*args, **kwargs)
+        return result, time.thread_time() - start
+
+    @staticmethod
+    def __failure(command: list, returncode: int) -> RuntimeError:
+        return RuntimeError(f"{' '.join(map(str, command))} returned {returncode}")
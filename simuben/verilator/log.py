@@ -1,12 +1,35 @@
 #!/usr/bin/env python3
 
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
+import fnmatch
+import io
+from itertools import repeat
+import mmap
+import os
 import re
 import argparse
-from collections import defaultdict
-from typing import Any, Iterable, List, DefaultDict
+import struct
+import sys
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+)
 from pathlib import Path
 
+# Run as a script, the module does not see the simuben root
+if not __package__:
+    sys.path.append(str(Path(__file__).resolve().parent.parent))
+from compression import compressed_read
+
 Time = int
 MetricNamespace = str
 MetricName = str
@@ -26,23 +49,145 @@ class VerilatorLog:
         cores: list["VerilatorLog.Core"] = field(default_factory=list)
         time_spent_ms: int = 0
 
-    Perf = DefaultDict[
-        Time,
-        DefaultDict[
-            MetricNamespace,
-            DefaultDict[
-                MetricName,
-                List[MetricValue],
+    @dataclass
+    class Host:
+        """
+        Measured by the runner of the emulator rather than parsed from its log.
+        """
+
+        wall_time_ms: int = 0
+        peak_rss_kb: int = 0
+        parse_time_ms: int = 0
+
+    class Perf(
+        Mapping[
+            Time,
+            Mapping[
+                MetricNamespace,
+                Mapping[
+                    MetricName,
+                    List[MetricValue],
+                ],
             ],
-        ],
-    ]
+        ]
+    ):
+        """
+        Perf counters stored column-wise.
+
+        Each (namespace, name) pair is interned once and mapped to a dense
+        counter id, and each dump time keeps its samples as a pair of packed
+        arrays: counter ids and values. Indexing by time materializes a
+        nested dict for that single dump only.
+        """
+
+        def __init__(self) -> None:
+            self.__ids: dict[tuple[MetricNamespace, MetricName], int] = {}
+            self.__counters: list[tuple[MetricNamespace, MetricName]] = []
+            self.__dumps: dict[Time, tuple[array, array]] = {}
+
+        def append(
+            self,
+            time: Time,
+            path: MetricNamespace,
+            name: MetricName,
+            value: MetricValue,
+        ) -> None:
+            ids, values = self.dump(time)
+            ids.append(self.intern(path, name))
+            values.append(value)
+
+        def extend(self, other: "VerilatorLog.Perf") -> None:
+            """
+            Appends samples of `other` as if its lines followed the ones of `self`.
+            """
+
+            remap = array("I", (self.intern(*_) for _ in other.counters))
+            is_identity = remap == array("I", range(len(remap)))
+
+            for time in other:
+                ids, values = other.samples(time)
+                dump = self.dump(time)
+                dump[0].extend(ids if is_identity else (remap[_] for _ in ids))
+                dump[1].extend(values)
+
+        def intern(self, path: MetricNamespace, name: MetricName) -> int:
+            counter_id = self.counter_id(path, name)
+            if counter_id is None:
+                counter_id = len(self.__counters)
+                key = (sys.intern(path), sys.intern(name))
+                self.__ids[key] = counter_id
+                self.__counters.append(key)
+            return counter_id
+
+        def dump(self, time: Time) -> tuple[array, array]:
+            dump = self.__dumps.get(time)
+            if dump is None:
+                dump = self.__dumps[time] = (array("I"), array("q"))
+            return dump
+
+        def counter_id(self, path: MetricNamespace, name: MetricName) -> int | None:
+            return self.__ids.get((path, name))
+
+        @property
+        def counters(self) -> list[tuple[MetricNamespace, MetricName]]:
+            return self.__counters
+
+        def samples(self, time: Time) -> tuple[array, array]:
+            return self.__dumps[time]
+
+        def __getitem__(
+            self, time: Time
+        ) -> dict[MetricNamespace, dict[MetricName, List[MetricValue]]]:
+            ids, values = self.__dumps[time]
+
+            dump: dict[MetricNamespace, dict[MetricName, List[MetricValue]]] = {}
+            for counter_id, value in zip(ids, values):
+                path, name = self.__counters[counter_id]
+                dump.setdefault(path, {}).setdefault(name, []).append(value)
+
+            return dump
+
+        def __iter__(self) -> Iterator[Time]:
+            return iter(self.__dumps)
+
+        def __len__(self) -> int:
+            return len(self.__dumps)
 
     brief: Brief = field(default_factory=Brief)
-    perf: Perf = field(
-        default_factory=lambda: defaultdict(
-            lambda: defaultdict(lambda: defaultdict(list))
-        )
-    )
+    perf: Perf = field(default_factory=Perf)
+    host: Host = field(default_factory=Host)
+
+
+class VerilatorPerfFilter(NamedTuple):
+    """
+    Patterns of the `namespace.name` counters to keep while parsing.
+
+    A pattern is a glob, or a regex if prefixed with `re:`, and must match
+    the whole counter. An empty `include` keeps everything not excluded.
+    """
+
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+
+
+def verilator_perf_filter_compile(
+    filter: VerilatorPerfFilter,
+) -> Callable[[MetricNamespace, MetricName], bool]:
+    def compile(pattern: str) -> re.Pattern:
+        if pattern.startswith("re:"):
+            return re.compile(pattern[len("re:") :])
+        return re.compile(fnmatch.translate(pattern))
+
+    include = [compile(_) for _ in filter.include]
+    exclude = [compile(_) for _ in filter.exclude]
+
+    def is_kept(path: MetricNamespace, name: MetricName) -> bool:
+        counter = f"{path}.{name}"
+        return (
+            len(include) == 0 or any(_.fullmatch(counter) for _ in include)
+        ) and not any(_.fullmatch(counter) for _ in exclude)
+
+    return is_kept
 
 
 def verilator_brief_log_parse(lines: Iterable[str]) -> VerilatorLog.Brief:
@@ -80,32 +225,210 @@ def verilator_brief_log_parse(lines: Iterable[str]) -> VerilatorLog.Brief:
     return brief
 
 
-def verilator_perf_log_parse(lines: Iterable[str]) -> VerilatorLog.Perf:
-    perf_row: re.Pattern = re.compile(
-        r"\[PERF \]\[time=\s*(\d+)\]\s*([^:]+):\s*([^,]+),\s*(\d+)"
+PERF_ROW_PREFIX = "[PERF ][time="
+
+PERF_ROW: re.Pattern = re.compile(
+    r"\[PERF \]\[time=\s*(\d+)\]\s*([^:]+):\s*([^,]+),\s*(\d+)"
+)
+
+
+def verilator_perf_row_parse(
+    line: str,
+) -> tuple[Time, MetricNamespace, MetricName, MetricValue] | None:
+    """
+    Parses a stripped `[PERF ]` line with `PERF_ROW`, returns None if it is malformed.
+    """
+
+    match = PERF_ROW.match(line)
+    if not match:
+        return None
+
+    return (
+        int(match.group(1)),
+        match.group(2).strip(),
+        match.group(3).strip(),
+        int(match.group(4)),
     )
 
-    perf = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+
+def verilator_perf_key_parse(key: str) -> tuple[MetricNamespace, MetricName] | None:
+    """
+    Parses the `namespace: name` part of a `[PERF ]` line between `]` and `,`,
+    returns None if `PERF_ROW` would not match it.
+    """
+
+    if "," in key:
+        return None
+
+    path, is_path, name = key.partition(":")
+    if not (is_path and path and name):
+        return None
+
+    return path.strip(), name.strip()
+
+
+class VerilatorPerfParseError(RuntimeError):
+    """
+    Carries the counters parsed before the line, e.g. for diagnosis
+    of an output cut short.
+    """
+
+    def __init__(
+        self, line_number: int, line: str, perf: VerilatorLog.Perf | None = None
+    ) -> None:
+        super().__init__(f"Warning: Could not parse line {line_number}: {line}")
+        self.line_number = line_number
+        self.line = line
+        self.perf = perf if perf is not None else VerilatorLog.Perf()
+
+
+def verilator_perf_log_parse(
+    lines: Iterable[str],
+    filter: VerilatorPerfFilter = VerilatorPerfFilter(),
+    on_dump: Callable[[Time], None] | None = None,
+) -> VerilatorLog.Perf:
+    """
+    Parses `[PERF ]` lines, results are the same as for `verilator_perf_row_parse`.
+
+    Well-formed lines are split with `str.partition`, and both the time stamp
+    and the `namespace: name` part are looked up in caches of the already
+    validated ones, as they repeat a lot. Anything else is parsed by the regex.
+
+    Counters rejected by `filter` are remembered as such in the same cache,
+    so they never get to the `VerilatorLog.Perf`.
+
+    `on_dump` is called with the time stamp whenever it changes.
+    """
+
+    perf = VerilatorLog.Perf()
+    is_kept = verilator_perf_filter_compile(filter)
+
+    skipped = -1
+    counter_ids: dict[str, int] = {}
+    last_time: str | None = None
+    dump_time: Time = 0
+    dump: tuple[array, array] | None = None
 
     for i, line in enumerate(lines, 1):
         line = line.strip()
         if len(line) == 0:
             continue
 
-        match = perf_row.match(line)
-        if not match:
-            raise RuntimeError(f"Warning: Could not parse line {i}: {line}")
+        if line.startswith(PERF_ROW_PREFIX):
+            time, _, rest = line[len(PERF_ROW_PREFIX) :].partition("]")
+            key, _, value = rest.rpartition(",")
+            value = value.lstrip()
+
+            if time != last_time and time.lstrip().isdecimal():
+                last_time, dump_time, dump = time, int(time), None
+                if on_dump is not None:
+                    on_dump(dump_time)
+
+            if time == last_time and value.isdecimal():
+                counter_id = counter_ids.get(key)
+                if counter_id is None and (counter := verilator_perf_key_parse(key)):
+                    counter_id = counter_ids[key] = (
+                        perf.intern(*counter) if is_kept(*counter) else skipped
+                    )
+
+                if counter_id is not None:
+                    if counter_id != skipped:
+                        if dump is None:
+                            dump = perf.dump(dump_time)
+                        dump[0].append(counter_id)
+                        dump[1].append(int(value))
+                    continue
 
-        time: Time = int(match.group(1))
-        path: MetricNamespace = match.group(2).strip()
-        name: MetricName = match.group(3).strip()
-        value: MetricValue = int(match.group(4))
+        row = verilator_perf_row_parse(line)
+        if row is None:
+            raise VerilatorPerfParseError(i, line, perf)
 
-        perf[time][path][name].append(value)
+        if on_dump is not None:
+            on_dump(row[0])
+
+        if is_kept(row[1], row[2]):
+            perf.append(*row)
 
     return perf
 
 
+def verilator_perf_log_parse_parallel(
+    path: Path,
+    jobs: int,
+    filter: VerilatorPerfFilter = VerilatorPerfFilter(),
+) -> VerilatorLog.Perf:
+    """
+    Parses a `[PERF ]` log file in `jobs` processes.
+
+    The file is split into byte ranges aligned to line boundaries, and
+    the results are merged in the file order, so they are the same as
+    for `verilator_perf_log_parse`, including the error line numbers.
+    """
+
+    chunks = _line_aligned_chunks(path, jobs * 4)
+
+    perf = VerilatorLog.Perf()
+    line_offset = 0
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(
+            _verilator_perf_log_parse_chunk,
+            repeat(path),
+            chunks,
+            repeat(filter),
+        )
+
+        for chunk, lines_count, error in results:
+            perf.extend(chunk)
+            if error is not None:
+                line_number, line = error
+                raise VerilatorPerfParseError(line_offset + line_number, line, perf)
+
+            line_offset += lines_count
+
+    return perf
+
+
+def _line_aligned_chunks(path: Path, count: int) -> list[tuple[int, int]]:
+    size = os.path.getsize(path)
+    step = max(size // count, 1 << 20)
+
+    bounds = [0]
+    with open(path, "rb") as f:
+        while bounds[-1] + step < size:
+            f.seek(bounds[-1] + step)
+            f.readline()
+            bounds.append(f.tell())
+    if bounds[-1] < size:
+        bounds.append(size)
+
+    return list(zip(bounds, bounds[1:]))
+
+
+def _verilator_perf_log_parse_chunk(
+    path: Path,
+    chunk: tuple[int, int],
+    filter: VerilatorPerfFilter,
+) -> tuple[VerilatorLog.Perf, int, tuple[int, str] | None]:
+    start, end = chunk
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    lines_count = 0
+
+    def lines() -> Iterator[str]:
+        nonlocal lines_count
+        for line in io.TextIOWrapper(io.BytesIO(data)):
+            lines_count += 1
+            yield line
+
+    try:
+        return verilator_perf_log_parse(lines(), filter), lines_count, None
+    except VerilatorPerfParseError as e:
+        return e.perf, lines_count, (e.line_number, e.line)
+
+
 def verilator_perf_log_print(log: VerilatorLog.Perf, f: Any | None = None) -> None:
     for _, dct in log.items():
         for path, dct in dct.items():
@@ -116,12 +439,253 @@ def verilator_perf_log_print(log: VerilatorLog.Perf, f: Any | None = None) -> No
                 print(f"{path}.{name}: {lst}", file=f)
 
 
+class VerilatorPerfArchive:
+    """
+    A memory-mapped binary archive of `VerilatorLog.Perf`.
+
+    The little-endian layout is:
+      - the header, see `HEADER`;
+      - the counter dictionary: a length-prefixed UTF-8 namespace and name
+        per counter id;
+      - the index: a dump time, its first row and rows count per dump;
+      - 8-byte aligned int64 rows of `counters_count` values each. A dump
+        usually takes a single row, a counter sampled more than once at the
+        same time spills into the next rows, `ABSENT` marks the gaps.
+
+    The dictionary and the index are read on open, while a dump snapshot or a
+    counter value is read straight from the mapping.
+    """
+
+    MAGIC = b"SBPERF\x00\x01"
+    HEADER = struct.Struct("<8sIIIQQQ")
+    INDEX_ENTRY = struct.Struct("<qII")
+    STRING_SIZE = struct.Struct("<H")
+    ABSENT = -(1 << 63)
+
+    def __init__(self, path: Path) -> None:
+        if sys.byteorder != "little":
+            raise RuntimeError("The perf archive is supported on little-endian hosts")
+
+        with open(path, "rb") as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            counters_count,
+            times_count,
+            rows_count,
+            dictionary_offset,
+            index_offset,
+            data_offset,
+        ) = self.HEADER.unpack_from(self.__mmap)
+
+        if magic != self.MAGIC:
+            raise RuntimeError(f"{path} is not a perf archive")
+
+        self.__counters: list[tuple[MetricNamespace, MetricName]] = []
+        self.__ids: dict[tuple[MetricNamespace, MetricName], int] = {}
+        offset = dictionary_offset
+        for counter_id in range(counters_count):
+            path_, offset = self.__string(offset)
+            name, offset = self.__string(offset)
+            self.__counters.append((path_, name))
+            self.__ids[(path_, name)] = counter_id
+
+        self.__index: dict[Time, tuple[int, int]] = {}
+        for i in range(times_count):
+            time, first_row, rows = self.INDEX_ENTRY.unpack_from(
+                self.__mmap, index_offset + i * self.INDEX_ENTRY.size
+            )
+            self.__index[time] = (first_row, rows)
+
+        size = rows_count * counters_count * 8
+        self.__data = memoryview(self.__mmap)[data_offset : data_offset + size]
+        self.__data = self.__data.cast("q")
+
+    def __enter__(self) -> "VerilatorPerfArchive":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.__data.release()
+        self.__mmap.close()
+
+    @classmethod
+    def is_archive(cls, path: Path) -> bool:
+        with open(path, "rb") as f:
+            return f.read(len(cls.MAGIC)) == cls.MAGIC
+
+    @property
+    def counters(self) -> list[tuple[MetricNamespace, MetricName]]:
+        return self.__counters
+
+    @property
+    def times(self) -> list[Time]:
+        return list(self.__index)
+
+    def snapshot(
+        self, time: Time
+    ) -> dict[MetricNamespace, dict[MetricName, List[MetricValue]]]:
+        first_row, rows = self.__index[time]
+
+        dump: dict[MetricNamespace, dict[MetricName, List[MetricValue]]] = {}
+        for row in range(first_row, first_row + rows):
+            for counter_id, value in enumerate(self.__row(row)):
+                if value == self.ABSENT:
+                    continue
+
+                path, name = self.__counters[counter_id]
+                dump.setdefault(path, {}).setdefault(name, []).append(value)
+
+        return dump
+
+    def series(
+        self, path: MetricNamespace, name: MetricName
+    ) -> dict[Time, List[MetricValue]]:
+        counter_id = self.__ids[(path, name)]
+        width = len(self.__counters)
+
+        series: dict[Time, List[MetricValue]] = {}
+        for time, (first_row, rows) in self.__index.items():
+            values = [
+                value
+                for row in range(first_row, first_row + rows)
+                if (value := self.__data[row * width + counter_id]) != self.ABSENT
+            ]
+            if len(values) != 0:
+                series[time] = values
+
+        return series
+
+    def to_perf(
+        self, filter: VerilatorPerfFilter = VerilatorPerfFilter()
+    ) -> VerilatorLog.Perf:
+        """
+        Note that samples of a dump come in the counter id order,
+        which is the order of the first appearance in the whole log.
+        Counters rejected by `filter` are left out, as when parsing.
+        """
+
+        is_kept = verilator_perf_filter_compile(filter)
+        kept = [is_kept(path, name) for path, name in self.__counters]
+
+        perf = VerilatorLog.Perf()
+
+        for time, (first_row, rows) in self.__index.items():
+            ids, values = perf.dump(time)
+            for row in range(first_row, first_row + rows):
+                for counter_id, value in enumerate(self.__row(row)):
+                    if value == self.ABSENT or not kept[counter_id]:
+                        continue
+
+                    ids.append(perf.intern(*self.__counters[counter_id]))
+                    values.append(value)
+
+        return perf
+
+    def __row(self, row: int) -> memoryview:
+        width = len(self.__counters)
+        return self.__data[row * width : (row + 1) * width]
+
+    def __string(self, offset: int) -> tuple[str, int]:
+        (size,) = self.STRING_SIZE.unpack_from(self.__mmap, offset)
+        offset += self.STRING_SIZE.size
+        return bytes(self.__mmap[offset : offset + size]).decode(), offset + size
+
+
+def verilator_perf_archive_write(log: VerilatorLog.Perf, f: BinaryIO) -> None:
+    if sys.byteorder != "little":
+        raise RuntimeError("The perf archive is supported on little-endian hosts")
+
+    archive = VerilatorPerfArchive
+
+    dictionary = bytearray()
+    for path, name in log.counters:
+        for string in (path.encode(), name.encode()):
+            dictionary += archive.STRING_SIZE.pack(len(string)) + string
+
+    index = bytearray()
+    rows_count = 0
+    for time in log:
+        ids, _ = log.samples(time)
+        rows = max(Counter(ids).values(), default=1)
+        index += archive.INDEX_ENTRY.pack(time, rows_count, rows)
+        rows_count += rows
+
+    dictionary_offset = archive.HEADER.size
+    index_offset = dictionary_offset + len(dictionary)
+    data_offset = (index_offset + len(index) + 7) // 8 * 8
+
+    f.write(
+        archive.HEADER.pack(
+            archive.MAGIC,
+            len(log.counters),
+            len(log),
+            rows_count,
+            dictionary_offset,
+            index_offset,
+            data_offset,
+        )
+    )
+    f.write(dictionary)
+    f.write(index)
+    f.write(bytes(data_offset - index_offset - len(index)))
+
+    width = len(log.counters)
+    for time in log:
+        ids, values = log.samples(time)
+
+        rows = [array("q", [archive.ABSENT]) * width]
+        depth = [0] * width
+        for counter_id, value in zip(ids, values):
+            row = depth[counter_id]
+            depth[counter_id] += 1
+            if row == len(rows):
+                rows.append(array("q", [archive.ABSENT]) * width)
+            rows[row][counter_id] = value
+
+        for row in rows:
+            f.write(row.tobytes())
+
+
 def argparser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
     )
 
-    parser.add_argument("file", type=str)
+    parser.add_argument(
+        "file",
+        type=str,
+        help="A raw [PERF ] log, possibly compressed, or a perf archive",
+    )
+    parser.add_argument(
+        "--include",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Counters to keep, globs or regexes prefixed with 're:'",
+    )
+    parser.add_argument(
+        "--exclude",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Counters to drop, globs or regexes prefixed with 're:'",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="A number of processes to parse the uncompressed raw log with",
+    )
+    parser.add_argument(
+        "--archive",
+        type=str,
+        help="A path to write the perf archive to",
+    )
 
     return parser
 
@@ -131,6 +695,23 @@ if __name__ == "__main__":
     args: argparse.Namespace = parser.parse_args()
 
     file: Path = Path(args.file)
-    with open(file, "r") as f:
-        log: VerilatorLog.Perf = verilator_perf_log_parse(f.readlines())
-    verilator_perf_log_print(log)
+    filter = VerilatorPerfFilter(
+        include=tuple(args.include),
+        exclude=tuple(args.exclude),
+    )
+    if VerilatorPerfArchive.is_archive(file):
+        with VerilatorPerfArchive(file) as archive:
+            log: VerilatorLog.Perf = archive.to_perf(filter)
+    else:
+        # A compressed stream can not be split into byte ranges
+        if args.jobs > 1 and file.suffix not in {".gz", ".zst"}:
+            log = verilator_perf_log_parse_parallel(file, args.jobs, filter)
+        else:
+            with compressed_read(file) as f:
+                log = verilator_perf_log_parse(f, filter)
+
+    if args.archive is not None:
+        with open(args.archive, "wb") as f:
+            verilator_perf_archive_write(log, f)
+    else:
+        verilator_perf_log_print(log)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+from typing import Callable, Iterable
+
+from log import (
+    VerilatorLog,
+    verilator_perf_log_parse,
+    verilator_perf_row_parse,
+)
+
+
+def synthetic_perf_log(lines_count: int, counters_count: int) -> list[str]:
+    return [
+        f"[PERF ][time= {i // counters_count * 1000:10d}] "
+        + f"TOP.SimTop.l_soc.core_with_l2.core.unit{i % counters_count % 64}: "
+        + f"metric_{i % counters_count}, {i * 7919 % 1000003}\n"
+        for i in range(lines_count)
+    ]
+
+
+def verilator_perf_log_parse_regex(lines: Iterable[str]) -> VerilatorLog.Perf:
+    perf = VerilatorLog.Perf()
+
+    for i, line in enumerate(lines, 1):
+        line = line.strip()
+        if len(line) == 0:
+            continue
+
+        row = verilator_perf_row_parse(line)
+        if row is None:
+            raise RuntimeError(f"Warning: Could not parse line {i}: {line}")
+
+        perf.append(*row)
+
+    return perf
+
+
+def measure(
+    title: str,
+    parse: Callable[[Iterable[str]], VerilatorLog.Perf],
+    lines: list[str],
+) -> VerilatorLog.Perf:
+    start = time.perf_counter()
+    perf = parse(lines)
+    elapsed = time.perf_counter() - start
+
+    print(f"{title:>10}: {len(lines) / elapsed:14,.0f} lines/s ({elapsed:.2f}s)")
+    return perf
+
+
+def argparser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="A micro-benchmark of the Verilator perf log parser",
+    )
+
+    parser.add_argument("--lines", type=int, default=2_000_000)
+    parser.add_argument("--counters", type=int, default=5_000)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args: argparse.Namespace = argparser().parse_args()
+
+    lines = synthetic_perf_log(args.lines, args.counters)
+    print(f"Parsing {len(lines):,} lines of {args.counters:,} counters...")
+
+    expected = measure("regex", verilator_perf_log_parse_regex, lines)
+    actual = measure("fast", verilator_perf_log_parse, lines)
+
+    for t in expected:
+        if expected.samples(t) != actual.samples(t):
+            raise RuntimeError(f"Results differ at time {t}")
+    if expected.counters != actual.counters:
+        raise RuntimeError("Counters differ")
@@ -17,15 +17,58 @@ def verilator_brief_to_yml(brief: VerilatorLog.Brief) -> str:
     return yaml.dump(asdict(brief))
 
 
-def verialtor_brief_to_csv(brief: VerilatorLog.Brief, cfg: CSVConfig) -> str:
+def verilator_sim_khz(cycles: int, host: VerilatorLog.Host) -> float:
+    # Cycles per millisecond are kilohertz
+    if host.wall_time_ms == 0:
+        return 0.0
+    return round(cycles / host.wall_time_ms, 3)
+
+
+def verialtor_brief_to_csv(
+    brief: VerilatorLog.Brief,
+    cfg: CSVConfig,
+    emulator: str | None = None,
+    host: VerilatorLog.Host | None = VerilatorLog.Host(),
+) -> str:
+    """
+    A brief without a `host` is an estimate rather than a run: its time
+    columns are left empty and it is marked by the `estimated` column.
+    """
+
     output = StringIO()
     writer = csv.writer(output)
 
+    header = [
+        "instructions",
+        "cycles",
+        "time_spent_ms",
+        "host_wall_time_ms",
+        "sim_khz",
+        "peak_rss_kb",
+        "parse_time_ms",
+    ]
+    tag = []
+    if emulator is not None:
+        header = ["emulator", *header]
+        tag = [emulator]
+    if host is None:
+        header.append("estimated")
+
     if not cfg.is_header_hidden:
-        writer.writerow(["instructions", "cycles"])
+        writer.writerow(header)
 
     cores = [core for core in brief.cores if core.core_number == cfg.core_number]
     for core in cores:
-        writer.writerow([core.instrunctions_count, core.cycles_count])
+        if host is None:
+            times = ["", "", "", "", "", "true"]
+        else:
+            times = [
+                brief.time_spent_ms,
+                host.wall_time_ms,
+                verilator_sim_khz(core.cycles_count, host),
+                host.peak_rss_kb,
+                host.parse_time_ms,
+            ]
+        writer.writerow([*tag, core.instrunctions_count, core.cycles_count, *times])
 
     return output.getvalue()
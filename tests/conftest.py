@@ -0,0 +1,27 @@
+import importlib.util
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+# The tools import their modules relative to their own directories
+sys.path.insert(0, str(ROOT / "simuben"))
+
+
+def load_script(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def bendiff():
+    return load_script("bendiff_main", ROOT / "bendiff" / "main.py")
+
+
+@pytest.fixture(scope="session")
+def diffvis():
+    return load_script("diffvis_main", ROOT / "diffvis" / "main.py")
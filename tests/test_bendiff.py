@@ -0,0 +1,171 @@
+import csv
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+BENDIFF = Path(__file__).parent.parent / "bendiff" / "main.py"
+
+COLUMNS = [
+    ([0, 10, 10, 7], [5, 10, 9, 0]),
+    ([1.5, 0.0, 2.25], [3.0, 0.0, -2.25]),
+    # Mixed ints and floats, parsed per cell
+    ([1, 2.5, 0], [6, 2.5, 1.0]),
+    # Over the range of int64
+    ([2**63 - 1, 1], [-(2**63), 2]),
+    ([2**60, 3], [2**60 + 1, 3]),
+]
+
+
+def diffs(bendiff, old: list, new: list) -> tuple[list[str], list[str]]:
+    absolute, relative = bendiff.diff_columns(old, new)
+    return list(map(str, absolute)), list(map(bendiff.format_relative, relative))
+
+
+@pytest.mark.parametrize("old, new", COLUMNS)
+def test_numpy_diffs_as_python(
+    bendiff, old: list, new: list, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    if bendiff.np is None:
+        pytest.skip("requires numpy")
+    numpy = diffs(bendiff, old, new)
+
+    monkeypatch.setattr(bendiff, "np", None)
+    assert numpy == diffs(bendiff, old, new)
+
+
+@pytest.mark.parametrize("old, new", COLUMNS)
+def test_python_diffs(bendiff, old: list, new: list, monkeypatch) -> None:
+    monkeypatch.setattr(bendiff, "np", None)
+    absolute, relative = diffs(bendiff, old, new)
+
+    assert absolute == [str(n - o) for o, n in zip(old, new)]
+    assert relative[0] == bendiff.format_relative(bendiff.relative_diff(old[0], new[0]))
+
+
+def test_ints_stay_ints(bendiff) -> None:
+    absolute, relative = diffs(bendiff, [1, 2.5], [6, 2.5])
+
+    assert absolute == ["5", "0.0"]
+    assert relative == ["+500.00%", "+0.00%"]
+
+
+def test_zero_baselines(bendiff) -> None:
+    _, relative = diffs(bendiff, [0, 0, 0], [5, -5, 0])
+
+    assert relative == ["+inf%", "-inf%", "+0.00%"]
+
+
+@pytest.mark.parametrize(
+    "q, df, t",
+    [(0.975, 1, 12.706204736), (0.975, 10, 2.228138852), (0.95, 30, 1.697260887)],
+)
+def test_student_t_quantile(bendiff, q: float, df: float, t: float) -> None:
+    assert bendiff.student_t_quantile(q, df) == pytest.approx(t, rel=1e-9)
+    assert bendiff.student_t_two_sided_p(t, df) == pytest.approx(2 * (1 - q))
+
+
+def test_welch_compare(bendiff) -> None:
+    # scipy.stats.ttest_ind(new, old, equal_var=False)
+    comparison = bendiff.welch_compare([1, 2, 3, 4, 5], [2, 4, 6, 8, 10], 0.05)
+
+    assert comparison.old_mean == 3.0
+    assert comparison.new_mean == 6.0
+    assert comparison.new_stddev == pytest.approx(10**0.5)
+    assert comparison.p_value == pytest.approx(0.1075312, rel=1e-5)
+    assert comparison.ci_half_width == pytest.approx(3.8881, rel=1e-3)
+
+
+def test_welch_compare_needs_repetitions(bendiff) -> None:
+    comparison = bendiff.welch_compare([1.0], [2.0, 3.0], 0.05)
+
+    assert comparison.old_stddev is None
+    assert comparison.p_value is None
+    assert comparison.ci_half_width is None
+
+
+def test_welch_compare_reuses_quantiles(bendiff) -> None:
+    bendiff.student_t_quantile.cache_clear()
+    for shift in range(100):
+        bendiff.welch_compare([1, 2, 3], [2 + shift, 3 + shift, 5 + shift], 0.05)
+
+    assert bendiff.student_t_quantile.cache_info().currsize == 1
+
+
+def write_csv(path: Path, header: list, rows: list) -> Path:
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows([header, *rows])
+    return path
+
+
+def run(old: Path, new: Path, *args: str) -> str:
+    result = subprocess.run(
+        [sys.executable, BENDIFF, "-o", old, "-n", new, *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout
+
+
+@pytest.mark.parametrize("extra", [[], ["--geomean"]])
+def test_streaming_diffs_as_in_memory(tmp_path: Path, extra: list) -> None:
+    header = ["test_suite_name", "emulator", "cycles", "ipc"]
+    names = [f"test{i:02}" for i in range(20)]
+    old = [[n, e, 100 + i, 1.5] for i, n in enumerate(names) for e in "ab"]
+    new = [[n, e, 90 + 2 * i, 1.25 + i] for i, n in enumerate(names) for e in "ab"]
+
+    # The old file is not sorted by the key, which is sorted externally
+    old = write_csv(tmp_path / "old.csv", header, old[::-1])
+    new = write_csv(tmp_path / "new.csv", header, new)
+
+    expected = run(old, new, *extra)
+    assert len(expected.splitlines()) == 1 + 40 + len(extra)
+    assert run(old, new, "--streaming", *extra) == expected
+
+
+def test_streaming_stats_as_in_memory(tmp_path: Path) -> None:
+    header = ["test_suite_name", "repetition", "cycles"]
+    rows = [[f"test{i}", r, 100 * i + r * r] for i in range(5) for r in range(3)]
+
+    old = write_csv(tmp_path / "old.csv", header, rows[::-1])
+    new = write_csv(tmp_path / "new.csv", header, [[*_[:2], _[2] * 2] for _ in rows])
+
+    assert run(old, new, "--streaming") == run(old, new)
+
+
+def test_external_sort_merges_chunks(
+    bendiff, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(bendiff, "SORT_CHUNK_ROWS", 7)
+    rows = [[f"test{(i * 37) % 100:02}", i] for i in range(100)]
+    path = write_csv(tmp_path / "results.csv", ["test_suite_name", "cycles"], rows)
+
+    sorted_rows = list(bendiff.sorted_rows(path, ["test_suite_name"], ["cycles"]))
+
+    assert sorted_rows == sorted(((n,), (c,)) for n, c in rows)
+
+
+def test_host_columns_are_compared_across_repetitions(tmp_path: Path) -> None:
+    header = ["test_suite_name", "repetition", "cycles", "time_spent_ms"]
+    jitter = [0, 7, -4, 3, -6]
+    old = [["test", r, 1000, 500 + j] for r, j in enumerate(jitter)]
+    new = [["test", r, 1000, 510 + j] for r, j in enumerate(jitter[::-1])]
+
+    old = write_csv(tmp_path / "old.csv", header, old)
+    new = write_csv(tmp_path / "new.csv", header, new)
+
+    (row,) = csv.DictReader(run(old, new).splitlines())
+    assert float(row["time_spent_ms_old_stddev"]) > 0
+    assert 0 < float(row["time_spent_ms_p_value"]) < 0.05
+    assert row["time_spent_ms_significant"] == "yes"
+
+
+def test_host_columns_are_left_out_of_single_runs(tmp_path: Path) -> None:
+    header = ["test_suite_name", "cycles", "time_spent_ms"]
+    old = write_csv(tmp_path / "old.csv", header, [["test", 1000, 500]])
+    new = write_csv(tmp_path / "new.csv", header, [["test", 1000, 600]])
+
+    columns, _ = csv.reader(run(old, new).splitlines())
+    assert not any(_.startswith("time_spent_ms") for _ in columns)
@@ -0,0 +1,125 @@
+import os
+from pathlib import Path
+import sys
+
+import pytest
+
+from nemu.checkpoint import NEMUCheckpoint
+from nemu.config import NEMUCheckpointConfig, NEMUConfig
+
+# Traces 100 instructions, or checkpoints the listed intervals
+FAKE_NEMU = f"""#!{sys.executable}
+import os, sys
+args = sys.argv
+with open(os.environ["FAKE_NEMU_LOG"], "a") as f:
+    f.write(" ".join(args[1:]) + "\\n")
+
+if "-S" not in args:
+    for i in range(100):
+        print(f"0x{{0x80000000 + 4 * i:016x}}: 13 04 00 00 li s0, 0")
+    sys.exit(0)
+
+option = lambda name: args[args.index(name) + 1]
+points = os.path.join(option("-S"), option("-w"), "simpoints0")
+for line in open(points):
+    index = line.split()[0]
+    dir = os.path.join(option("-D"), option("-C"), option("-w"), index)
+    os.makedirs(dir)
+    with open(os.path.join(dir, f"_{{index}}_.gz"), "w") as f:
+        f.write(str(int(index) * int(option("--cpt-interval"))) + "x" * 1000)
+"""
+
+
+@pytest.fixture
+def nemu(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> NEMUConfig:
+    path = tmp_path / "nemu.py"
+    path.write_text(FAKE_NEMU)
+    path.chmod(0o755)
+    monkeypatch.setenv("FAKE_NEMU_LOG", str(tmp_path / "nemu.log"))
+    return NEMUConfig(executable_path=path)
+
+
+def app(tmp_path: Path, name: str) -> Path:
+    path = tmp_path / f"{name}.bin"
+    path.write_bytes(name.encode())
+    return path
+
+
+def runs(tmp_path: Path) -> int:
+    return len((tmp_path / "nemu.log").read_text().splitlines())
+
+
+def test_checkpoint_is_taken_once(tmp_path: Path, nemu: NEMUConfig) -> None:
+    config = NEMUCheckpointConfig(path=tmp_path / "cache", instructions=40)
+
+    region = NEMUCheckpoint(config, nemu).prepare(app(tmp_path, "app"))
+    assert region.instructions == 40
+    assert region.image.read_text().startswith("40x")
+
+    # Published whole, with no leftovers of the take
+    assert sorted(_.name for _ in region.image.parent.iterdir()) == [
+        NEMUCheckpoint.IMAGE,
+        NEMUCheckpoint.METADATA,
+    ]
+    assert [_.name for _ in config.path.iterdir()] == [region.image.parent.name]
+
+    again = NEMUCheckpoint(config, nemu).prepare(app(tmp_path, "app"))
+    assert again == region
+    assert runs(tmp_path) == 1
+
+
+def test_checkpoint_at_marker(tmp_path: Path, nemu: NEMUConfig) -> None:
+    config = NEMUCheckpointConfig(path=tmp_path / "cache", marker=0x80000000 + 4 * 25)
+
+    region = NEMUCheckpoint(config, nemu).prepare(app(tmp_path, "app"))
+
+    assert region.instructions == 25
+    assert region.image.read_text().startswith("25x")
+
+
+def test_checkpoint_at_start_is_the_app(tmp_path: Path, nemu: NEMUConfig) -> None:
+    config = NEMUCheckpointConfig(path=tmp_path / "cache", instructions=0)
+
+    region = NEMUCheckpoint(config, nemu).prepare(app(tmp_path, "app"))
+
+    assert region.image is None
+    assert not (tmp_path / "nemu.log").exists()
+
+
+def test_unreached_marker_fails(tmp_path: Path, nemu: NEMUConfig) -> None:
+    config = NEMUCheckpointConfig(path=tmp_path / "cache", marker=0x90000000)
+
+    with pytest.raises(RuntimeError, match="never reached"):
+        NEMUCheckpoint(config, nemu).prepare(app(tmp_path, "app"))
+    assert [_.name for _ in config.path.iterdir()] == []
+
+
+def test_checkpoints_are_keyed_by_app(tmp_path: Path, nemu: NEMUConfig) -> None:
+    config = NEMUCheckpointConfig(path=tmp_path / "cache", instructions=40)
+    checkpoint = NEMUCheckpoint(config, nemu)
+
+    a = checkpoint.prepare(app(tmp_path, "a"))
+    b = checkpoint.prepare(app(tmp_path, "b"))
+
+    assert a.image != b.image
+    assert runs(tmp_path) == 2
+
+
+def test_least_recently_used_are_evicted(tmp_path: Path, nemu: NEMUConfig) -> None:
+    # Room for two checkpoints of about 1KB
+    config = NEMUCheckpointConfig(
+        path=tmp_path / "cache", instructions=40, max_size=2500
+    )
+    checkpoint = NEMUCheckpoint(config, nemu)
+
+    a = checkpoint.prepare(app(tmp_path, "a"))
+    b = checkpoint.prepare(app(tmp_path, "b"))
+    os.utime(a.image.parent / NEMUCheckpoint.METADATA, (0, 0))
+    os.utime(b.image.parent / NEMUCheckpoint.METADATA, (1, 1))
+    checkpoint.prepare(app(tmp_path, "a"))
+
+    c = checkpoint.prepare(app(tmp_path, "c"))
+
+    assert a.image.exists()
+    assert not b.image.parent.exists()
+    assert c.image.exists()
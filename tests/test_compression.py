@@ -0,0 +1,80 @@
+import importlib.util
+from pathlib import Path
+import threading
+
+import pytest
+
+import compression
+from compression import (
+    CompressedWriter,
+    compressed_open,
+    compressed_path,
+    compressed_read,
+)
+from config import SimuBenConfig
+
+COMPRESSIONS = [
+    None,
+    "gzip",
+    pytest.param(
+        "zstd",
+        marks=pytest.mark.skipif(
+            importlib.util.find_spec("zstandard") is None,
+            reason="requires zstandard",
+        ),
+    ),
+]
+
+
+@pytest.mark.parametrize("kind", COMPRESSIONS)
+def test_round_trip(tmp_path: Path, kind) -> None:
+    # Several chunks of the writer
+    lines = [f"line {i}: {'x' * (i % 100)}\n" for i in range(50_000)]
+
+    path = compressed_path(tmp_path / "log.txt", kind)
+    with compressed_open(path, kind) as f:
+        for line in lines:
+            f.write(line)
+
+    with compressed_read(path) as f:
+        assert f.readlines() == lines
+
+
+def test_failed_encoder_is_stopped(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class Broken:
+        def compress(self, data: bytes) -> bytes:
+            raise OSError("disk full")
+
+        def flush(self) -> bytes:
+            return b""
+
+    monkeypatch.setattr(compression, "_compressor", lambda _: Broken())
+    threads = threading.active_count()
+
+    f = CompressedWriter(tmp_path / "log.txt.gz", "gzip")
+    # The queue is full long before all the chunks are handed over
+    with pytest.raises(OSError, match="disk full"):
+        for _ in range(4 * CompressedWriter.QUEUE_SIZE):
+            f.write("x" * CompressedWriter.CHUNK_SIZE)
+
+    # Closing after the error neither blocks nor leaks the encoder
+    with pytest.raises(OSError, match="disk full"):
+        f.close()
+    assert f.closed
+    assert threading.active_count() == threads
+
+
+def test_unknown_compression_is_rejected(tmp_path: Path) -> None:
+    path = tmp_path / "simuben.yml"
+    path.write_text(
+        "nexus_am:\n"
+        "  path: /am\n"
+        "  toolchain_path: /tc\n"
+        "export:\n"
+        "  compression: lz4\n"
+    )
+
+    with pytest.raises(ValueError, match="lz4"):
+        SimuBenConfig.from_yaml_file(path)
@@ -0,0 +1,31 @@
+from pathlib import Path
+
+import pytest
+
+from config import SimuBenConfig
+
+
+def config(tmp_path: Path, *names: str) -> Path:
+    path = tmp_path / "simuben.yml"
+    path.write_text(
+        "nexus_am:\n"
+        "  path: /am\n"
+        "  toolchain_path: /tc\n"
+        "verilator:\n"
+        + "".join(f"  - path: /emu\n    name: '{name}'\n" for name in names)
+    )
+    return path
+
+
+def test_matrix_names_tag_artifacts(tmp_path: Path) -> None:
+    path = config(tmp_path, "xs-v2", "xs_v3", "Default2")
+
+    verilator = SimuBenConfig.from_yaml_file(path).verilator
+
+    assert [_.name for _ in verilator] == ["xs-v2", "xs_v3", "Default2"]
+
+
+@pytest.mark.parametrize("name", ["xs.v2", "../xs", "a/b", "x s", ""])
+def test_unsafe_matrix_names_are_rejected(tmp_path: Path, name: str) -> None:
+    with pytest.raises(ValueError, match="may only contain"):
+        SimuBenConfig.from_yaml_file(config(tmp_path, "xs", name))
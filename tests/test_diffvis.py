@@ -0,0 +1,136 @@
+import json
+import math
+from pathlib import Path
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+DIFFVIS = Path(__file__).parent.parent / "diffvis" / "main.py"
+
+# Columns of the number path, printed back by the page from their format
+NUMBER_COLUMNS = [
+    ["+0.00%", "-0.00%", "+12.50%", "-3.25%", "+inf%", "-inf%", ""],
+    ["-inf%", "+1.0%", ""],
+    ["0", "5", "-1", "", "inf", "-inf", "1234567"],
+    ["-0", "0", "12"],
+    ["1.5", "-2.0", "0.0"],
+]
+
+# Columns embedding their text, e.g. of mixed decimals or exponents
+TEXT_COLUMNS = [
+    ["1.5", "2", "3.25", ""],
+    ["0.0312", "1e-05", "0.5"],
+    ["0.8000000000000007", "1"],
+]
+
+
+def part_text(column: dict, k: int) -> str:
+    # Mirrors `partText` of the page
+    if "text" in column:
+        return column["text"][k]
+
+    value = column["values"][k]
+    if value is None:
+        return ""
+
+    format = column["format"]
+    if math.isfinite(value):
+        # JavaScript prints a negative zero without its sign
+        text = f"{value + 0.0:.{int(format['decimals'])}f}"
+    else:
+        text = "-inf" if value < 0 else "inf"
+
+    if value == 0 and math.copysign(1.0, value) < 0:
+        sign = "-"
+    elif format["plus"] and value >= 0:
+        sign = "+"
+    else:
+        sign = ""
+    return sign + text + format["suffix"]
+
+
+@pytest.mark.parametrize("cells", NUMBER_COLUMNS + TEXT_COLUMNS)
+def test_column_round_trips(diffvis, cells: list[str]) -> None:
+    # JavaScript numbers are all floats, keeping the sign of `-0`
+    column = json.loads(diffvis.generate_column(cells), parse_int=float)
+
+    assert column["kind"] == "number"
+    assert [part_text(column, k) for k in range(len(cells))] == cells
+
+
+@pytest.mark.parametrize("cells", NUMBER_COLUMNS)
+def test_numbers_take_format_path(diffvis, cells: list[str]) -> None:
+    assert diffvis.number_format(cells) is not None
+
+
+def test_strings_are_embedded(diffvis) -> None:
+    cells = ["x", "", "y<z"]
+    column = json.loads(diffvis.generate_column(cells))
+
+    assert column == {"kind": "string", "values": cells}
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="requires node")
+def test_page_prints_columns_back(diffvis) -> None:
+    template = diffvis.VIRTUAL_HTML_TEMPLATE.replace("{{", "{").replace("}}", "}")
+    part_text_js = re.search(r"function partText\(.*?\n        \}\n", template, re.S)
+
+    columns = [
+        diffvis.generate_column(cells) for cells in NUMBER_COLUMNS + TEXT_COLUMNS
+    ]
+    script = part_text_js.group(0) + (
+        "const columns = [%s];\n"
+        "console.log(JSON.stringify(columns.map("
+        "c => c.values.map((_, k) => partText(c, k)))));\n"
+    ) % ",".join(columns)
+
+    output = subprocess.run(
+        ["node", "-e", script], capture_output=True, text=True, check=True
+    ).stdout
+    assert json.loads(output) == NUMBER_COLUMNS + TEXT_COLUMNS
+
+
+def test_virtual_report_streams_chunks() -> None:
+    header = ["test_suite_name", "cycles_diff_relative", "note"]
+    rows = [
+        # The second chunk has its own decimals, and the last one a string
+        [f"test{i}", f"{i / 8:+.{3 if i < 4096 else 1}f}%", "</script>" * (i > 8192)]
+        for i in range(2 * 4096 + 100)
+    ]
+    rows[-1][1] = "n/a"
+    text = "\n".join(",".join(row) for row in [header, *rows]) + "\n"
+
+    page = subprocess.run(
+        [sys.executable, DIFFVIS, "-o", "old", "-n", "new", "--virtual"],
+        input=text,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    def scripts(attribute: str) -> list:
+        pattern = r'<script type="application/json" %s>(.*?)</script>' % attribute
+        return [
+            json.loads(_.replace("<\\/", "</"), parse_int=float)
+            for _ in re.findall(pattern, page, re.S)
+        ]
+
+    (meta,) = scripts('id="reportMeta"')
+    chunks = scripts('class="reportChunk"')
+
+    assert meta["header"] == header
+    assert [_["rows"] for _ in chunks] == [4096, 4096, 100]
+    assert [_["columns"][1]["kind"] for _ in chunks] == ["number"] * 2 + ["string"]
+
+    cells = [
+        [
+            part_text(column, k) if column["kind"] == "number" else column["values"][k]
+            for column in chunk["columns"]
+        ]
+        for chunk in chunks
+        for k in range(int(chunk["rows"]))
+    ]
+    assert cells == rows
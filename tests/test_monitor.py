@@ -0,0 +1,62 @@
+from pathlib import Path
+import sys
+import time
+
+import pytest
+
+from monitor import RunAborted, RunBudget
+from nemu.config import NEMUConfig
+from nemu.core import NEMU
+from verilator.config import VerilatorConfig
+from verilator.core import Verilator
+
+
+def script(tmp_path: Path, name: str, body: str) -> Path:
+    path = tmp_path / name
+    path.write_text(f"#!{sys.executable}\nimport os, sys, time\n{body}")
+    path.chmod(0o755)
+    return path
+
+
+def test_budget_holds_after_output_ends(tmp_path: Path) -> None:
+    nemu = script(
+        tmp_path,
+        "nemu.py",
+        'print("0x80000000: 13 05 10 00 li a0, 1", flush=True)\n'
+        "os.close(1)\n"
+        "time.sleep(60)\n",
+    )
+    emu = NEMU(NEMUConfig(executable_path=nemu, budget=RunBudget(wall_time_s=1)))
+
+    start = time.monotonic()
+    with pytest.raises(RunAborted, match="1s") as e:
+        emu.run(tmp_path / "app.bin", open(tmp_path / "nemu.log", "w"))
+
+    assert time.monotonic() - start < 30
+    assert e.value.log.instructions == 1
+
+
+def test_output_cut_by_kill_is_aborted(tmp_path: Path) -> None:
+    # The malformed line is already in the pipe when the budget kills the run
+    verilator = script(
+        tmp_path,
+        "emu.py",
+        'print("Core-0 instrCnt = 10, cycleCnt = 20, IPC = 0.5", flush=True)\n'
+        "sys.stderr.write(\n"
+        '    "[PERF ][time=          0] TOP.core: a, 1\\n"\n'
+        '    "[PERF ][time=       5000] TOP.core: a, 2\\n"\n'
+        '    "[PERF ][time=       5000] garbage\\n"\n'
+        ")\n"
+        "sys.stderr.flush()\n"
+        "time.sleep(60)\n",
+    )
+    emu = Verilator(
+        VerilatorConfig(executable_path=verilator, budget=RunBudget(cycles=1000))
+    )
+
+    with pytest.raises(RunAborted, match="1000 cycles") as e:
+        emu.run(tmp_path / "app.bin")
+
+    assert e.value.log.brief.cores[0].cycles_count == 20
+    # The dumps before the cut are kept for diagnosis
+    assert e.value.log.perf[0] == {"TOP.core": {"a": [1]}}
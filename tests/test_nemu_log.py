@@ -0,0 +1,121 @@
+import pytest
+
+from nemu.log import (
+    NEMUInstruction,
+    NEMUInstructionsTotal,
+    NEMUText,
+    nemu_instruction_parse,
+    nemu_log_progress,
+    nemu_log_records,
+    nemu_log_stats,
+)
+
+
+@pytest.mark.parametrize(
+    "line, instruction",
+    [
+        (
+            "0x0000000080000000: 97 02 00 00 auipc t0, 0\n",
+            NEMUInstruction(0x80000000, 4, "97 02 00 00", "auipc t0, 0"),
+        ),
+        (
+            "0x0000000080000004: 82 80 ret\n",
+            NEMUInstruction(0x80000004, 2, "82 80", "ret"),
+        ),
+        (
+            "0x80000000: 00000297 auipc t0, 0\n",
+            NEMUInstruction(0x80000000, 4, "00000297", "auipc t0, 0"),
+        ),
+        (
+            "0x80000008: 8082 ret\n",
+            NEMUInstruction(0x80000008, 2, "8082", "ret"),
+        ),
+        (
+            "0x80000000: auipc t0, 0\n",
+            NEMUInstruction(0x80000000, 0, "", "auipc t0, 0"),
+        ),
+    ],
+)
+def test_instruction_parse(line: str, instruction: NEMUInstruction) -> None:
+    assert nemu_instruction_parse(line) == instruction
+
+
+def test_records() -> None:
+    lines = [
+        "Welcome to riscv64-NEMU!\n",
+        "0x0000000080000000: 97 02 00 00 auipc t0, 0\n",
+        "0xnot a pc: at all\n",
+        "[src/cpu/cpu-exec.c:1] total guest instructions = 1,234\n",
+    ]
+
+    assert list(nemu_log_records(lines)) == [
+        NEMUText("Welcome to riscv64-NEMU!"),
+        NEMUInstruction(0x80000000, 4, "97 02 00 00", "auipc t0, 0"),
+        NEMUText("0xnot a pc: at all"),
+        NEMUInstructionsTotal(1234),
+    ]
+
+
+def trace(*lines: str) -> list[str]:
+    return [f"{line}\n" for line in lines]
+
+
+def test_stats_blocks_end_at_control_flow() -> None:
+    lines = trace(
+        # A loop of 3 instructions run twice, falling through into a call
+        "0x80000000: 13 05 10 00 li a0, 1",
+        "0x80000004: 13 05 f5 ff addi a0, a0, -1",
+        "0x80000008: e3 1c 05 fe bnez a0, 0x80000000",
+        "0x80000000: 13 05 10 00 li a0, 1",
+        "0x80000004: 13 05 f5 ff addi a0, a0, -1",
+        "0x80000008: e3 1c 05 fe bnez a0, 0x80000000",
+        "0x8000000c: ef 00 40 00 jal ra, 0x80000010",
+        "0x80000010: 82 80 ret",
+        "total guest instructions = 8",
+    )
+
+    stats = nemu_log_stats(nemu_log_records(lines))
+
+    assert stats.instructions == 8
+    assert stats.reported_instructions == 8
+    assert stats.pcs[0x80000000] == 2
+    assert stats.blocks == {0x80000000: 2, 0x8000000C: 1, 0x80000010: 1}
+    assert stats.block_instructions == {0x80000000: 6, 0x8000000C: 1, 0x80000010: 1}
+
+
+def test_stats_blocks_start_at_traps() -> None:
+    lines = trace(
+        "0x80000000: 13 05 10 00 li a0, 1",
+        # The handler of an interrupt
+        "0x80001000: 73 00 20 30 mret",
+        "0x80000004: 13 05 f5 ff addi a0, a0, -1",
+    )
+
+    stats = nemu_log_stats(nemu_log_records(lines))
+
+    assert stats.blocks == {0x80000000: 1, 0x80001000: 1, 0x80000004: 1}
+
+
+def test_stats_unknown_sizes_follow() -> None:
+    lines = trace(
+        "0x80000000: li a0, 1",
+        "0x80000004: addi a0, a0, -1",
+        "0x80000008: bnez a0, 0x80000000",
+        "0x80000000: li a0, 1",
+    )
+
+    stats = nemu_log_stats(nemu_log_records(lines))
+
+    assert stats.blocks == {0x80000000: 2}
+    assert stats.block_instructions == {0x80000000: 4}
+
+
+def test_progress() -> None:
+    records = [NEMUInstruction(4 * i, 4, "", "nop") for i in range(10)]
+    records.append(NEMUInstructionsTotal(10))
+
+    counts = []
+    passed = list(nemu_log_progress(records, counts.append, interval=4))
+
+    assert passed == records
+    assert counts == [4, 8, 10]
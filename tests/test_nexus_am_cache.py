@@ -0,0 +1,64 @@
+from pathlib import Path
+import shutil
+import subprocess
+
+import pytest
+
+from nexus_am.cache import nexus_am_revision
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="requires git")
+
+
+def git(path: Path, *args: str) -> None:
+    subprocess.run(["git", "-C", str(path), *args], capture_output=True, check=True)
+
+
+@pytest.fixture
+def am(tmp_path: Path) -> Path:
+    am = tmp_path / "am"
+    (am / "am").mkdir(parents=True)
+    (am / "am" / "am.c").write_text("int am;\n")
+    (am / ".gitignore").write_text("build/\n")
+
+    git(am, "init", "-q")
+    git(am, "add", ".")
+    git(am, "-c", "user.name=am", "-c", "user.email=am@am", "commit", "-q", "-m", "am")
+    return am
+
+
+def test_revision_covers_untracked_files(am: Path) -> None:
+    clean = nexus_am_revision(am)
+
+    header = am / "am" / "include" / "am.h"
+    header.parent.mkdir()
+    header.write_text("#define AM 1\n")
+    first = nexus_am_revision(am)
+
+    header.write_text("#define AM 2\n")
+    second = nexus_am_revision(am)
+
+    assert len({clean, first, second}) == 3
+
+    header.unlink()
+    assert nexus_am_revision(am) == clean
+
+
+def test_revision_ignores_ignored_files(am: Path) -> None:
+    clean = nexus_am_revision(am)
+
+    (am / "am" / "build").mkdir()
+    (am / "am" / "build" / "am.o").write_text("obj")
+
+    assert nexus_am_revision(am) == clean
+
+
+def test_revision_covers_changes(am: Path) -> None:
+    clean = nexus_am_revision(am)
+
+    (am / "am" / "am.c").write_text("int am = 1;\n")
+
+    assert nexus_am_revision(am) != clean
+
+
+def test_no_revision_out_of_git(tmp_path: Path) -> None:
+    assert nexus_am_revision(tmp_path) is None
@@ -0,0 +1,165 @@
+from pathlib import Path
+import re
+import shutil
+import sys
+
+import pytest
+
+from nexus_am.app import NexusAMApp
+from nexus_am.config import NexusAMCacheConfig, NexusAMConfig
+from nexus_am.objcache import objcache_key
+
+# Leaks the paths of the source and of the include directories
+# into the preprocessed output unless `-P` is given, like clang does.
+FAKE_CLANG = f"""#!{sys.executable}
+import os, sys
+args = sys.argv[1:]
+if "--version" in args:
+    print("fake clang 1.0")
+    sys.exit(0)
+
+def option(name):
+    return args[args.index(name) + 1] if name in args else None
+
+src = next(a for a in args if a.endswith((".c", ".ll")) and not a.startswith("-"))
+out = option("-o")
+includes = [a[2:] for a in args if a.startswith("-I")]
+
+if option("-MF") is not None:
+    target = option("-MT") or out
+    with open(option("-MF"), "w") as f:
+        f.write(f"{{target}}: {{src}}\\n")
+
+if "-E" in args:
+    if "-P" not in args:
+        print(f'# 1 "{{os.path.realpath(src)}}"')
+        for include in includes:
+            print(f'# 1 "{{include}}app.h"')
+    print(open(src).read())
+    sys.exit(0)
+
+with open(os.environ["FAKE_CLANG_LOG"], "a") as f:
+    f.write(src + "\\n")
+with open(out, "w") as f:
+    f.write("obj(" + open(src).read() + ")")
+"""
+
+# The parts of nexus-am `Makefile.app` the object cache depends on
+MAKEFILE_APP = """\
+APP_DIR ?= $(shell pwd)
+INC_DIR += $(APP_DIR)/include/
+CFLAGS += $(addprefix -I, $(INC_DIR))
+LIBS ?= klib
+OBJS = $(addprefix build/,$(addsuffix .o,$(notdir $(basename $(SRCS)))))
+image: $(OBJS) am $(LIBS)
+\t@cat $(OBJS) > build/$(NAME)-riscv64-xs.bin
+build/%.o: $(dir $(firstword $(SRCS)))%.c
+\t@mkdir -p build && $(CC) -MMD -MF build/$*.d $(CFLAGS) -c -o $@ $(realpath $<)
+am:
+\t@true
+$(LIBS): %:
+\t@true
+"""
+
+# The `archive` target of nexus-am `am/` and `libs/klib/`
+MAKEFILE_ARCHIVE = """\
+archive:
+\t@mkdir -p build && echo $(notdir $(CURDIR)) > build/$(notdir $(CURDIR))-$(ARCH).a
+"""
+
+
+@pytest.fixture
+def toolchain(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    bin = tmp_path / "tc" / "bin"
+    bin.mkdir(parents=True)
+    for tool in ["ld.lld", "llvm-objdump", "llvm-objcopy", "llvm-ar"]:
+        (bin / tool).write_text("")
+
+    clang = bin / "clang"
+    clang.write_text(FAKE_CLANG)
+    clang.chmod(0o755)
+
+    monkeypatch.setenv("FAKE_CLANG_LOG", str(tmp_path / "clang.log"))
+    return tmp_path / "tc"
+
+
+def test_key_ignores_build_directory(
+    tmp_path: Path, toolchain: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    source = tmp_path / "app.c"
+    source.write_text("int main() { return 0; }\n")
+
+    keys = []
+    for build in ["app-1", "app-2"]:
+        basedir = tmp_path / build
+        (basedir / "build").mkdir(parents=True)
+        monkeypatch.chdir(basedir)
+        monkeypatch.setenv("SIMUBEN_OBJCACHE_BASEDIR", str(basedir))
+
+        output = Path("build/app.o")
+        args = [f"-I{basedir}/include/", "-MMD", "-MF", "build/app.d"]
+        args += ["-O2", "-c", "-o", str(output), str(source)]
+        keys.append(
+            objcache_key(str(toolchain / "bin" / "clang"), args, source, output)
+        )
+
+        # The dependency file is written without compiling
+        assert (basedir / "build" / "app.d").read_text().startswith("build/app.o:")
+
+    assert keys[0] is not None
+    assert keys[0] == keys[1]
+
+
+def test_key_depends_on_source(tmp_path: Path, toolchain: Path) -> None:
+    clang = str(toolchain / "bin" / "clang")
+    output = tmp_path / "app.o"
+
+    keys = []
+    for text in ["int x = 1;\n", "int x = 2;\n"]:
+        source = tmp_path / "app.c"
+        source.write_text(text)
+        keys.append(
+            objcache_key(clang, ["-c", "-o", str(output), str(source)], source, output)
+        )
+
+    assert keys[0] != keys[1]
+
+
+@pytest.mark.skipif(shutil.which("make") is None, reason="requires make")
+def test_same_app_hits_across_builds(
+    tmp_path: Path, toolchain: Path, capsys: pytest.CaptureFixture
+) -> None:
+    # Without a git revision the binary cache is off, so objects are compiled
+    am = tmp_path / "am"
+    am.mkdir()
+    (am / "Makefile.app").write_text(MAKEFILE_APP)
+    for subdir in ["am", "libs/klib"]:
+        (am / subdir).mkdir(parents=True)
+        (am / subdir / "Makefile").write_text(MAKEFILE_ARCHIVE)
+
+    source = tmp_path / "src" / "app.c"
+    source.parent.mkdir()
+    source.write_text("int main() { return 0; }\n")
+
+    config = NexusAMConfig(
+        path=am,
+        toolchain_path=toolchain,
+        cache=NexusAMCacheConfig(path=tmp_path / "cache"),
+        scratch_path=tmp_path / "scratch",
+    )
+
+    stats = []
+    for _ in range(2):
+        with NexusAMApp(config, [source]) as app:
+            app.build()
+            assert app.executable.exists()
+        output = capsys.readouterr().out
+        match = re.search(r"Object cache hits=(\d+), misses=(\d+)", output)
+        stats.append((int(match.group(1)), int(match.group(2))))
+
+    assert stats[0] == (0, 1)
+    assert stats[1][0] > 0
+    assert (tmp_path / "clang.log").read_text().count("app.c") == 1
+
+    # The runtime is built in the scratch rather than in the AM tree
+    assert list(am.rglob("build")) == []
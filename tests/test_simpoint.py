@@ -0,0 +1,143 @@
+from collections import Counter
+import io
+from pathlib import Path
+import sys
+
+import pytest
+
+from nemu.config import NEMUConfig
+from nemu.core import NEMU
+from nemu.log import NEMUInstruction, NEMUText
+from simpoint import cluster
+from simpoint.bbv import simpoint_bbvs, simpoint_bbvs_write
+from simpoint.cluster import SimPoint, simpoint_pick
+from simpoint.estimate import (
+    SimPointSample,
+    simpoint_estimate,
+    simpoint_estimate_brief,
+)
+from verilator.log import VerilatorLog
+from verilator.log_export import CSVConfig, verialtor_brief_to_csv
+
+
+def loop(base: int, body: int, iterations: int) -> list[NEMUInstruction]:
+    # A loop of `body` instructions closed by a backward branch
+    trace = []
+    for _ in range(iterations):
+        for i in range(body - 1):
+            trace.append(NEMUInstruction(base + 4 * i, 4, "13 04 00 00", "li s0, 0"))
+        pc = base + 4 * (body - 1)
+        trace.append(NEMUInstruction(pc, 4, "e3 1e 05 fe", f"bnez a0, 0x{base:x}"))
+    return trace
+
+
+def test_bbvs_split_intervals() -> None:
+    records = [NEMUText("Welcome"), *loop(0x80000000, 3, 3), *loop(0x80001000, 2, 1)]
+
+    bbvs = list(simpoint_bbvs(records, 4))
+
+    assert bbvs == [
+        Counter({0x80000000: 4}),
+        Counter({0x80000000: 4}),
+        Counter({0x80000000: 1, 0x80001000: 2}),
+    ]
+
+
+def test_bbvs_write() -> None:
+    f = io.StringIO()
+    simpoint_bbvs_write([Counter({0x10: 4}), Counter({0x20: 1, 0x10: 3})], f)
+
+    assert f.getvalue() == "T:1:4\nT:2:1 :1:3\n"
+
+
+def phases(intervals: list[int]) -> list[Counter]:
+    # Intervals of a few distinct phases
+    bbvs = []
+    for phase in intervals:
+        base = 0x80000000 + phase * 0x1000
+        bbvs.append(Counter({base: 1000, base + 0x40: 100 * phase, 0x90000000: 1}))
+    return bbvs
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_pick_one_simpoint_per_phase(
+    numpy: bool, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    if numpy and cluster.np is None:
+        pytest.skip("requires numpy")
+    if not numpy:
+        monkeypatch.setattr(cluster, "np", None)
+
+    labels = [0] * 20 + [1] * 50 + [2] * 30
+    simpoints = simpoint_pick(phases(labels), max_k=10, seed=42)
+
+    assert len(simpoints) == 3
+    assert sorted(labels[p.interval] for p in simpoints) == [0, 1, 2]
+    weights = {labels[p.interval]: p.weight for p in simpoints}
+    assert weights == pytest.approx({0: 0.2, 1: 0.5, 2: 0.3})
+
+
+def test_pick_samples_large_profiles() -> None:
+    labels = [i // 100 % 4 for i in range(1200)]
+    simpoints = simpoint_pick(phases(labels), max_k=8, seed=1, sample_size=200)
+
+    assert sorted(labels[p.interval] for p in simpoints) == [0, 1, 2, 3]
+    assert sum(p.weight for p in simpoints) == pytest.approx(1.0)
+
+
+def sample(interval: int, weight: float, instructions: int, cycles: int):
+    return SimPointSample(
+        simpoint=SimPoint(interval=interval, cluster=interval, weight=weight),
+        brief=VerilatorLog.Brief(
+            cores=[VerilatorLog.Core(0, instructions, cycles)], time_spent_ms=5
+        ),
+        host=VerilatorLog.Host(wall_time_ms=100),
+    )
+
+
+def test_estimate_weights_cpi() -> None:
+    samples = [sample(0, 0.25, 1000, 1000), sample(3, 0.75, 1000, 3000)]
+
+    estimate = simpoint_estimate(10_000, samples, core_number=0)
+
+    # CPI = 0.25 * 1 + 0.75 * 3
+    assert estimate.cycles == 25_000
+    assert estimate.coverage == 1.0
+    assert estimate.sampled_cycles == 4000
+
+
+def test_estimate_renormalizes_over_measured() -> None:
+    samples = [sample(0, 0.5, 1000, 2000), sample(1, 0.5, 0, 0)]
+
+    estimate = simpoint_estimate(10_000, samples, core_number=0)
+
+    assert estimate.cycles == 20_000
+    assert estimate.simpoints == 1
+    assert estimate.coverage == 0.5
+
+
+def test_estimate_brief_is_marked() -> None:
+    estimate = simpoint_estimate(10_000, [sample(0, 1.0, 1000, 2000)], 0)
+    brief = simpoint_estimate_brief(estimate, 0)
+
+    rows = verialtor_brief_to_csv(brief, CSVConfig(), "rtl", None).splitlines()
+
+    assert rows[0].endswith(",estimated")
+    assert rows[1] == "rtl,10000,20000,,,,,,true"
+
+
+def test_checkpoint_rejects_several_images(tmp_path: Path) -> None:
+    nemu = tmp_path / "nemu.py"
+    nemu.write_text(
+        f"#!{sys.executable}\n"
+        "import os, sys\n"
+        "out = os.path.join(sys.argv[sys.argv.index('-D') + 1], 'simpoint', 'app', '2')\n"
+        "os.makedirs(out)\n"
+        "open(os.path.join(out, 'a.gz'), 'w').close()\n"
+        "open(os.path.join(out, 'b.gz'), 'w').close()\n"
+    )
+    nemu.chmod(0o755)
+
+    emu = NEMU(NEMUConfig(executable_path=nemu))
+    with pytest.raises(RuntimeError, match="several checkpoints"):
+        emu.checkpoint(tmp_path / "app.bin", tmp_path, "app", 100, tmp_path / "out")
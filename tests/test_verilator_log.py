@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import pytest
+
+from verilator.log import (
+    VerilatorPerfArchive,
+    VerilatorPerfFilter,
+    VerilatorPerfParseError,
+    verilator_perf_archive_write,
+    verilator_perf_log_parse,
+    verilator_perf_log_parse_parallel,
+)
+
+LINES = [
+    "[PERF ][time=          0] TOP.core.frontend: fetch, 1\n",
+    "[PERF ][time=          0] TOP.core.backend: commit, 2\n",
+    "[PERF ][time=          0] TOP.core.backend: stall, 3\n",
+    "[PERF ][time=       5000] TOP.core.frontend: fetch, 4\n",
+    "[PERF ][time=       5000] TOP.core.backend: commit, 5\n",
+    "[PERF ][time=       5000] TOP.core.backend: stall, 6\n",
+]
+
+
+def as_dict(perf) -> dict:
+    return {time: perf[time] for time in perf}
+
+
+def test_archive_is_filtered_as_the_log(tmp_path: Path) -> None:
+    path = tmp_path / "perf.archive"
+    with open(path, "wb") as f:
+        verilator_perf_archive_write(verilator_perf_log_parse(LINES), f)
+
+    filter = VerilatorPerfFilter(include=("*.backend.*",), exclude=("re:.*stall",))
+    with VerilatorPerfArchive(path) as archive:
+        perf = archive.to_perf(filter)
+
+    assert as_dict(perf) == as_dict(verilator_perf_log_parse(LINES, filter))
+    assert as_dict(perf) == {
+        0: {"TOP.core.backend": {"commit": [2]}},
+        5000: {"TOP.core.backend": {"commit": [5]}},
+    }
+
+
+def test_parse_error_keeps_the_parsed_dumps(tmp_path: Path) -> None:
+    path = tmp_path / "perf.log"
+    path.write_text("".join(LINES[:3]) + "[PERF ][time=       5000] TOP.core\n")
+
+    with pytest.raises(VerilatorPerfParseError) as serial:
+        verilator_perf_log_parse(path.read_text().splitlines())
+    with pytest.raises(VerilatorPerfParseError) as parallel:
+        verilator_perf_log_parse_parallel(path, 2)
+
+    expected = as_dict(verilator_perf_log_parse(LINES[:3]))
+    assert serial.value.line_number == parallel.value.line_number == 4
+    assert as_dict(serial.value.perf) == as_dict(parallel.value.perf) == expected